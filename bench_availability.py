@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк свободного времени при сотнях мастеров: чтение занятости дня,
+расчет свободного времени без кэша и из кэша, бронирование с выбором мастера
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import Database, to_start_at
+
+MASTERS = 300
+APPOINTMENTS_PER_MASTER = 6
+RUNS = 200
+DATE = "18.06.2031"
+DATE_ISO = "2031-06-18"
+
+
+async def measure(runs, call):
+    started = time.perf_counter()
+    for _ in range(runs):
+        await call()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        worker = Database(os.path.join(tmp_dir, "bench.sqlite"), pool_size=4, profile="wal")
+        try:
+            await worker._create_tables()
+            services = await worker.get_all_services()
+            await worker.set_masters([(f"Мастер {n}", [service[0] for service in services]) for n in range(MASTERS)])
+            masters = [master_id for master_id, _, _ in await worker.get_masters()]
+
+            # Слоты маникюра каждые 15 минут, у каждого мастера по 6 часовых записей в разное время
+            times = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(9 * 60, 19 * 60 + 1, 15)]
+            for slot_time in times:
+                await worker.add_slot(DATE, slot_time, "Маникюр")
+            rows = []
+            for number, master_id in enumerate(masters):
+                for hour in range(APPOINTMENTS_PER_MASTER):
+                    slot_time = f"{9 + (number + hour * 2) % 11:02d}:00"
+                    rows.append((number, "Маникюр", DATE, slot_time, DATE_ISO, to_start_at(DATE, slot_time), 60,
+                                 master_id))
+
+            async def job(db):
+                await db.executemany("""
+                    INSERT INTO appointments (user_id, service, date, time, date_iso, start_at, duration, master_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+
+            await worker._write(job)
+            print(f"⏱ Бенчмарк свободного времени: {MASTERS} мастеров, {len(rows)} записей за день, "
+                  f"{len(times)} слотов\n")
+
+            sql = await measure(RUNS, lambda: worker._load_busy(DATE_ISO, DATE_ISO))
+
+            async def cold():
+                worker.availability.invalidate(DATE_ISO)
+                await worker.get_available_times(DATE, "Маникюр")
+
+            cold_ms = await measure(RUNS, cold)
+            free = await worker.get_available_times(DATE, "Маникюр")
+            cached = await measure(RUNS, lambda: worker.get_available_times(DATE, "Маникюр"))
+
+            user_ids = iter(range(10_000, 10_000 + RUNS))
+
+            async def book():
+                await worker.book_slot(next(user_ids), "Маникюр", DATE, "19:00", "Клиент", "Нет", "+79991234567")
+
+            booking = await measure(RUNS, book)
+
+            print(f"Занятость дня из SQLite (индекс по дате и мастеру): {sql:.2f} мс")
+            print(f"Свободное время дня без кэша:                    {cold_ms:.2f} мс")
+            print(f"Свободное время дня из кэша:                     {cached:.2f} мс ({len(free)} из {len(times)})")
+            print(f"Бронирование с выбором мастера:                  {booking:.2f} мс")
+        finally:
+            await worker.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
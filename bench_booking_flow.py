@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сценария записи: вызовы Bot API и объем запросов на одну запись,
+когда каждый шаг отправляет новое сообщение и когда шаги редактируют одно
+"""
+
+import asyncio
+import sys
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+from aiogram.utils.callback_answer import CallbackAnswerMiddleware
+
+from handlers import user_handlers, fallback_handlers
+from keyboards.callbacks import ServiceCallback, DateCallback, TimeCallback, day_from_date, minute_from_time
+from services.database import db
+
+
+class RecordingSession(BaseSession):
+    """Сессия без сети: считает вызовы и байты запросов"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+        self.bytes = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[method.__api_method__] += 1
+        # Поля запроса в том виде, в каком их отправляет AiohttpSession
+        for key, value in method.model_dump(warnings=False).items():
+            value = self.prepare_value(value, bot=bot, files={})
+            if value:
+                self.bytes += len(key.encode()) + len(value.encode())
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class Client:
+    """Пользователь, который нажимает кнопки и пишет сообщения"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.update_id = 0
+
+    def _base(self):
+        self.update_id += 1
+        chat = {"id": self.user_id, "type": "private"}
+        user = {"id": self.user_id, "is_bot": False, "first_name": "Клиент"}
+        return chat, user
+
+    def text(self, text):
+        chat, user = self._base()
+        return Update.model_validate({"update_id": self.update_id, "message": {
+            "message_id": self.update_id, "date": 1700000000, "text": text, "chat": chat, "from": user}})
+
+    def press(self, data):
+        chat, user = self._base()
+        return Update.model_validate({"update_id": self.update_id, "callback_query": {
+            "id": str(self.update_id), "chat_instance": "1", "data": data, "from": user,
+            "message": {"message_id": 1, "date": 1700000000, "text": "меню", "chat": chat}}})
+
+
+async def answer_instead_of_edit(message, text, reply_markup=None, **kwargs):
+    """Прежнее поведение: каждый шаг - новое сообщение"""
+    await message.answer(text, reply_markup=reply_markup, **kwargs)
+
+
+async def run(dp, title, service, date, time, user_id, edit):
+    session = RecordingSession()
+    bot = Bot("123456:TEST", session=session)
+    original = user_handlers.edit_anchor
+    if not edit:
+        user_handlers.edit_anchor = answer_instead_of_edit
+
+    client = Client(user_id)
+    day = day_from_date(date)
+    steps = [
+        client.text("/start"),
+        client.press(ServiceCallback(service_id=service[0]).pack()),
+        client.press(DateCallback(service_id=service[0], day=day).pack()),
+        client.press(TimeCallback(service_id=service[0], day=day, minute=minute_from_time(time)).pack()),
+        client.text("Иванова Анна Сергеевна"),
+        client.press("allergy_no"),
+        client.text("+79991234567"),
+        client.press("confirm_booking"),
+    ]
+    try:
+        for update in steps:
+            await dp.feed_update(bot, update)
+    finally:
+        user_handlers.edit_anchor = original
+
+    messages_in_chat = session.calls["sendMessage"] + session.calls["sendPhoto"]
+    print(f"{title}:")
+    print(f"   вызовов API: {sum(session.calls.values())} ({dict(session.calls)})")
+    print(f"   байт в запросах: {session.bytes}, сообщений бота в чате: {messages_in_chat}")
+
+
+async def main():
+    await db._create_tables()
+    service = (await db.get_all_services())[0]
+    date = (datetime.now() + timedelta(days=5)).strftime("%d.%m.%Y")
+    for time in ("10:00", "11:00"):
+        await db.add_slot(date, time, service[1])
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.callback_query.middleware(CallbackAnswerMiddleware())
+    dp.include_router(user_handlers.router)
+    dp.include_router(fallback_handlers.router)
+
+    print("⏱ Бенчмарк сценария записи (8 шагов)\n")
+    await run(dp, "Новое сообщение на каждый шаг", service, date, "10:00", 9001, edit=False)
+    await run(dp, "Редактирование одного сообщения", service, date, "11:00", 9002, edit=True)
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
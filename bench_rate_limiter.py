@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк системы защиты от спама: стоимость вызова и память на пользователя
+"""
+
+import sys
+import os
+import logging
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.rate_limiter import RateLimiter, RequestLog
+
+CALLS = 100_000
+TRACKED_USERS = 10_000
+
+
+class ListRateLimiter:
+    """Прежняя реализация на списках datetime - только для сравнения"""
+
+    def __init__(self):
+        self.user_requests = {}
+        self.max_requests_per_minute = 30
+        self.max_requests_per_hour = 200
+
+    def is_rate_limited(self, user_id):
+        now = datetime.now()
+        requests = self.user_requests.setdefault(user_id, [])
+        requests = [req for req in requests if now - req < timedelta(hours=1)]
+        self.user_requests[user_id] = requests
+        recent_requests = [req for req in requests if now - req < timedelta(minutes=1)]
+        if len(recent_requests) >= self.max_requests_per_minute:
+            return True
+        if len(requests) >= self.max_requests_per_hour:
+            return True
+        requests.append(now)
+        return False
+
+
+def bench_call_cost(limiter_class):
+    """Стоимость вызова для пользователя с 199 запросами за последний час"""
+    limiter = limiter_class()
+    # Запросы старше минуты, но моложе часа: лимит за минуту не срабатывает,
+    # а прежней реализации приходится фильтровать все 199 отметок
+    if isinstance(limiter, RateLimiter):
+        limiter.is_rate_limited(1)
+        log = limiter.user_requests[(1, "default")]
+        now = time.monotonic()
+        log.__init__()
+        for i in range(199):
+            log.add(now - 3000 + i * 10)
+
+        def undo():
+            second = log.second
+            log.counts[second % 60] -= 1
+            log.counts[60 + second // 60 % 60] -= 1
+            log.minute_total -= 1
+            log.hour_total -= 1
+    else:
+        now = datetime.now()
+        requests = [now - timedelta(seconds=3000 - i * 10) for i in range(199)]
+        limiter.user_requests[1] = requests
+
+        def undo():
+            limiter.user_requests[1].pop()
+
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        assert not limiter.is_rate_limited(1)
+        undo()
+    elapsed = time.perf_counter() - started
+    return elapsed / CALLS * 1e9
+
+
+def bench_memory(limiter_class):
+    limiter = limiter_class()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for user_id in range(TRACKED_USERS):
+        limiter.is_rate_limited(user_id)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return total / TRACKED_USERS
+
+
+def bench_flood():
+    """Поток одноразовых аккаунтов: память ограничена max_tracked_users и
+    max_blocked_users, а заблокированный ранее нарушитель остается заблокирован"""
+    logging.disable(logging.WARNING)
+    limiter = RateLimiter(max_tracked_users=TRACKED_USERS, max_blocked_users=TRACKED_USERS)
+    limiter.limit_profiles["booking"] = (1, 1)
+    abuser = -1
+    limiter.block_user(abuser)
+    for user_id in range(TRACKED_USERS * 5):
+        limiter.is_rate_limited(user_id, "booking")
+        limiter.is_rate_limited(user_id, "booking")  # второй запрос блокирует
+    logging.disable(logging.NOTSET)
+    return len(limiter.user_requests), len(limiter.blocked_users), limiter.is_user_blocked(abuser)
+
+
+def main():
+    print("⏱ Бенчмарк защиты от спама")
+    print(f"Вызовов: {CALLS}, пользователей для замера памяти: {TRACKED_USERS}\n")
+    for title, limiter_class in (("Счетчики по корзинам (RateLimiter)", RateLimiter),
+                                 ("Списки datetime (прежняя)", ListRateLimiter)):
+        call_ns = bench_call_cost(limiter_class)
+        memory = bench_memory(limiter_class)
+        print(f"{title}:")
+        print(f"   стоимость вызова у лимита: {call_ns:,.0f} нс")
+        print(f"   память на пользователя:    {memory:,.0f} байт (после одного запроса)")
+        if limiter_class is RateLimiter:
+            counts = RequestLog().counts
+            print(f"   счетчики корзин:           {len(counts) * counts.itemsize:,} байт при любых лимитах")
+        print()
+
+    tracked, blocked, abuser_blocked = bench_flood()
+    print(f"Поток из {TRACKED_USERS * 5:,} одноразовых аккаунтов (предел {TRACKED_USERS:,}):")
+    print(f"   отслеживается счетчиков: {tracked:,}, блокировок: {blocked:,}")
+    print(f"   нарушитель, заблокированный до потока, заблокирован: {'да' if abuser_blocked else 'нет'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк рассылки напоминаний на локальном имитаторе Bot API:
+последовательная отправка в цикле против очереди MessageSender
+"""
+
+import asyncio
+import sys
+import os
+import time
+from collections import defaultdict
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from services.sender import MessageSender
+
+MESSAGES = 300  # напоминаний разным пользователям
+ADMIN_MESSAGES = 5  # уведомлений в один чат
+LATENCY = 0.1  # задержка ответа Bot API, с
+TOKEN = "123456:TEST"
+
+
+class FakeBotAPI:
+    """Имитатор sendMessage с ограничениями Telegram: 30 сообщений/с всего и 1/с в чат"""
+
+    def __init__(self):
+        self.sent = 0
+        self.flood_errors = 0
+        self.global_times = []
+        self.chat_times = defaultdict(list)
+
+    def _flooded(self, chat_id, now):
+        self.global_times = [t for t in self.global_times if now - t < 1]
+        chat_times = self.chat_times[chat_id]
+        # Немного мягче 1/с в чат: ответы приходят с разной задержкой
+        return len(self.global_times) >= 31 or (chat_times and now - chat_times[-1] < 0.9)
+
+    async def send_message(self, request):
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        await asyncio.sleep(LATENCY)
+        now = time.monotonic()
+        if self._flooded(chat_id, now):
+            self.flood_errors += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+        self.global_times.append(now)
+        self.chat_times[chat_id].append(now)
+        self.sent += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.sent, "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "text": data.get("text", ""),
+        }})
+
+
+async def run(title, send_all):
+    api = FakeBotAPI()
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendMessage", api.send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+    bot = Bot(TOKEN, session=session)
+    # Уведомления админу приходят вперемешку с напоминаниями
+    chats = list(range(1000, 1000 + MESSAGES))
+    for i in range(ADMIN_MESSAGES):
+        chats.insert(i * (len(chats) // ADMIN_MESSAGES), 1)
+    try:
+        started = time.perf_counter()
+        failed = await send_all(bot, chats)
+        elapsed = time.perf_counter() - started
+    finally:
+        await session.close()
+        await runner.cleanup()
+
+    print(f"{title}:")
+    print(f"   время: {elapsed:.1f} с, доставлено: {api.sent}/{len(chats)}, "
+          f"потеряно: {failed}, ответов 429: {api.flood_errors}")
+
+
+async def sequential(bot, chats):
+    """Прежний способ: send_message по одному в цикле"""
+    failed = 0
+    for chat_id in chats:
+        try:
+            await bot.send_message(chat_id, "Напоминание")
+        except Exception:
+            failed += 1
+    return failed
+
+
+async def queued(bot, chats):
+    sender = MessageSender(bot, concurrency=16)
+    results = await asyncio.gather(*(sender.send_message(chat_id, "Напоминание") for chat_id in chats),
+                                   return_exceptions=True)
+    await sender.close()
+    return sum(isinstance(result, Exception) for result in results)
+
+
+async def main():
+    print("⏱ Бенчмарк рассылки")
+    print(f"Сообщений: {MESSAGES} разным пользователям + {ADMIN_MESSAGES} в один чат, "
+          f"задержка API: {LATENCY * 1000:.0f} мс\n")
+    await run("Последовательно (bot.send_message в цикле)", sequential)
+    await run("Очередь MessageSender", queued)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,20 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand, BotCommandScopeChat
-from config import BOT_TOKEN, ADMIN_ID
-from handlers import user_handlers, admin_handlers
+from aiogram.utils.callback_answer import CallbackAnswerMiddleware
+from config import BOT_TOKEN, ADMIN_ID, STATE_BACKEND, REDIS_URL, ADMIN_DIGEST_MINUTES, ADMIN_DIGEST_MAX_EVENTS, \
+    RUN_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_MAX_CONCURRENT
+from handlers import user_handlers, admin_handlers, fallback_handlers
 from services.scheduler import start_scheduler
 from services.database import db
-from services.rate_limiter import cleanup_task
+from services.sender import sender
+from services.outbox import OutboxWorker
+from services.rate_limiter import cleanup_task, rate_limiter
+from services.state_backend import BackendStorage, create_state_backend
+from services.webhook import run_webhook
+from middlewares.throttling import RateLimitMiddleware
 
 # Настройка логирования
 logging.basicConfig(
@@ -35,6 +41,8 @@ async def setup_bot_commands(bot: Bot):
 
 async def main():
     await db._create_tables()  # Асинхронная инициализация таблиц
+    if not await db.pool.health_check():
+        raise RuntimeError("База данных недоступна")
     if not BOT_TOKEN:
         raise ValueError("BOT_TOKEN не найден в переменных окружения")
     
@@ -43,23 +51,61 @@ async def main():
         default=DefaultBotProperties(parse_mode="HTML")
     )
     
-    # Очищаем webhook при запуске, чтобы избежать обработки накопившихся команд
-    await bot.delete_webhook(drop_pending_updates=True)
-    print("🧹 Webhook очищен, накопившиеся обновления удалены")
+    if RUN_MODE == "polling":
+        # Очищаем webhook при запуске, чтобы избежать обработки накопившихся команд
+        await bot.delete_webhook(drop_pending_updates=True)
+        print("🧹 Webhook очищен, накопившиеся обновления удалены")
     
     # Настраиваем команды бота
     await setup_bot_commands(bot)
     
-    dp = Dispatcher(storage=MemoryStorage())
+    # Состояния FSM и лимиты хранятся в хранилище STATE_BACKEND; общее
+    # хранилище (sqlite, redis) видят все процессы бота и оно переживает перезапуск.
+    # В памяти лимиты считает сам rate_limiter, без обращений к хранилищу
+    backend = create_state_backend(STATE_BACKEND, database=db, redis_url=REDIS_URL)
+    rate_limiter.backend = None if STATE_BACKEND == "memory" else backend
+    dp = Dispatcher(storage=BackendStorage(backend))
+    # Лимиты проверяются один раз на обновление, до роутеров и фильтров
+    dp.update.outer_middleware(RateLimitMiddleware(rate_limiter))
+    # Каждое нажатие кнопки подтверждается после обработчика (answerCallbackQuery)
+    dp.callback_query.middleware(CallbackAnswerMiddleware())
     dp.include_router(user_handlers.router)
     dp.include_router(admin_handlers.router)
+    # Нажатия, не подошедшие ни одному обработчику (кнопки старых сообщений)
+    dp.include_router(fallback_handlers.router)
+    # Напоминания и уведомления админу идут через общую очередь отправки
+    sender.bot = bot
     start_scheduler(bot)
     
-    # Запускаем задачу очистки в фоне
-    asyncio.create_task(cleanup_task())
+    # Запускаем задачу очистки в фоне: лимиты и истекшие состояния FSM
+    cleanup = asyncio.create_task(cleanup_task(backend))
+    # Уведомления админу отправляются из outbox фоновой задачей (сразу или сводкой)
+    outbox_worker = OutboxWorker(
+        db, sender, bot,
+        digest_interval=ADMIN_DIGEST_MINUTES * 60 if ADMIN_DIGEST_MINUTES > 0 else None,
+        digest_max_events=ADMIN_DIGEST_MAX_EVENTS
+    )
+    outbox_task = asyncio.create_task(outbox_worker.run())
     
-    print("Бот запущен с защитой от спама...")
-    await dp.start_polling(bot)
+    print(f"Бот запущен с защитой от спама (режим {RUN_MODE})...")
+    try:
+        if RUN_MODE == "webhook":
+            await run_webhook(
+                dp, bot, WEBHOOK_URL, WEBHOOK_PATH, WEBAPP_HOST, WEBAPP_PORT,
+                secret_token=WEBHOOK_SECRET, max_concurrent=WEBHOOK_MAX_CONCURRENT
+            )
+        else:
+            await dp.start_polling(bot)
+    finally:
+        # Останавливаем фоновые задачи и ждем их завершения, чтобы они
+        # не обращались к уже закрытым хранилищу и БД
+        outbox_task.cancel()
+        cleanup.cancel()
+        await asyncio.gather(outbox_task, cleanup, return_exceptions=True)
+        # Дожидаемся очереди отправки, закрываем хранилище состояния и соединения с БД
+        await sender.close()
+        await backend.close()
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
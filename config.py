@@ -16,3 +16,32 @@ except ValueError:
     raise ValueError("ADMIN_ID должен быть числом")
 
 DATABASE_PATH = "database.sqlite"
+# Профиль хранилища SQLite: "wal" (WAL, synchronous=NORMAL, mmap) или "default"
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "wal")
+# Количество постоянных соединений в пуле БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# Хранилище FSM и лимитов: "memory" (один процесс, без обращений к базе),
+# "sqlite" (таблица kv_store основной базы, переживает перезапуск) или "redis"
+# (несколько процессов/машин, адрес в REDIS_URL)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Сводка для администратора: уведомления копятся и отправляются одним сообщением
+# раз в ADMIN_DIGEST_MINUTES минут или при ADMIN_DIGEST_MAX_EVENTS событиях (0 - сразу)
+ADMIN_DIGEST_MINUTES = int(os.getenv("ADMIN_DIGEST_MINUTES", "0"))
+ADMIN_DIGEST_MAX_EVENTS = int(os.getenv("ADMIN_DIGEST_MAX_EVENTS", "20"))
+# Режим получения обновлений: "polling" (long polling) или "webhook"
+# (встроенный aiohttp-сервер; можно запускать несколько экземпляров за балансировщиком)
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+# Публичный адрес сервера (https://example.com) и путь webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Секрет, который Telegram передает в X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("PORT", "8080"))
+# Сколько обновлений обрабатывается одновременно в режиме webhook
+WEBHOOK_MAX_CONCURRENT = int(os.getenv("WEBHOOK_MAX_CONCURRENT", "50"))
+if RUN_MODE not in ("polling", "webhook"):
+    raise ValueError("RUN_MODE должен быть polling или webhook")
+if RUN_MODE == "webhook" and (not WEBHOOK_URL or not WEBHOOK_SECRET):
+    raise ValueError("Для RUN_MODE=webhook нужны WEBHOOK_URL и WEBHOOK_SECRET")
@@ -6,9 +6,14 @@ import os
 import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from states import AdminStates
-from keyboards.inline_keyboards import get_admin_appointment_keyboard, get_admin_services_keyboard, get_service_edit_keyboard, get_admin_main_keyboard
-from services.database import db
-from services.rate_limiter import rate_limiter
+from handlers.common import edit_anchor
+from keyboards.inline_keyboards import get_admin_services_keyboard, get_service_edit_keyboard, get_admin_main_keyboard, \
+    get_admin_appointments_page_keyboard, get_admin_date_filter_keyboard, get_admin_service_filter_keyboard, \
+    get_admin_slots_page_keyboard
+from keyboards.callbacks import DeleteSlotCallback, AppointmentCallback, AppointmentAction, ServiceAdminCallback, \
+    ServiceAction, AppointmentsPageCallback, AppointmentsFilterCallback, AppointmentsFilter, SlotsPageCallback, iso_from_day
+from services.database import db, BookingStatus
+from services.validation import ValidationError, parse_schedule_template, parse_date_range, parse_masters
 from config import ADMIN_ID
 from datetime import datetime
 
@@ -66,27 +71,15 @@ async def process_add_slot(message: Message, state: FSMContext):
             await message.answer(f"Услуга '{service}' не найдена. Доступные услуги: {available_services}")
             return
         
-        await db.add_slot(date, time, matched_service)
-        
-        # Отправляем уведомление админу о добавлении слота
-        try:
-            if message.bot:
-                slot_notification = (
-                    f"➕ <b>Новый слот добавлен!</b>\n\n"
-                    f"💆‍♀️ <b>Услуга:</b> {matched_service}\n"
-                    f"📅 <b>Дата:</b> {date}\n"
-                    f"⏰ <b>Время:</b> {time}\n"
-                    f"👤 <b>Добавил:</b> Администратор"
-                )
-                
-                await message.bot.send_message(
-                    chat_id=ADMIN_ID,
-                    text=slot_notification,
-                    parse_mode="HTML"
-                )
-                logging.info(f"Отправлено уведомление админу о добавлении слота {date} {time} - {matched_service}")
-        except Exception as e:
-            logging.error(f"Ошибка отправки уведомления админу о слоте: {e}")
+        slot_notification = (
+            f"➕ <b>Новый слот добавлен!</b>\n\n"
+            f"💆‍♀️ <b>Услуга:</b> {matched_service}\n"
+            f"📅 <b>Дата:</b> {date}\n"
+            f"⏰ <b>Время:</b> {time}\n"
+            f"👤 <b>Добавил:</b> Администратор"
+        )
+        # Уведомление админу сохраняется в outbox вместе со слотом и отправляется в фоне
+        await db.add_slot(date, time, matched_service, notification=(ADMIN_ID, "slot_added", slot_notification))
         
         await message.answer(f"✅ Слот добавлен: {date} {time} - {matched_service}")
         await state.clear()
@@ -105,6 +98,30 @@ async def admin_exit(callback: CallbackQuery, state: FSMContext):
 
 
 
+def _clamp_page(page, total, per_page):
+    """Номер страницы в пределах списка из total элементов и число страниц.
+
+    Страница могла опустеть после удаления элементов: тогда показываем последнюю.
+    """
+    pages = (total + per_page - 1) // per_page
+    return max(0, min(page, pages - 1)), pages
+
+
+# Слотов на одной странице выбора для удаления
+SLOTS_PAGE_SIZE = 10
+
+
+async def render_slots_page(page):
+    """Текст и клавиатура страницы предстоящих слотов; None - слотов нет"""
+    slots, total = await db.get_slots_page(page * SLOTS_PAGE_SIZE, SLOTS_PAGE_SIZE)
+    clamped, pages = _clamp_page(page, total, SLOTS_PAGE_SIZE)
+    if clamped != page:
+        return await render_slots_page(clamped)
+    if not slots:
+        return None
+    return f"Выберите слот для удаления (всего {total}):", get_admin_slots_page_keyboard(slots, page, pages)
+
+
 @router.callback_query(F.data == "delete_slot")
 async def delete_slot(callback: CallbackQuery, state: FSMContext):
     if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
@@ -112,107 +129,302 @@ async def delete_slot(callback: CallbackQuery, state: FSMContext):
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
-        
-    slots = await db.get_all_slots()
-    if not slots:
+
+    # Слоты выводятся по страницам: клавиатура Telegram ограничена по числу кнопок
+    rendered = await render_slots_page(0)
+    if rendered is None:
         await callback.message.answer("Нет доступных слотов")
         return
 
-    buttons = []
-    for slot in slots:
-        buttons.append([
-            InlineKeyboardButton(
-                text=f"{slot[1]} {slot[2]} ({slot[3]})",
-                callback_data=f"delete_{slot[0]}"
-            )
-        ])
-
-    await callback.message.answer("Выберите слот для удаления:",
-                                     reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+    text, keyboard = rendered
+    await edit_anchor(callback.message, text, keyboard)
     await state.set_state(AdminStates.DELETE_SLOT)
 
 
-@router.callback_query(F.data.startswith("delete_"), AdminStates.DELETE_SLOT)
-async def confirm_delete(callback: CallbackQuery, state: FSMContext):
-    if callback.data is None or callback.message is None:
+@router.callback_query(SlotsPageCallback.filter(), AdminStates.DELETE_SLOT)
+async def slots_page(callback: CallbackQuery, callback_data: SlotsPageCallback):
+    if not _is_admin_callback(callback):
+        return
+    rendered = await render_slots_page(max(callback_data.page, 0))
+    if rendered is None:
+        await edit_anchor(callback.message, "Нет доступных слотов", None)
+        return
+    await edit_anchor(callback.message, *rendered)
+
+
+@router.callback_query(DeleteSlotCallback.filter(), AdminStates.DELETE_SLOT)
+async def confirm_delete(callback: CallbackQuery, callback_data: DeleteSlotCallback, state: FSMContext):
+    if callback.message is None:
         return
         
-    slot_id = int(callback.data.split("_")[1])
+    slot_id = callback_data.slot_id
     
     # Получаем информацию о слоте перед удалением
-    slots = await db.get_all_slots()
-    slot_to_delete = next((slot for slot in slots if slot[0] == slot_id), None)
-    
-    await db.delete_slot(slot_id)
+    slot_to_delete = await db.get_slot_by_id(slot_id)
+    
+    notification = None
+    if slot_to_delete:
+        slot_notification = (
+            f"➖ <b>Слот удален!</b>\n\n"
+            f"💆‍♀️ <b>Услуга:</b> {slot_to_delete[3]}\n"
+            f"📅 <b>Дата:</b> {slot_to_delete[1]}\n"
+            f"⏰ <b>Время:</b> {slot_to_delete[2]}\n"
+            f"👤 <b>Удалил:</b> Администратор"
+        )
+        notification = (ADMIN_ID, "slot_deleted", slot_notification)
     
-    # Отправляем уведомление админу об удалении слота
-    if slot_to_delete and callback.message and callback.message.bot:
-        try:
-            slot_notification = (
-                f"➖ <b>Слот удален!</b>\n\n"
-                f"💆‍♀️ <b>Услуга:</b> {slot_to_delete[3]}\n"
-                f"📅 <b>Дата:</b> {slot_to_delete[1]}\n"
-                f"⏰ <b>Время:</b> {slot_to_delete[2]}\n"
-                f"👤 <b>Удалил:</b> Администратор"
-            )
-            
-            await callback.message.bot.send_message(
-                chat_id=ADMIN_ID,
-                text=slot_notification,
-                parse_mode="HTML"
-            )
-            logging.info(f"Отправлено уведомление админу об удалении слота {slot_to_delete[1]} {slot_to_delete[2]} - {slot_to_delete[3]}")
-        except Exception as e:
-            logging.error(f"Ошибка отправки уведомления админу об удалении слота: {e}")
+    # Уведомление админу сохраняется в outbox вместе с удалением и отправляется в фоне
+    await db.delete_slot(slot_id, notification=notification)
     
     await callback.message.answer("Слот удален!")
     await state.clear()
 
 
-@router.callback_query(F.data == "view_appointments")
-async def view_appointments(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None:
+def _is_admin_callback(callback: CallbackQuery) -> bool:
+    return callback.message is not None and callback.from_user is not None and callback.from_user.id == ADMIN_ID
+
+
+WEEKDAY_SHORT_NAMES = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+
+def format_schedule_template(template):
+    """Шаблон в том же виде, в котором его вводят: по строке на день"""
+    by_day = {}
+    for weekday, start_time, end_time in template:
+        by_day.setdefault(weekday, []).append(f"{start_time}-{end_time}")
+    return "\n".join(f"{WEEKDAY_SHORT_NAMES[day]} {', '.join(hours)}" for day, hours in sorted(by_day.items()))
+
+
+@router.callback_query(F.data == "schedule_template")
+async def schedule_template(callback: CallbackQuery, state: FSMContext):
+    if not _is_admin_callback(callback):
+        return
+
+    template = await db.get_schedule_template()
+    current = format_schedule_template(template) if template else "не задан"
+    await callback.message.answer(
+        f"🗓 <b>Шаблон рабочих часов</b>\n\n{current}\n\n"
+        "Отправьте новый шаблон: по строке на день или диапазон дней, "
+        "перерывы - через запятую.\n\n"
+        "Пример:\nпн-пт 10:00-14:00, 15:00-19:00\nсб 10:00-16:00",
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminStates.EDIT_TEMPLATE)
+
+
+@router.message(AdminStates.EDIT_TEMPLATE)
+async def process_schedule_template(message: Message, state: FSMContext):
+    if message.text is None:
+        await message.answer("Пожалуйста, введите текст.")
+        return
+
+    try:
+        template = parse_schedule_template(message.text)
+    except ValidationError as e:
+        await message.answer(f"❌ {e}")
         return
-        
-    appointments = await db.get_all_appointments()
 
+    await db.set_schedule_template(template)
+    await message.answer(f"✅ Шаблон сохранен:\n\n{format_schedule_template(template)}")
+    await state.clear()
+
+
+@router.callback_query(F.data == "generate_slots")
+async def generate_slots(callback: CallbackQuery, state: FSMContext):
+    if not _is_admin_callback(callback):
+        return
+
+    if not await db.get_schedule_template():
+        await callback.message.answer("Сначала задайте шаблон расписания.")
+        return
+    await callback.message.answer(
+        "Введите диапазон дат и, при необходимости, услугу (через запятую):\n\n"
+        "Пример: 01.07.2025-14.07.2025\n"
+        "или: 01.07.2025-14.07.2025,Маникюр"
+    )
+    await state.set_state(AdminStates.GENERATE_SLOTS)
+
+
+@router.message(AdminStates.GENERATE_SLOTS)
+async def process_generate_slots(message: Message, state: FSMContext):
+    if message.text is None:
+        await message.answer("Пожалуйста, введите текст.")
+        return
+
+    date_range, _, service_name = message.text.partition(",")
+    try:
+        start, end = parse_date_range(date_range)
+    except ValidationError as e:
+        await message.answer(f"❌ {e}")
+        return
+
+    services = await db.get_all_services()
+    if service_name.strip():
+        service = await db.get_service_by_name(service_name.strip())
+        if not service:
+            available_services = ", ".join([s[1] for s in services])
+            await message.answer(f"Услуга '{service_name.strip()}' не найдена. Доступные услуги: {available_services}")
+            return
+        services = [service]
+
+    created = await db.generate_slots(start, end, services)
+    await message.answer(
+        f"✅ Создано слотов: {created}\n"
+        f"📅 {start.strftime('%d.%m.%Y')} - {end.strftime('%d.%m.%Y')}, "
+        f"услуги: {', '.join(s[1] for s in services)}"
+    )
+    await state.clear()
+
+
+def format_masters(masters):
+    """Состав мастеров в том же виде, в котором его вводят"""
+    return "\n".join(f"{name}: {', '.join(services) or 'нет услуг'}" for _, name, services in masters)
+
+
+@router.callback_query(F.data == "masters")
+async def masters(callback: CallbackQuery, state: FSMContext):
+    if not _is_admin_callback(callback):
+        return
+
+    current = await db.get_masters()
+    await callback.message.answer(
+        f"👩‍🎨 <b>Мастера</b>\n\n{format_masters(current) if current else 'не заведены (одно рабочее место)'}\n\n"
+        "Отправьте состав мастеров: по строке на мастера, услуги через запятую. "
+        "Мастера, которых нет в списке, перестанут получать записи. "
+        "Чтобы работать без мастеров, отправьте «нет».\n\n"
+        "Пример:\nАнна: Маникюр, Педикюр\nОльга: Массаж лица, Чистка лица",
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminStates.EDIT_MASTERS)
+
+
+@router.message(AdminStates.EDIT_MASTERS)
+async def process_masters(message: Message, state: FSMContext):
+    if message.text is None:
+        await message.answer("Пожалуйста, введите текст.")
+        return
+
+    try:
+        parsed = parse_masters(message.text)
+    except ValidationError as e:
+        await message.answer(f"❌ {e}")
+        return
+
+    roster = []
+    for name, service_names in parsed:
+        service_ids = []
+        for service_name in service_names:
+            service = await db.get_service_by_name(service_name)
+            if not service:
+                available_services = ", ".join([s[1] for s in await db.get_all_services()])
+                await message.answer(f"Услуга '{service_name}' не найдена. Доступные услуги: {available_services}")
+                return
+            service_ids.append(service[0])
+        roster.append((name, service_ids))
+
+    await db.set_masters(roster)
+    current = await db.get_masters()
+    await message.answer(f"✅ Мастера сохранены:\n\n{format_masters(current) if current else 'не заведены'}")
+    await state.clear()
+
+
+# Записей на одной странице просмотра
+APPOINTMENTS_PAGE_SIZE = 5
+
+
+async def render_appointments_page(page, day, service_id):
+    """Текст и клавиатура страницы записей с учетом фильтров (0 - без фильтра)"""
+    service = await db.get_service_by_id(service_id) if service_id else None
+    service_name = service[1] if service else None
+    date_iso = iso_from_day(day) if day else None
+
+    appointments, total = await db.get_appointments_page(
+        page * APPOINTMENTS_PAGE_SIZE, APPOINTMENTS_PAGE_SIZE, date_iso=date_iso, service=service_name
+    )
+    clamped, pages = _clamp_page(page, total, APPOINTMENTS_PAGE_SIZE)
+    if clamped != page:
+        return await render_appointments_page(clamped, day, service_id)
+
+    date_text = datetime.strptime(date_iso, "%Y-%m-%d").strftime("%d.%m.%Y") if date_iso else "предстоящие"
+    lines = [
+        f"📋 Записи: {total}",
+        f"📅 {date_text} • 💆 {service_name or 'все услуги'}",
+        ""
+    ]
     if not appointments:
-        await callback.message.answer("Нет записей")
-        return
-
-    for appt in appointments:
-        # Убедитесь, что индексы соответствуют структуре БД
-        message_text = (
-            f"👤 ФИО: {appt[5] if appt[5] else 'Не указано'}\n"
-            f"📱 Телефон: {appt[7] if appt[7] else 'Не указан'}\n"
-            f"⚠️ Аллергии: {appt[6] if appt[6] in ['Да', 'Нет'] else 'Не указано'}\n"
-            f"💆‍♂️ Услуга: {appt[2]}\n"
-            f"📅 Дата: {appt[3]}\n"
-            f"⏰ Время: {appt[4]}\n"
+        lines.append("Нет записей")
+    for number, appt in enumerate(appointments, start=1):
+        # appt[13] - имя мастера записи
+        master_line = f"   👩‍🎨 Мастер: {appt[13]}\n" if appt[13] else ""
+        lines.append(
+            f"{number}. {appt[3]} {appt[4]} — {appt[2]}\n"
+            f"   👤 {appt[5] if appt[5] else 'Не указано'}\n"
+            f"{master_line}"
+            f"   📱 {appt[7] if appt[7] else 'Не указан'}\n"
+            f"   ⚠️ Аллергии: {appt[6] if appt[6] in ['Да', 'Нет'] else 'Не указано'}"
         )
+    keyboard = get_admin_appointments_page_keyboard(appointments, page, pages, day, service_id)
+    return "\n".join(lines), keyboard
 
-        action_keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_appt_{appt[0]}")],
-                [InlineKeyboardButton(text="🔄 Перенести", callback_data=f"move_appt_{appt[0]}")]
-            ]
+
+@router.callback_query(F.data == "view_appointments")
+async def view_appointments(callback: CallbackQuery, state: FSMContext):
+    if not _is_admin_callback(callback):
+        return
+
+    # Все записи помещаются в одно сообщение, листание редактирует его на месте
+    text, keyboard = await render_appointments_page(0, 0, 0)
+    await edit_anchor(callback.message, text, keyboard)
+
+
+@router.callback_query(AppointmentsPageCallback.filter())
+async def appointments_page(callback: CallbackQuery, callback_data: AppointmentsPageCallback):
+    if not _is_admin_callback(callback):
+        return
+    try:
+        text, keyboard = await render_appointments_page(
+            max(callback_data.page, 0), callback_data.day, callback_data.service_id
         )
+    except ValueError:
+        logging.warning(f"Некорректные данные страницы записей: {callback.data}")
+        return
+    await edit_anchor(callback.message, text, keyboard)
+
+
+@router.callback_query(AppointmentsFilterCallback.filter(F.kind == AppointmentsFilter.DATES))
+async def appointments_date_filter(callback: CallbackQuery, callback_data: AppointmentsFilterCallback):
+    if not _is_admin_callback(callback):
+        return
+    service_id = callback_data.service_id
+    service = await db.get_service_by_id(service_id) if service_id else None
+    dates = await db.get_appointment_dates(service=service[1] if service else None)
+    await edit_anchor(callback.message, "Выберите дату:", get_admin_date_filter_keyboard(dates, service_id))
+
+
+@router.callback_query(AppointmentsFilterCallback.filter(F.kind == AppointmentsFilter.SERVICES))
+async def appointments_service_filter(callback: CallbackQuery, callback_data: AppointmentsFilterCallback):
+    if not _is_admin_callback(callback):
+        return
+    services = await db.get_all_services_admin()
+    await edit_anchor(
+        callback.message, "Выберите услугу:", get_admin_service_filter_keyboard(services, callback_data.day)
+    )
 
-        await callback.message.answer(message_text, reply_markup=action_keyboard)
 
-    await callback.message.answer("Все записи отправлены выше.")
+@router.callback_query(F.data == "appts_noop")
+async def appointments_noop(callback: CallbackQuery):
+    """Номер страницы: нажатие только подтверждается (CallbackAnswerMiddleware)"""
 
 
-@router.callback_query(F.data.startswith("delete_appt_"))
-async def handle_delete_appt(callback: CallbackQuery):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(AppointmentCallback.filter(F.action == AppointmentAction.DELETE))
+async def handle_delete_appt(callback: CallbackQuery, callback_data: AppointmentCallback):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к delete_appt: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
-    appt_id = int(callback.data.replace("delete_appt_", ""))
-    appointments = await db.get_all_appointments()
-    appt = next((a for a in appointments if a[0] == appt_id), None)
+    appt_id = callback_data.appointment_id
+    appt = await db.get_appointment_by_id(appt_id)
     if not appt:
         logging.warning(f"Попытка удалить несуществующую запись: {appt_id}")
         await callback.message.answer("Запись не найдена.")
@@ -220,16 +432,15 @@ async def handle_delete_appt(callback: CallbackQuery):
     await db.delete_appointment(appt_id)
     await callback.message.answer("✅ Запись удалена")
 
-@router.callback_query(F.data.startswith("move_appt_"))
-async def move_appointment_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(AppointmentCallback.filter(F.action == AppointmentAction.MOVE))
+async def move_appointment_start(callback: CallbackQuery, callback_data: AppointmentCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к move_appt: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
-    appt_id = int(callback.data.replace("move_appt_", ""))
-    appointments = await db.get_all_appointments()
-    appt = next((a for a in appointments if a[0] == appt_id), None)
+    appt_id = callback_data.appointment_id
+    appt = await db.get_appointment_by_id(appt_id)
     if not appt:
         logging.warning(f"Попытка перенести несуществующую запись: {appt_id}")
         await callback.message.answer("Запись не найдена.")
@@ -248,32 +459,29 @@ async def move_appointment_process(message: Message, state: FSMContext):
         
     try:
         date, time = message.text.split(",")
+        date = date.strip()
+        time = time.strip()
         data = await state.get_data()
         appt_id = data["move_appt_id"]
         # Получаем старую запись
-        appointments = await db.get_all_appointments()
-        appt = next((a for a in appointments if a[0] == appt_id), None)
+        appt = await db.get_appointment_by_id(appt_id)
         if not appt:
             await message.answer("Запись не найдена.")
             await state.clear()
             return
         # Проверяем, есть ли свободный слот
-        slots = await db.get_all_slots()
-        slot_exists = any(s[1] == date.strip() and s[2] == time.strip() and s[3] == appt[2] and not s[4] for s in slots)
-        if not slot_exists:
+        if not await db.find_free_slot(date, time, appt[2]):
+            await message.answer("Нет свободного окна для этой услуги на выбранные дату и время.")
+            return
+        # Переносим запись: новый слот занимается, старый освобождается в одной транзакции
+        status = await db.move_appointment(appt_id, date, time)
+        if status == BookingStatus.APPOINTMENT_NOT_FOUND:
+            await message.answer("Запись не найдена.")
+            await state.clear()
+            return
+        if status != BookingStatus.OK:
             await message.answer("Нет свободного окна для этой услуги на выбранные дату и время.")
             return
-        # Обновляем запись (удаляем старую, создаём новую)
-        await db.delete_appointment(appt_id)
-        await db.add_appointment(
-            user_id=appt[1],
-            service=appt[2],
-            date=date.strip(),
-            time=time.strip(),
-            fio=appt[5],
-            allergies=appt[6],
-            phone=appt[7]
-        )
         await message.answer("Запись успешно перенесена!")
         await state.clear()
     except Exception as e:
@@ -320,10 +528,6 @@ async def add_service_process(message: Message, state: FSMContext):
             description = parts[1].strip()
             duration = int(parts[2].strip())
             price = float(parts[3].strip())
-            
-            if rate_limiter.is_rate_limited(message.from_user.id):
-                await message.answer("Слишком много действий. Попробуйте позже.")
-                return
 
             success = await db.add_service(name, description, duration, price)
             if success:
@@ -340,15 +544,15 @@ async def add_service_process(message: Message, state: FSMContext):
     
     await state.clear()
 
-@router.callback_query(F.data.startswith("edit_service_"))
-async def edit_service_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.EDIT))
+async def edit_service_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_service: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("edit_service_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -371,15 +575,15 @@ async def edit_service_start(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_service_edit_keyboard(service_id)
     )
 
-@router.callback_query(F.data.startswith("delete_service_"))
-async def delete_service_confirm(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.DELETE))
+async def delete_service_confirm(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к delete_service: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("delete_service_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -393,15 +597,15 @@ async def delete_service_confirm(callback: CallbackQuery, state: FSMContext):
     else:
         await callback.message.answer("❌ Ошибка при удалении услуги.")
 
-@router.callback_query(F.data.startswith("edit_name_"))
-async def edit_service_name_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.NAME))
+async def edit_service_name_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_name: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("edit_name_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -413,15 +617,15 @@ async def edit_service_name_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите новое название услуги:")
     await state.set_state(AdminStates.EDIT_SERVICE)
 
-@router.callback_query(F.data.startswith("edit_desc_"))
-async def edit_service_desc_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.DESCRIPTION))
+async def edit_service_desc_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_desc: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("edit_desc_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -433,15 +637,15 @@ async def edit_service_desc_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите новое описание услуги:")
     await state.set_state(AdminStates.EDIT_SERVICE)
 
-@router.callback_query(F.data.startswith("edit_duration_"))
-async def edit_service_duration_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.DURATION))
+async def edit_service_duration_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_duration: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("edit_duration_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -453,15 +657,15 @@ async def edit_service_duration_start(callback: CallbackQuery, state: FSMContext
     await callback.message.answer("Введите новую длительность услуги (в минутах):")
     await state.set_state(AdminStates.EDIT_SERVICE)
 
-@router.callback_query(F.data.startswith("edit_price_"))
-async def edit_service_price_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.PRICE))
+async def edit_service_price_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_price: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("edit_price_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -472,15 +676,15 @@ async def edit_service_price_start(callback: CallbackQuery, state: FSMContext):
     await state.update_data(edit_service_id=service_id, edit_field="price")
     await callback.message.answer("Введите новую цену услуги:")
 
-@router.callback_query(F.data.startswith("toggle_active_"))
-async def toggle_service_active(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.TOGGLE))
+async def toggle_service_active(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к toggle_active: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
-    service_id = int(callback.data.replace("toggle_active_", ""))
+    service_id = callback_data.service_id
     service = await db.get_service_by_id(service_id)
     
     if not service:
@@ -497,16 +701,16 @@ async def toggle_service_active(callback: CallbackQuery, state: FSMContext):
     else:
         await callback.message.answer("❌ Ошибка при изменении статуса услуги.")
 
-@router.callback_query(F.data.startswith("edit_photo_"))
-async def edit_service_photo_start(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID or callback.data is None:
+@router.callback_query(ServiceAdminCallback.filter(F.action == ServiceAction.PHOTO))
+async def edit_service_photo_start(callback: CallbackQuery, callback_data: ServiceAdminCallback, state: FSMContext):
+    if callback.message is None or callback.from_user is None or callback.from_user.id != ADMIN_ID:
         logging.warning(f"Попытка доступа к edit_photo: {getattr(callback.from_user, 'id', None)}")
         if callback.message:
             await callback.message.answer("Нет доступа.")
         return
     
     try:
-        service_id = int(callback.data.replace("edit_photo_", ""))
+        service_id = callback_data.service_id
         service = await db.get_service_by_id(service_id)
         
         if not service:
@@ -570,6 +774,9 @@ async def edit_service_photo_process(message: Message, state: FSMContext):
         
         # Обновляем путь к фотографии в базе данных
         success = await db.update_service(service_id, photo_path=filename)
+        if success:
+            # Фото уже есть на серверах Telegram, повторно загружать его не нужно
+            await db.set_service_photo_file_id(service_id, photo.file_id)
         
         if success:
             await message.answer(
@@ -613,6 +820,7 @@ async def edit_service_photo_text(message: Message, state: FSMContext):
             
             # Обновляем базу данных
             success = await db.update_service(service_id, photo_path=None)
+            await db.set_service_photo_file_id(service_id, None)
             
             if success:
                 await message.answer(f"✅ Фотография для услуги '{service[1]}' удалена.")
@@ -704,6 +912,9 @@ async def manage_appointments(callback: CallbackQuery, state: FSMContext):
                 [InlineKeyboardButton(text="➕ Добавить слот", callback_data="add_slot")],
                 [InlineKeyboardButton(text="➖ Удалить слот", callback_data="delete_slot")],
                 [InlineKeyboardButton(text="📋 Просмотр записей", callback_data="view_appointments")],
+                [InlineKeyboardButton(text="🗓 Шаблон расписания", callback_data="schedule_template")],
+                [InlineKeyboardButton(text="⚙️ Сгенерировать слоты", callback_data="generate_slots")],
+                [InlineKeyboardButton(text="👩‍🎨 Мастера", callback_data="masters")],
                 [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin")]
             ]
         )
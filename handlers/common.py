@@ -0,0 +1,29 @@
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+# Максимальная длина подписи к фото
+CAPTION_LIMIT = 1024
+
+
+async def edit_anchor(message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                      **kwargs) -> None:
+    """Показывает следующий шаг в том же сообщении вместо отправки нового.
+
+    У сообщения с фото заменяется подпись, у текстового - текст; клавиатура
+    заменяется вместе с ними. Если сообщение нельзя отредактировать (слишком
+    старое, подпись длиннее лимита), отправляется новое сообщение.
+    """
+    try:
+        if message.photo:
+            if len(text) > CAPTION_LIMIT:
+                await message.answer(text, reply_markup=reply_markup, **kwargs)
+                return
+            await message.edit_caption(caption=text, reply_markup=reply_markup, **kwargs)
+        else:
+            await message.edit_text(text, reply_markup=reply_markup, **kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
+        await message.answer(text, reply_markup=reply_markup, **kwargs)
@@ -0,0 +1,22 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery
+from aiogram.utils.callback_answer import CallbackAnswer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Подключается последним: сюда попадают нажатия, которые не подошли ни одному обработчику
+router = Router()
+
+
+@router.callback_query(F.data == "none")
+async def inactive_button(callback: CallbackQuery):
+    """Информационные кнопки ("Нет доступных дат") ничего не делают: нажатие подтверждает CallbackAnswerMiddleware"""
+
+
+@router.callback_query()
+async def stale_callback(callback: CallbackQuery, callback_answer: CallbackAnswer):
+    """Кнопки старых сообщений: прежний формат callback_data или завершенный шаг записи"""
+    logger.info(f"Устаревшая кнопка от {callback.from_user.id}: {callback.data}")
+    callback_answer.text = "Эта кнопка устарела. Начните заново: /start"
+    callback_answer.show_alert = True
@@ -1,6 +1,8 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.utils.callback_answer import CallbackAnswer
 import sys
 import os
 import logging
@@ -8,12 +10,16 @@ import aiosqlite
 from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from states import AppointmentStates
-from keyboards.inline_keyboards import get_service_keyboard, send_services_with_photos, get_date_keyboard, get_time_keyboard, \
-    get_confirmation_keyboard, get_allergies_keyboard
-from services.database import db
+from handlers.common import edit_anchor
+from keyboards.inline_keyboards import get_service_keyboard, send_services_with_photos, get_available_calendar_keyboard, \
+    get_available_time_keyboard, get_confirmation_keyboard, get_allergies_keyboard
+from keyboards.callbacks import ServiceCallback, DateCallback, CalendarCallback, TimeCallback, BackToDateCallback, \
+    CancelAppointmentCallback, date_from_day, time_from_minute, month_from_index
+from services.database import db, BookingStatus
+from config import ADMIN_ID
 from services.validation import (
     validate_fio, validate_phone, validate_date, validate_time, 
-    validate_service, sanitize_input, validate_callback_data, ValidationError
+    validate_service, sanitize_input, ValidationError
 )
 from services.rate_limiter import rate_limiter
 from aiogram.utils.formatting import Bold, Text
@@ -22,6 +28,21 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Сообщения пользователю при неудачном бронировании
+BOOKING_ERRORS = {
+    BookingStatus.SLOT_TAKEN: "Ошибка записи: Этот слот уже занят. Выберите другое время.",
+    BookingStatus.SLOT_NOT_FOUND: "Ошибка записи: Выбранный слот недоступен",
+    BookingStatus.DUPLICATE: "Ошибка записи: У вас уже есть запись на это время",
+    BookingStatus.LIMIT_REACHED: "У вас уже 3 активные записи. Нельзя больше.",
+}
+
+
+async def get_active_service(service_id):
+    """Активная услуга по id из кэша каталога (None, если ее нет или она отключена)"""
+    service = await db.get_service_by_id(service_id)
+    return service if service and service[6] else None
+
+
 @router.message(F.text == "/start")
 async def start(message: Message, state: FSMContext):
     if not message.from_user:
@@ -29,16 +50,6 @@ async def start(message: Message, state: FSMContext):
     
     user_id = message.from_user.id
     
-    # Проверяем защиту от спама
-    if rate_limiter.is_rate_limited(user_id):
-        await message.answer("Слишком много запросов. Попробуйте позже.")
-        return
-    
-    # Проверяем, не заблокирован ли пользователь
-    if rate_limiter.is_user_blocked(user_id):
-        await message.answer("Вы заблокированы за нарушение правил. Попробуйте позже.")
-        return
-    
     try:
         await state.clear()
         rate_limiter.set_user_state(user_id, "SELECT_SERVICE")
@@ -109,8 +120,7 @@ async def my_bookings(message: Message):
     user_id = message.from_user.id
     
     try:
-        appointments = await db.get_all_appointments()
-        user_appointments = [apt for apt in appointments if apt[1] == user_id]
+        user_appointments = await db.get_appointments_for_user(user_id)
         
         if not user_appointments:
             await message.answer("У вас пока нет активных записей.\n\nНажмите /start чтобы записаться на услугу!")
@@ -139,8 +149,7 @@ async def cancel_booking_start(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     try:
-        appointments = await db.get_all_appointments()
-        user_appointments = [apt for apt in appointments if apt[1] == user_id]
+        user_appointments = await db.get_appointments_for_user(user_id)
         
         if not user_appointments:
             await message.answer("У вас нет активных записей для отмены.")
@@ -170,7 +179,7 @@ async def cancel_booking_start(message: Message, state: FSMContext):
             button_text = f"{apt[2]} - {apt[3]} {apt[4]}"
             buttons.append([InlineKeyboardButton(
                 text=button_text,
-                callback_data=f"cancel_apt_{apt[0]}"
+                callback_data=CancelAppointmentCallback(appointment_id=apt[0]).pack()
             )])
         
         buttons.append([InlineKeyboardButton(text="🔙 Отмена", callback_data="cancel_cancel")])
@@ -186,25 +195,24 @@ async def cancel_booking_start(message: Message, state: FSMContext):
         logging.error(f"Ошибка при отмене записи: {e}")
         await message.answer("Произошла ошибка при отмене записи.")
 
-@router.callback_query(F.data.startswith("cancel_apt_"))
-async def cancel_booking_confirm(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.data is None:
+@router.callback_query(CancelAppointmentCallback.filter())
+async def cancel_booking_confirm(callback: CallbackQuery, callback_data: CancelAppointmentCallback, state: FSMContext):
+    if callback.message is None:
         return
     
     try:
-        apt_id = int(callback.data.replace("cancel_apt_", ""))
+        apt_id = callback_data.appointment_id
         
         # Получаем запись
-        appointments = await db.get_all_appointments()
-        appointment = next((apt for apt in appointments if apt[0] == apt_id), None)
+        appointment = await db.get_appointment_by_id(apt_id)
         
         if not appointment:
-            await callback.message.answer("❌ Запись не найдена.")
+            await edit_anchor(callback.message, "❌ Запись не найдена.")
             return
         
         # Проверяем права пользователя
         if appointment[1] != callback.from_user.id:
-            await callback.message.answer("❌ Вы не можете отменить чужую запись.")
+            await edit_anchor(callback.message, "❌ Вы не можете отменить чужую запись.")
             return
         
         # Проверяем время (не менее 2 часов)
@@ -212,40 +220,27 @@ async def cancel_booking_confirm(callback: CallbackQuery, state: FSMContext):
         apt_datetime = datetime.strptime(f"{appointment[3]} {appointment[4]}", "%d.%m.%Y %H:%M")
         
         if apt_datetime <= now + timedelta(hours=2):
-            await callback.message.answer("⚠️ Отмена записи возможна не менее чем за 2 часа до приема.")
+            await edit_anchor(callback.message, "⚠️ Отмена записи возможна не менее чем за 2 часа до приема.")
             return
         
-        # Отменяем запись
-        await db.delete_appointment(apt_id)
-        
-        # Освобождаем слот
-        await db.mark_slot_as_available(appointment[3], appointment[4], appointment[2])
-        
-        # Отправляем уведомление админу об отмене
-        try:
-            from config import ADMIN_ID
-            if callback.message and callback.message.bot:
-                cancel_notification = (
-                    f"❌ <b>Запись отменена клиентом!</b>\n\n"
-                    f"👤 <b>Клиент:</b> {appointment[5]}\n"
-                    f"📱 <b>Телефон:</b> {appointment[7]}\n"
-                    f"💆‍♀️ <b>Услуга:</b> {appointment[2]}\n"
-                    f"📅 <b>Дата:</b> {appointment[3]}\n"
-                    f"⏰ <b>Время:</b> {appointment[4]}\n"
-                    f"🆔 <b>ID пользователя:</b> {appointment[1]}\n\n"
-                    f"✅ Слот освобожден для других клиентов"
-                )
-                
-                await callback.message.bot.send_message(
-                    chat_id=ADMIN_ID,
-                    text=cancel_notification,
-                    parse_mode="HTML"
-                )
-                logging.info(f"Отправлено уведомление админу об отмене записи пользователем {appointment[1]}")
-        except Exception as e:
-            logging.error(f"Ошибка отправки уведомления админу об отмене: {e}")
-        
-        await callback.message.answer(
+        cancel_notification = (
+            f"❌ <b>Запись отменена клиентом!</b>\n\n"
+            f"👤 <b>Клиент:</b> {appointment[5]}\n"
+            f"📱 <b>Телефон:</b> {appointment[7]}\n"
+            f"💆‍♀️ <b>Услуга:</b> {appointment[2]}\n"
+            f"📅 <b>Дата:</b> {appointment[3]}\n"
+            f"⏰ <b>Время:</b> {appointment[4]}\n"
+            f"🆔 <b>ID пользователя:</b> {appointment[1]}\n\n"
+            f"✅ Слот освобожден для других клиентов"
+        )
+        
+        # Отменяем запись и освобождаем слот; уведомление админу уходит через outbox
+        if not await db.cancel_appointment(apt_id, notification=(ADMIN_ID, "cancel", cancel_notification)):
+            await edit_anchor(callback.message, "❌ Запись не найдена.")
+            return
+        
+        await edit_anchor(
+            callback.message,
             f"<b>Запись отменена!</b>\n\n"
             f"{appointment[2]}\n"
             f"{appointment[3]} в {appointment[4]}\n\n"
@@ -255,94 +250,105 @@ async def cancel_booking_confirm(callback: CallbackQuery, state: FSMContext):
         
     except Exception as e:
         logging.error(f"Ошибка при подтверждении отмены: {e}")
-        await callback.message.answer("Произошла ошибка при отмене записи.")
+        await edit_anchor(callback.message, "Произошла ошибка при отмене записи.")
 
 @router.callback_query(F.data == "cancel_cancel")
 async def cancel_cancel_booking(callback: CallbackQuery, state: FSMContext):
     if callback.message is None:
         return
     
-    await callback.message.answer("Отмена записи прервана.")
+    await edit_anchor(callback.message, "Отмена записи прервана.")
 
-@router.callback_query(F.data.startswith("service_"))
-async def select_service(callback: CallbackQuery, state: FSMContext):
-    if callback.data is None or callback.message is None or not callback.from_user:
+@router.callback_query(ServiceCallback.filter())
+async def select_service(callback: CallbackQuery, callback_data: ServiceCallback, state: FSMContext):
+    if callback.message is None or not callback.from_user:
         return
     user_id = callback.from_user.id
-    # Проверяем защиту от спама
-    if rate_limiter.is_rate_limited(user_id):
-        await callback.message.answer("Слишком много запросов. Попробуйте позже.")
-        return
     try:
-        service_parts = validate_callback_data(callback.data, "service_")
-        if not service_parts:
-            await callback.message.answer("Неверные данные. Попробуйте еще раз.")
-            return
-        service = await validate_service(service_parts[0])
-        # Проверяем, что услуга реально есть в базе
-        from services.database import db
-        all_services = await db.get_all_services()
-        if not any(s[1] == service for s in all_services):
-            logging.warning(f"Пользователь {user_id} выбрал несуществующую услугу: {service}")
+        # Услуга берется из кэша каталога по id, без разбора названия
+        service = await get_active_service(callback_data.service_id)
+        if service is None:
+            logging.warning(f"Пользователь {user_id} выбрал несуществующую услугу: {callback_data.service_id}")
             await state.clear()
-            await callback.message.answer("Услуга не найдена. Начните сначала.")
+            await edit_anchor(callback.message, "Услуга не найдена. Начните сначала.")
             return
-        await state.update_data(service=service)
+        await state.update_data(service=service[1])
         rate_limiter.set_user_state(user_id, "ENTER_DATE")
-        dates = await db.get_available_dates(service)
-        await callback.message.answer(
-            f"📅 Выберите удобную дату для услуги «{service}»:",
-            reply_markup=get_date_keyboard(service, dates)
+        await edit_anchor(
+            callback.message,
+            f"📅 Выберите удобную дату для услуги «{service[1]}»:",
+            reply_markup=await get_available_calendar_keyboard(service)
         )
         await state.set_state(AppointmentStates.ENTER_DATE)
-    except ValidationError as e:
-        await callback.message.answer(f"Ошибка валидации: {e}")
     except Exception as e:
         logging.error(f"Ошибка в select_service: {e}")
-        await callback.message.answer("Произошла ошибка. Попробуйте позже.")
+        await edit_anchor(callback.message, "Произошла ошибка. Попробуйте позже.")
 
-@router.callback_query(F.data.startswith("date_"), AppointmentStates.ENTER_DATE)
-async def select_date(callback: CallbackQuery, state: FSMContext):
-    if callback.data is None or callback.message is None:
+@router.callback_query(CalendarCallback.filter(), AppointmentStates.ENTER_DATE)
+async def switch_calendar_month(callback: CallbackQuery, callback_data: CalendarCallback,
+                                callback_answer: CallbackAnswer):
+    """Листание календаря: клавиатура того же сообщения заменяется на другой месяц"""
+    if callback.message is None:
+        return
+    service = await get_active_service(callback_data.service_id)
+    if service is None:
+        callback_answer.text = "Услуга не найдена. Начните сначала."
+        callback_answer.show_alert = True
+        return
+    year, month = month_from_index(callback_data.month)
+    try:
+        await callback.message.edit_reply_markup(
+            reply_markup=await get_available_calendar_keyboard(service, year, month)
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+@router.callback_query(DateCallback.filter(), AppointmentStates.ENTER_DATE)
+async def select_date(callback: CallbackQuery, callback_data: DateCallback, state: FSMContext):
+    if callback.message is None:
         return
         
     try:
-        parts = callback.data.split("_")
-        if len(parts) >= 3:
-            date = parts[1]
-            service = parts[2]
-            await state.update_data(date=date, service=service)
-            times = await db.get_available_times(date, service)
-            await callback.message.answer(
-                f"⏰ Выберите удобное время на {date}:",
-                reply_markup=get_time_keyboard(date, service, times)
-            )
-            await state.set_state(AppointmentStates.ENTER_TIME)
-        else:
-            await callback.message.answer("Ошибка обработки данных. Попробуйте еще раз.")
+        service = await get_active_service(callback_data.service_id)
+        if service is None:
+            await state.clear()
+            await edit_anchor(callback.message, "Услуга не найдена. Начните сначала.")
+            return
+        date = date_from_day(callback_data.day)
+        await state.update_data(date=date, service=service[1])
+        await edit_anchor(
+            callback.message,
+            f"⏰ Выберите удобное время на {date}:",
+            reply_markup=await get_available_time_keyboard(date, service)
+        )
+        await state.set_state(AppointmentStates.ENTER_TIME)
     except Exception as e:
-        await callback.message.answer(f"Произошла ошибка: {e}. Попробуйте еще раз.")
+        await edit_anchor(callback.message, f"Произошла ошибка: {e}. Попробуйте еще раз.")
 
-@router.callback_query(F.data.startswith("time_"), AppointmentStates.ENTER_TIME)
-async def select_time(callback: CallbackQuery, state: FSMContext):
-    if callback.data is None or callback.message is None:
+@router.callback_query(TimeCallback.filter(), AppointmentStates.ENTER_TIME)
+async def select_time(callback: CallbackQuery, callback_data: TimeCallback, state: FSMContext):
+    if callback.message is None:
         return
         
     try:
-        parts = callback.data.split("_")
-        if len(parts) >= 4:
-            time = parts[1]
-            date = parts[2]
-            service = parts[3]
-            await state.update_data(time=time, date=date, service=service)
-            await callback.message.answer(
-                "👤 Пожалуйста, введите ваше полное имя (ФИО):"
-            )
-            await state.set_state(AppointmentStates.ENTER_FIO)
-        else:
-            await callback.message.answer("Ошибка обработки данных. Попробуйте еще раз.")
+        service = await get_active_service(callback_data.service_id)
+        if service is None:
+            await state.clear()
+            await edit_anchor(callback.message, "Услуга не найдена. Начните сначала.")
+            return
+        await state.update_data(
+            time=time_from_minute(callback_data.minute),
+            date=date_from_day(callback_data.day),
+            service=service[1]
+        )
+        await edit_anchor(
+            callback.message,
+            "👤 Пожалуйста, введите ваше полное имя (ФИО):"
+        )
+        await state.set_state(AppointmentStates.ENTER_FIO)
     except Exception as e:
-        await callback.message.answer(f"Произошла ошибка: {e}. Попробуйте еще раз.")
+        await edit_anchor(callback.message, f"Произошла ошибка: {e}. Попробуйте еще раз.")
 
 @router.message(AppointmentStates.ENTER_FIO)
 async def process_fio(message: Message, state: FSMContext):
@@ -351,11 +357,6 @@ async def process_fio(message: Message, state: FSMContext):
     
     user_id = message.from_user.id
     
-    # Проверяем защиту от спама
-    if rate_limiter.is_rate_limited(user_id):
-        await message.answer("Слишком много запросов. Попробуйте позже.")
-        return
-    
     try:
         # Валидируем ФИО
         fio = validate_fio(sanitize_input(message.text))
@@ -379,7 +380,8 @@ async def process_allergies(callback: CallbackQuery, state: FSMContext):
         
     allergies = "Да" if callback.data == "allergy_yes" else "Нет"
     await state.update_data(allergies=allergies)
-    await callback.message.answer(
+    await edit_anchor(
+        callback.message,
         "📱 Пожалуйста, введите ваш номер телефона для связи:"
     )
     await state.set_state(AppointmentStates.PHONE)
@@ -391,11 +393,6 @@ async def process_phone(message: Message, state: FSMContext):
     
     user_id = message.from_user.id
     
-    # Проверяем защиту от спама
-    if rate_limiter.is_rate_limited(user_id):
-        await message.answer("Слишком много запросов. Попробуйте позже.")
-        return
-    
     try:
         # Валидируем телефон
         phone = validate_phone(sanitize_input(message.text))
@@ -413,17 +410,12 @@ async def process_phone(message: Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте позже.")
 
 @router.callback_query(F.data == "confirm_booking", AppointmentStates.CONFIRM)
-async def confirm_booking(callback: CallbackQuery, state: FSMContext):
+async def confirm_booking(callback: CallbackQuery, state: FSMContext, callback_answer: CallbackAnswer):
     if callback.message is None or not callback.from_user:
         return
     
     user_id = callback.from_user.id
     
-    # Проверяем защиту от спама
-    if rate_limiter.is_rate_limited(user_id):
-        await callback.message.answer("Слишком много запросов. Попробуйте позже.")
-        return
-    
     try:
         data = await state.get_data()
         
@@ -431,7 +423,7 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
         required_fields = ["service", "date", "time", "fio", "allergies", "phone"]
         for field in required_fields:
             if field not in data or not data[field]:
-                await callback.message.answer("Неполные данные. Начните запись заново.")
+                await edit_anchor(callback.message, "Неполные данные. Начните запись заново.")
                 await state.clear()
                 rate_limiter.clear_user_state(user_id)
                 return
@@ -444,76 +436,75 @@ async def confirm_booking(callback: CallbackQuery, state: FSMContext):
         phone = validate_phone(data["phone"])
         
         # Проверяем лимит записей
-        user_appointments = await db.get_all_appointments()
-        user_count = sum(1 for appt in user_appointments if appt[1] == user_id)
+        user_count = await db.count_active_for_user(user_id)
         if user_count >= 3:
             logging.warning(f"Пользователь {user_id} превысил лимит записей")
-            await callback.message.answer("У вас уже 3 активные записи. Нельзя больше.")
+            callback_answer.text = "У вас уже 3 активные записи. Нельзя больше."
+            callback_answer.show_alert = True
             return
 
-        # Создаем запись
-        await db.add_appointment(
+        admin_notification = (
+            f"🆕 <b>Новая запись!</b>\n\n"
+            f"👤 <b>Клиент:</b> {fio}\n"
+            f"📱 <b>Телефон:</b> {phone}\n"
+            f"⚠️ <b>Аллергии:</b> {data['allergies']}\n"
+            f"💆‍♀️ <b>Услуга:</b> {service}\n"
+            f"📅 <b>Дата:</b> {date}\n"
+            f"⏰ <b>Время:</b> {time}\n"
+            f"🆔 <b>ID пользователя:</b> {user_id}\n\n"
+            f"📊 <b>Всего записей у клиента:</b> {user_count + 1}"
+        )
+
+        # Создаем запись, занимаем слот и ставим уведомление админу в outbox одной транзакцией
+        status, appointment_id = await db.book_slot(
             user_id=user_id,
             service=service,
             date=date,
             time=time,
             fio=fio,
             allergies=data["allergies"],
-            phone=phone
+            phone=phone,
+            max_appointments=3,
+            notification=(ADMIN_ID, "booking", admin_notification)
         )
+        if status != BookingStatus.OK:
+            logging.info(f"Бронирование {date} {time} {service} пользователем {user_id} отклонено: {status}")
+            # Сообщение с подтверждением остается: можно вернуться и выбрать другое время
+            callback_answer.text = BOOKING_ERRORS[status]
+            callback_answer.show_alert = True
+            return
         
-        # Помечаем слот как занятый
-        await db.mark_slot_as_booked(date, time, service)
-        
-        # Отправляем уведомление админу
-        try:
-            from config import ADMIN_ID
-            if callback.message and callback.message.bot:
-                admin_notification = (
-                    f"🆕 <b>Новая запись!</b>\n\n"
-                    f"👤 <b>Клиент:</b> {fio}\n"
-                    f"📱 <b>Телефон:</b> {phone}\n"
-                    f"⚠️ <b>Аллергии:</b> {data['allergies']}\n"
-                    f"💆‍♀️ <b>Услуга:</b> {service}\n"
-                    f"📅 <b>Дата:</b> {date}\n"
-                    f"⏰ <b>Время:</b> {time}\n"
-                    f"🆔 <b>ID пользователя:</b> {user_id}\n\n"
-                    f"📊 <b>Всего записей у клиента:</b> {user_count + 1}"
-                )
-                
-                await callback.message.bot.send_message(
-                    chat_id=ADMIN_ID,
-                    text=admin_notification,
-                    parse_mode="HTML"
-                )
-                logging.info(f"Отправлено уведомление админу о новой записи от пользователя {user_id}")
-        except Exception as e:
-            logging.error(f"Ошибка отправки уведомления админу: {e}")
-        
-        await callback.message.answer(
+        master = await db.get_appointment_master(appointment_id)
+        master_line = f"Мастер: {master}\n" if master else ""
+        await edit_anchor(
+            callback.message,
             "Отлично! Ваша запись подтверждена!\n\n"
             f"Дата: {date}\n"
             f"Время: {time}\n"
-            f"Услуга: {service}\n\n"
+            f"Услуга: {service}\n"
+            f"{master_line}\n"
             "Ждем вас в назначенное время!"
         )
         await state.clear()
         rate_limiter.clear_user_state(user_id)
         
     except ValidationError as e:
-        await callback.message.answer(f"Ошибка валидации: {e}")
+        callback_answer.text = f"Ошибка валидации: {e}"
+        callback_answer.show_alert = True
     except ValueError as e:
-        await callback.message.answer(f"Ошибка записи: {e}")
+        callback_answer.text = f"Ошибка записи: {e}"
+        callback_answer.show_alert = True
     except Exception as e:
         logger.error(f"Ошибка в confirm_booking: {e}")
-        await callback.message.answer("Произошла ошибка. Попробуйте позже.")
+        callback_answer.text = "Произошла ошибка. Попробуйте позже."
+        callback_answer.show_alert = True
 
 @router.callback_query(F.data == "cancel_booking", AppointmentStates.CONFIRM)
 async def cancel_booking(callback: CallbackQuery, state: FSMContext):
     if callback.message is None:
         return
         
-    await callback.message.answer("Запись отменена.")
+    await edit_anchor(callback.message, "Запись отменена.")
     await state.clear()
 
 # Обработчики кнопок "Назад"
@@ -525,23 +516,27 @@ async def back_to_service(callback: CallbackQuery, state: FSMContext):
     if user_state != AppointmentStates.ENTER_DATE.state:
         logging.warning(f"Пользователь {callback.from_user.id if callback.from_user else 'None'} попытался вернуться к услугам не из даты")
         await state.clear()
-        await callback.message.answer("Сброс состояния. Начните сначала.")
+        await edit_anchor(callback.message, "Сброс состояния. Начните сначала.")
         return
-    await callback.message.answer(
+    await edit_anchor(
+        callback.message,
         "Выберите услугу, которая вас интересует:",
         reply_markup=await get_service_keyboard()
     )
     await state.set_state(AppointmentStates.SELECT_SERVICE)
 
-@router.callback_query(F.data.startswith("back_to_date_"))
-async def back_to_date(callback: CallbackQuery, state: FSMContext):
-    if callback.message is None or callback.data is None:
+@router.callback_query(BackToDateCallback.filter())
+async def back_to_date(callback: CallbackQuery, callback_data: BackToDateCallback, state: FSMContext):
+    if callback.message is None:
         return
     
-    service = callback.data.replace("back_to_date_", "")
-    await state.update_data(service=service)
-    dates = await db.get_available_dates(service)
-    await callback.message.answer("Выберите дату:", reply_markup=get_date_keyboard(service, dates))
+    service = await get_active_service(callback_data.service_id)
+    if service is None:
+        await state.clear()
+        await edit_anchor(callback.message, "Услуга не найдена. Начните сначала.")
+        return
+    await state.update_data(service=service[1])
+    await edit_anchor(callback.message, "Выберите дату:", reply_markup=await get_available_calendar_keyboard(service))
     await state.set_state(AppointmentStates.ENTER_DATE)
 
 @router.callback_query(F.data == "back_to_fio")
@@ -549,7 +544,7 @@ async def back_to_fio(callback: CallbackQuery, state: FSMContext):
     if callback.message is None:
         return
     
-    await callback.message.answer("Введите ваше ФИО:")
+    await edit_anchor(callback.message, "Введите ваше ФИО:")
     await state.set_state(AppointmentStates.ENTER_FIO)
 
 @router.callback_query(F.data == "back_to_phone")
@@ -557,6 +552,6 @@ async def back_to_phone(callback: CallbackQuery, state: FSMContext):
     if callback.message is None:
         return
     
-    await callback.message.answer("Введите ваш номер телефона:")
+    await edit_anchor(callback.message, "Введите ваш номер телефона:")
     await state.set_state(AppointmentStates.PHONE)
 
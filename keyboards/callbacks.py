@@ -0,0 +1,129 @@
+from datetime import date, datetime
+from enum import Enum
+
+from aiogram.filters.callback_data import CallbackData
+
+# Фабрики callback_data для кнопок с параметрами.
+# Кнопки несут только числовые id: дата - номер дня (date.toordinal()),
+# время - минуты от полуночи, поэтому длина не зависит от названий услуг
+# и укладывается в 64 байта Telegram. Номер версии в префиксе меняется при
+# несовместимом изменении полей: кнопки старых сообщений перестают
+# совпадать с фильтрами и попадают в обработчик устаревших кнопок.
+
+
+class ServiceCallback(CallbackData, prefix="sv1"):
+    service_id: int
+
+
+class DateCallback(CallbackData, prefix="dt1"):
+    service_id: int
+    day: int
+
+
+class CalendarCallback(CallbackData, prefix="cl1"):
+    """Листание календаря; month = год * 12 + номер месяца - 1"""
+    service_id: int
+    month: int
+
+
+class TimeCallback(CallbackData, prefix="tm1"):
+    service_id: int
+    day: int
+    minute: int
+
+
+class BackToDateCallback(CallbackData, prefix="bd1"):
+    service_id: int
+
+
+class CancelAppointmentCallback(CallbackData, prefix="ca1"):
+    appointment_id: int
+
+
+class DeleteSlotCallback(CallbackData, prefix="ds1"):
+    slot_id: int
+
+
+class SlotsPageCallback(CallbackData, prefix="sp1"):
+    """Страница списка слотов для удаления"""
+    page: int
+
+
+class AppointmentAction(str, Enum):
+    DELETE = "d"
+    MOVE = "m"
+
+
+class AppointmentCallback(CallbackData, prefix="ap1"):
+    action: AppointmentAction
+    appointment_id: int
+
+
+class ServiceAction(str, Enum):
+    EDIT = "e"
+    DELETE = "d"
+    NAME = "n"
+    DESCRIPTION = "s"
+    DURATION = "t"
+    PRICE = "p"
+    PHOTO = "f"
+    TOGGLE = "a"
+
+
+class ServiceAdminCallback(CallbackData, prefix="sa1"):
+    action: ServiceAction
+    service_id: int
+
+
+class AppointmentsPageCallback(CallbackData, prefix="pg1"):
+    """Страница списка записей; day = 0 - все даты, service_id = 0 - все услуги"""
+    page: int
+    day: int
+    service_id: int
+
+
+class AppointmentsFilter(str, Enum):
+    DATES = "d"
+    SERVICES = "s"
+
+
+class AppointmentsFilterCallback(CallbackData, prefix="pf1"):
+    kind: AppointmentsFilter
+    day: int
+    service_id: int
+
+
+def day_from_date(value: str) -> int:
+    """'15.06.2025' или '2025-06-15' -> номер дня"""
+    fmt = "%Y-%m-%d" if "-" in value else "%d.%m.%Y"
+    return datetime.strptime(value, fmt).toordinal()
+
+
+def date_from_day(day: int) -> str:
+    """Номер дня -> 'DD.MM.YYYY'"""
+    return date.fromordinal(day).strftime("%d.%m.%Y")
+
+
+def iso_from_day(day: int) -> str:
+    """Номер дня -> 'YYYY-MM-DD'"""
+    return date.fromordinal(day).isoformat()
+
+
+def minute_from_time(value: str) -> int:
+    """'14:30' -> 870"""
+    hour, minute = value.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def time_from_minute(minute: int) -> str:
+    """870 -> '14:30'"""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_from_index(index: int):
+    """Номер месяца -> (год, месяц)"""
+    return index // 12, index % 12 + 1
@@ -1,10 +1,33 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
 from services.database import db
+from services.cache import KeyboardCache
+from keyboards.callbacks import ServiceCallback, DateCallback, CalendarCallback, TimeCallback, BackToDateCallback, \
+    AppointmentCallback, AppointmentAction, ServiceAdminCallback, ServiceAction, \
+    AppointmentsPageCallback, AppointmentsFilterCallback, AppointmentsFilter, DeleteSlotCallback, SlotsPageCallback, \
+    day_from_date, minute_from_time, month_index
+from datetime import datetime
 import asyncio
+import calendar
+import logging
 import os
 
+# Готовые клавиатуры для самых частых экранов
+keyboard_cache = KeyboardCache()
+
+# Сокращения дней недели по date.weekday()
+WEEKDAY_NAMES = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+MONTH_NAMES = ('Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+               'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь')
+# На сколько месяцев вперед можно листать календарь записи
+CALENDAR_MONTHS_AHEAD = 6
+
 async def get_service_keyboard():
     """Получает клавиатуру с услугами из базы данных"""
+    cached = keyboard_cache.get(("services",), db.catalog.version)
+    if cached is not None:
+        return cached
+    version = db.catalog.version
     services = await db.get_all_services()
     buttons = []
     for service in services:
@@ -15,9 +38,11 @@ async def get_service_keyboard():
         
         buttons.append([InlineKeyboardButton(
             text=button_text,
-            callback_data=f"service_{service[1]}"
+            callback_data=ServiceCallback(service_id=service[0]).pack()
         )])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard_cache.put(("services",), version, keyboard)
+    return keyboard
 
 async def send_services_with_photos(bot, chat_id, message_text="🌟 Выберите услугу, которая вас интересует:"):
     """Отправляет услуги с фотографиями"""
@@ -33,22 +58,43 @@ async def send_services_with_photos(bot, chat_id, message_text="🌟 Выбер
     
     # Проверяем, есть ли фотография у первой услуги
     if first_service[5] and os.path.exists(first_service[5]):  # photo_path
-        try:
-            photo = FSInputFile(first_service[5])
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=photo,
-                caption=message_text,
-                reply_markup=keyboard
-            )
-        except Exception as e:
+        if not await send_service_photo(bot, chat_id, first_service, message_text, keyboard):
             # Если не удалось отправить фото, отправляем обычное сообщение
             await bot.send_message(chat_id, message_text, reply_markup=keyboard)
     else:
         # Если нет фотографии, отправляем обычное сообщение
         await bot.send_message(chat_id, message_text, reply_markup=keyboard)
 
-def get_date_keyboard(service, dates):
+async def send_service_photo(bot, chat_id, service, caption, keyboard):
+    """Отправляет фото услуги, по возможности по сохраненному file_id без повторной загрузки"""
+    if service[8]:  # photo_file_id
+        try:
+            await bot.send_photo(chat_id=chat_id, photo=service[8], caption=caption, reply_markup=keyboard)
+            return True
+        except TelegramBadRequest as e:
+            # file_id устарел: сбрасываем его и загружаем файл заново
+            logging.warning(f"file_id фото услуги {service[0]} недействителен: {e}")
+            await db.set_service_photo_file_id(service[0], None)
+        except Exception as e:
+            logging.error(f"Ошибка отправки фото услуги {service[0]} по file_id: {e}")
+            return False
+
+    try:
+        message = await bot.send_photo(
+            chat_id=chat_id,
+            photo=FSInputFile(service[5]),
+            caption=caption,
+            reply_markup=keyboard
+        )
+    except Exception as e:
+        logging.error(f"Ошибка загрузки фото услуги {service[0]}: {e}")
+        return False
+
+    if message.photo:
+        await db.set_service_photo_file_id(service[0], message.photo[-1].file_id)
+    return True
+
+def get_date_keyboard(service_id, dates):
     if not dates:
         return InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="📅 Нет доступных дат", callback_data="none")],
@@ -59,37 +105,103 @@ def get_date_keyboard(service, dates):
     for date in dates:
         # Форматирование даты с днем недели
         try:
-            from datetime import datetime
-            date_obj = datetime.strptime(date, '%d.%m.%Y')
-            day_name = date_obj.strftime('%A')
-            day_names = {
-                'Monday': 'Пн', 'Tuesday': 'Вт', 'Wednesday': 'Ср', 
-                'Thursday': 'Чт', 'Friday': 'Пт', 'Saturday': 'Сб', 'Sunday': 'Вс'
-            }
-            day_text = day_names.get(day_name, '')
+            day_text = WEEKDAY_NAMES[datetime.strptime(date, '%d.%m.%Y').weekday()]
             button_text = f"📅 {date} ({day_text})"
-        except:
+        except ValueError:
             button_text = f"📅 {date}"
         
-        buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"date_{date}_{service}")])
+        callback_data = DateCallback(service_id=service_id, day=day_from_date(date)).pack()
+        buttons.append([InlineKeyboardButton(text=button_text, callback_data=callback_data)])
     
     buttons.append([InlineKeyboardButton(text="🔙 Назад к услугам", callback_data="back_to_service")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_time_keyboard(date, service, times):
+def get_calendar_keyboard(service_id, year, month, counts, today=None):
+    """Календарь месяца: дни со свободными слотами (counts - {день: число}) - кнопки выбора даты.
+
+    Стрелки листают месяцы от текущего до CALENDAR_MONTHS_AHEAD вперед.
+    """
+    today = today or datetime.now().date()
+    current = month_index(year, month)
+    first = month_index(today.year, today.month)
+    empty = InlineKeyboardButton(text=" ", callback_data="none")
+
+    def arrow(text, index):
+        if not first <= index <= first + CALENDAR_MONTHS_AHEAD:
+            return empty
+        return InlineKeyboardButton(text=text, callback_data=CalendarCallback(service_id=service_id, month=index).pack())
+
+    buttons = [
+        [arrow("◀️", current - 1),
+         InlineKeyboardButton(text=f"{MONTH_NAMES[month - 1]} {year}", callback_data="none"),
+         arrow("▶️", current + 1)],
+        [InlineKeyboardButton(text=name, callback_data="none") for name in WEEKDAY_NAMES],
+    ]
+    for week in calendar.monthcalendar(year, month):
+        row = []
+        for day in week:
+            if day and counts.get(day):
+                day_number = datetime(year, month, day).toordinal()
+                row.append(InlineKeyboardButton(
+                    text=str(day), callback_data=DateCallback(service_id=service_id, day=day_number).pack()))
+            else:
+                row.append(InlineKeyboardButton(text="·" if day else " ", callback_data="none"))
+        buttons.append(row)
+
+    if not counts:
+        buttons.append([InlineKeyboardButton(text="📅 Нет свободных дат в этом месяце", callback_data="none")])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад к услугам", callback_data="back_to_service")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+async def get_available_calendar_keyboard(service, year=None, month=None):
+    """Календарь свободных дат услуги (строка каталога) на месяц из кэша.
+
+    Без месяца показывается месяц ближайшей свободной даты (или текущий).
+    """
+    if year is None or month is None:
+        first_date = await db.get_first_available_date(service[1])
+        start = datetime.strptime(first_date, "%Y-%m-%d") if first_date else datetime.now()
+        today = datetime.now()
+        if month_index(start.year, start.month) > month_index(today.year, today.month) + CALENDAR_MONTHS_AHEAD:
+            start = today
+        year, month = start.year, start.month
+    key = ("calendar", service[0], month_index(year, month))
+    version = db.availability_version
+    cached = keyboard_cache.get(key, version)
+    if cached is not None:
+        return cached
+    keyboard = get_calendar_keyboard(service[0], year, month, await db.get_month_availability(service[1], year, month))
+    keyboard_cache.put(key, version, keyboard)
+    return keyboard
+
+async def get_available_time_keyboard(date, service):
+    """Клавиатура свободного времени услуги (строка каталога) на дату из кэша"""
+    key = ("times", date, service[0])
+    version = db.availability_version
+    cached = keyboard_cache.get(key, version)
+    if cached is not None:
+        return cached
+    keyboard = get_time_keyboard(date, service[0], await db.get_available_times(date, service[1]))
+    keyboard_cache.put(key, version, keyboard)
+    return keyboard
+
+def get_time_keyboard(date, service_id, times):
+    back = BackToDateCallback(service_id=service_id).pack()
     if not times:
         return InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="⏰ Нет доступного времени", callback_data="none")],
-            [InlineKeyboardButton(text="🔙 Назад к датам", callback_data=f"back_to_date_{service}")]
+            [InlineKeyboardButton(text="🔙 Назад к датам", callback_data=back)]
         ])
     
+    day = day_from_date(date)
     buttons = []
     for time in times:
         # Форматирование времени
         button_text = f"⏰ {time}"
-        buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"time_{time}_{date}_{service}")])
+        callback_data = TimeCallback(service_id=service_id, day=day, minute=minute_from_time(time)).pack()
+        buttons.append([InlineKeyboardButton(text=button_text, callback_data=callback_data)])
     
-    buttons.append([InlineKeyboardButton(text="🔙 Назад к датам", callback_data=f"back_to_date_{service}")])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад к датам", callback_data=back)])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 def get_allergies_keyboard():
@@ -118,12 +230,101 @@ def get_admin_appointment_keyboard(appointments):
         buttons.append([
             InlineKeyboardButton(
                 text=f"👤 {appt[2]} {appt[3]} ({appt[4]})",
-                callback_data=f"edit_{appt[0]}"
+                callback_data=AppointmentCallback(action=AppointmentAction.MOVE, appointment_id=appt[0]).pack()
             ),
-            InlineKeyboardButton(text="❌", callback_data=f"delete_{appt[0]}")
+            InlineKeyboardButton(
+                text="❌",
+                callback_data=AppointmentCallback(action=AppointmentAction.DELETE, appointment_id=appt[0]).pack()
+            )
         ])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+def get_admin_appointments_page_keyboard(appointments, page, pages, day, service_id):
+    """Клавиатура страницы записей: действия с записями, листание и фильтры.
+
+    day - номер дня фильтра или 0 (все даты), service_id - id услуги или 0 (все услуги).
+    """
+    buttons = []
+    for number, appt in enumerate(appointments, start=1):
+        buttons.append([
+            InlineKeyboardButton(
+                text=f"🗑️ {number}",
+                callback_data=AppointmentCallback(action=AppointmentAction.DELETE, appointment_id=appt[0]).pack()
+            ),
+            InlineKeyboardButton(
+                text=f"🔄 {number}",
+                callback_data=AppointmentCallback(action=AppointmentAction.MOVE, appointment_id=appt[0]).pack()
+            )
+        ])
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(
+            text="⬅️", callback_data=AppointmentsPageCallback(page=page - 1, day=day, service_id=service_id).pack()))
+    navigation.append(InlineKeyboardButton(text=f"{page + 1}/{max(pages, 1)}", callback_data="appts_noop"))
+    if page + 1 < pages:
+        navigation.append(InlineKeyboardButton(
+            text="➡️", callback_data=AppointmentsPageCallback(page=page + 1, day=day, service_id=service_id).pack()))
+    buttons.append(navigation)
+
+    buttons.append([
+        InlineKeyboardButton(
+            text="📅 Дата",
+            callback_data=AppointmentsFilterCallback(kind=AppointmentsFilter.DATES, day=day, service_id=service_id).pack()
+        ),
+        InlineKeyboardButton(
+            text="💆 Услуга",
+            callback_data=AppointmentsFilterCallback(kind=AppointmentsFilter.SERVICES, day=day, service_id=service_id).pack()
+        )
+    ])
+    if day or service_id:
+        buttons.append([InlineKeyboardButton(
+            text="♻️ Сбросить фильтры", callback_data=AppointmentsPageCallback(page=0, day=0, service_id=0).pack())])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_admin_slots_page_keyboard(slots, page, pages):
+    """Клавиатура страницы слотов: кнопка удаления каждого слота и листание"""
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"{slot[1]} {slot[2]} ({slot[3]})", callback_data=DeleteSlotCallback(slot_id=slot[0]).pack())]
+        for slot in slots
+    ]
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=SlotsPageCallback(page=page - 1).pack()))
+    navigation.append(InlineKeyboardButton(text=f"{page + 1}/{max(pages, 1)}", callback_data="appts_noop"))
+    if page + 1 < pages:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=SlotsPageCallback(page=page + 1).pack()))
+    buttons.append(navigation)
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_admin_date_filter_keyboard(dates, service_id):
+    """Выбор даты для фильтра записей: dates - [(YYYY-MM-DD, число записей)]"""
+    buttons = []
+    for date_iso, count in dates:
+        date = datetime.strptime(date_iso, "%Y-%m-%d")
+        buttons.append([InlineKeyboardButton(
+            text=f"{date.strftime('%d.%m.%Y')} ({WEEKDAY_NAMES[date.weekday()]}) — {count}",
+            callback_data=AppointmentsPageCallback(page=0, day=date.toordinal(), service_id=service_id).pack()
+        )])
+    buttons.append([InlineKeyboardButton(
+        text="📅 Все даты", callback_data=AppointmentsPageCallback(page=0, day=0, service_id=service_id).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_admin_service_filter_keyboard(services, day):
+    """Выбор услуги для фильтра записей"""
+    buttons = [
+        [InlineKeyboardButton(
+            text=service[1], callback_data=AppointmentsPageCallback(page=0, day=day, service_id=service[0]).pack())]
+        for service in services
+    ]
+    buttons.append([InlineKeyboardButton(
+        text="💆 Все услуги", callback_data=AppointmentsPageCallback(page=0, day=day, service_id=0).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
 async def get_admin_services_keyboard():
     """Клавиатура для управления услугами"""
     services = await db.get_all_services_admin()
@@ -137,9 +338,10 @@ async def get_admin_services_keyboard():
         buttons.append([
             InlineKeyboardButton(
                 text=button_text,
-                callback_data=f"edit_service_{service[0]}"
+                callback_data=ServiceAdminCallback(action=ServiceAction.EDIT, service_id=service[0]).pack()
             ),
-            InlineKeyboardButton(text="🗑️", callback_data=f"delete_service_{service[0]}")
+            InlineKeyboardButton(
+                text="🗑️", callback_data=ServiceAdminCallback(action=ServiceAction.DELETE, service_id=service[0]).pack())
         ])
     buttons.append([InlineKeyboardButton(text="➕ Добавить новую услугу", callback_data="add_service")])
     buttons.append([InlineKeyboardButton(text="🔙 Назад в админ-панель", callback_data="back_to_admin")])
@@ -147,15 +349,20 @@ async def get_admin_services_keyboard():
 
 def get_service_edit_keyboard(service_id):
     """Клавиатура для редактирования услуги"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✏️ Изменить название", callback_data=f"edit_name_{service_id}")],
-        [InlineKeyboardButton(text="📝 Изменить описание", callback_data=f"edit_desc_{service_id}")],
-        [InlineKeyboardButton(text="⏱️ Изменить длительность", callback_data=f"edit_duration_{service_id}")],
-        [InlineKeyboardButton(text="💰 Изменить цену", callback_data=f"edit_price_{service_id}")],
-        [InlineKeyboardButton(text="📸 Изменить фото", callback_data=f"edit_photo_{service_id}")],
-        [InlineKeyboardButton(text="🔄 Активировать/Деактивировать", callback_data=f"toggle_active_{service_id}")],
-        [InlineKeyboardButton(text="🔙 Назад к услугам", callback_data="back_to_services")]
-    ])
+    actions = [
+        ("✏️ Изменить название", ServiceAction.NAME),
+        ("📝 Изменить описание", ServiceAction.DESCRIPTION),
+        ("⏱️ Изменить длительность", ServiceAction.DURATION),
+        ("💰 Изменить цену", ServiceAction.PRICE),
+        ("📸 Изменить фото", ServiceAction.PHOTO),
+        ("🔄 Активировать/Деактивировать", ServiceAction.TOGGLE),
+    ]
+    buttons = [
+        [InlineKeyboardButton(text=text, callback_data=ServiceAdminCallback(action=action, service_id=service_id).pack())]
+        for text, action in actions
+    ]
+    buttons.append([InlineKeyboardButton(text="🔙 Назад к услугам", callback_data="back_to_services")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 def get_admin_main_keyboard():
     """Главная клавиатура админ-панели"""
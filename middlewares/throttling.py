@@ -0,0 +1,65 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from services.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Профили лимитов по callback_data (совпадение по префиксу)
+DEFAULT_CALLBACK_PROFILES: Dict[str, str] = {
+    "confirm_booking": "booking",
+}
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    """Внешний middleware Dispatcher.update: проверяет лимиты один раз на обновление.
+
+    Отклоненные обновления не доходят до роутеров и фильтров хендлеров.
+    Профиль лимитов выбирается по типу события и callback_data.
+    """
+
+    def __init__(self, limiter: RateLimiter, callback_profiles: Optional[Dict[str, str]] = None,
+                 callback_profile: str = "callback", message_profile: str = "default"):
+        self.limiter = limiter
+        self.callback_profiles = DEFAULT_CALLBACK_PROFILES if callback_profiles is None else callback_profiles
+        self.callback_profile = callback_profile
+        self.message_profile = message_profile
+
+    def resolve_profile(self, event: Update) -> str:
+        """Определяет профиль лимитов для обновления"""
+        if event.callback_query is not None:
+            data = event.callback_query.data or ""
+            for prefix, profile in self.callback_profiles.items():
+                if data.startswith(prefix):
+                    return profile
+            return self.callback_profile
+        return self.message_profile
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not isinstance(event, Update):
+            return await handler(event, data)
+
+        # Уже заблокированных не обрабатываем и не отвечаем им, чтобы не тратить лимиты Telegram
+        if await self.limiter.check_blocked(user.id):
+            return None
+
+        if await self.limiter.check_rate_limit(user.id, self.resolve_profile(event)):
+            try:
+                if event.callback_query is not None:
+                    await event.callback_query.answer("Слишком много запросов. Попробуйте позже.", show_alert=True)
+                elif event.message is not None:
+                    await event.message.answer("Слишком много запросов. Попробуйте позже.")
+            except Exception as e:
+                logger.error(f"Ошибка уведомления о превышении лимита пользователя {user.id}: {e}")
+            return None
+
+        return await handler(event, data)
@@ -0,0 +1,261 @@
+import asyncio
+import bisect
+import itertools
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from services.cache import CacheBase
+
+# Длительность записи, если у услуги она не указана
+DEFAULT_DURATION = 60
+
+# Интервал времени в минутах от полуночи: [начало, конец)
+Interval = Tuple[int, int]
+
+
+def to_minutes(value: str) -> int:
+    """'14:30' -> 870"""
+    hour, minute = value.strip().split(":")
+    return int(hour) * 60 + int(minute)
+
+
+class DaySchedule:
+    """Занятые интервалы одного дня, отсортированные по началу.
+
+    max_ends[i] - наибольший конец среди первых i + 1 интервалов, поэтому
+    проверка пересечения - один bisect, даже если старые записи
+    пересекаются между собой.
+    """
+
+    __slots__ = ("starts", "max_ends")
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _ in intervals]
+        self.max_ends = list(itertools.accumulate((end for _, end in intervals), max))
+
+    def is_free(self, start: int, end: int) -> bool:
+        """Не пересекается ли [start, end) ни с одним занятым интервалом"""
+        index = bisect.bisect_left(self.starts, end)
+        return index == 0 or self.max_ends[index - 1] <= start
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def working_hours(template: Iterable[Tuple[int, str, str]]) -> Dict[int, List[Interval]]:
+    """Строки шаблона (день недели, HH:MM, HH:MM) -> {день недели: [интервалы]}"""
+    hours: Dict[int, List[Interval]] = {}
+    for weekday, start_time, end_time in template:
+        hours.setdefault(weekday, []).append((to_minutes(start_time), to_minutes(end_time)))
+    for intervals in hours.values():
+        intervals.sort()
+    return hours
+
+
+def within_hours(intervals: Optional[Sequence[Interval]], start: int, end: int) -> bool:
+    """Помещается ли [start, end) целиком в один рабочий интервал.
+
+    Если для дня недели часы не заданы (None), ограничения нет: слоты,
+    добавленные администратором вручную, остаются доступными.
+    """
+    if intervals is None:
+        return True
+    index = bisect.bisect_right(intervals, (start, float("inf"))) - 1
+    return index >= 0 and intervals[index][1] >= end
+
+
+def day_schedules(rows: Iterable[Tuple[str, Any, Optional[int]]]) -> Dict[Optional[int], DaySchedule]:
+    """Записи дня (HH:MM, длительность, мастер) -> {мастер: DaySchedule}"""
+    busy: Dict[Optional[int], List[Interval]] = {}
+    for start_time, duration, master_id in rows:
+        start = to_minutes(start_time)
+        busy.setdefault(master_id, []).append((start, start + (duration or DEFAULT_DURATION)))
+    return {master_id: DaySchedule(intervals) for master_id, intervals in busy.items()}
+
+
+def free_masters(schedules: Dict[Optional[int], DaySchedule], masters: Optional[Sequence[int]],
+                 start: int, end: int) -> Iterator[Optional[int]]:
+    """Мастера из masters, свободные в [start, end), по порядку.
+
+    masters = None - мастера не заведены: у салона одно рабочее место,
+    которое занимает любая запись (выдается None, если оно свободно).
+    Записи без мастера, сделанные до появления мастеров, занимают всех.
+    """
+    if masters is None:
+        if all(schedule.is_free(start, end) for schedule in schedules.values()):
+            yield None
+        return
+    unassigned = schedules.get(None)
+    if unassigned is not None and not unassigned.is_free(start, end):
+        return
+    for master_id in masters:
+        schedule = schedules.get(master_id)
+        if schedule is None or schedule.is_free(start, end):
+            yield master_id
+
+
+def is_bookable(schedules: Dict[Optional[int], DaySchedule], masters: Optional[Sequence[int]],
+                hours: Dict[int, List[Interval]], day: date, start: int, duration: int) -> bool:
+    """Можно ли начать запись длительностью duration минут в start хотя бы у одного мастера"""
+    end = start + duration
+    return within_hours(hours.get(day.weekday()), start, end) and \
+        any(True for _ in free_masters(schedules, masters, start, end))
+
+
+class _Day:
+    """Кэш одного дня: занятость мастеров и уже вычисленные ответы"""
+
+    __slots__ = ("schedules", "free")
+
+    def __init__(self, schedules: Dict[Optional[int], DaySchedule]):
+        self.schedules = schedules
+        # (услуга, длительность, начало) -> можно ли записаться
+        self.free: Dict[Tuple[str, int, int], bool] = {}
+
+
+class AvailabilityEngine(CacheBase):
+    """Свободное время с учетом длительности услуг и мастеров.
+
+    Слоты available_slots задают возможное время начала; время доступно,
+    если запись с длительностью услуги укладывается в рабочие часы и хотя
+    бы один мастер, владеющий услугой, в это время свободен (объединение
+    свободного времени мастеров). Пока мастера не заведены, у салона одно
+    рабочее место и пересекаются записи любых услуг. Занятые интервалы
+    каждого дня по мастерам (DaySchedule) и посчитанные для дня ответы
+    кэшируются и сбрасываются invalidate() при изменении записей этого
+    дня. Запись, сделанная другим процессом, может быть не видна до ttl
+    секунд, поэтому окончательная проверка и выбор мастера выполняются в
+    транзакции записи.
+    """
+
+    def __init__(self, busy_loader: Callable[[str, str], Awaitable[Iterable[Tuple[str, str, Any, Any]]]],
+                 hours_loader: Callable[[], Awaitable[Iterable[Tuple[int, str, str]]]],
+                 masters_loader: Callable[[], Awaitable[Iterable[Tuple[str, int]]]],
+                 max_days: int = 400, ttl: float = 30.0):
+        super().__init__(ttl)
+        self.busy_loader = busy_loader
+        self.hours_loader = hours_loader
+        self.masters_loader = masters_loader
+        self.max_days = max_days
+        self.version = 0
+
+        self._days: "OrderedDict[str, Tuple[float, _Day]]" = OrderedDict()
+        self._hours: Optional[Tuple[float, Dict[int, List[Interval]]]] = None
+        self._masters: Optional[Tuple[float, Dict[str, List[int]]]] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _cached(self, date_iso: str) -> Optional[_Day]:
+        entry = self._days.get(date_iso)
+        if entry is not None:
+            created, day = entry
+            if self.is_fresh(created):
+                self._days.move_to_end(date_iso)
+                return day
+            del self._days[date_iso]
+        return None
+
+    async def hours(self) -> Dict[int, List[Interval]]:
+        """Рабочие часы по дням недели из шаблона расписания"""
+        if self._hours is not None and self.is_fresh(self._hours[0]):
+            return self._hours[1]
+        version = self.version
+        hours = working_hours(await self.hours_loader())
+        if version == self.version:
+            self._hours = (time.monotonic(), hours)
+        return hours
+
+    async def masters(self, service: str) -> Optional[List[int]]:
+        """Активные мастера услуги; None - мастера не заведены (одно рабочее место)"""
+        if self._masters is not None and self.is_fresh(self._masters[0]):
+            by_service = self._masters[1]
+        else:
+            version = self.version
+            by_service = {}
+            for name, master_id in await self.masters_loader():
+                by_service.setdefault(name, []).append(master_id)
+            if version == self.version:
+                self._masters = (time.monotonic(), by_service)
+        if not by_service:
+            return None
+        return by_service.get(service, [])
+
+    async def _load_days(self, date_isos: Iterable[str]) -> Dict[str, _Day]:
+        """Кэш дней; недостающие дни загружаются одним запросом"""
+        result = {}
+        missing = []
+        for date_iso in date_isos:
+            day = self._cached(date_iso)
+            if day is not None:
+                self.hits += 1
+                result[date_iso] = day
+            else:
+                missing.append(date_iso)
+        if not missing:
+            return result
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self.misses += len(missing)
+            version = self.version
+            rows: Dict[str, List[Tuple[str, Any, Any]]] = {date_iso: [] for date_iso in missing}
+            for date_iso, start_time, duration, master_id in await self.busy_loader(min(missing), max(missing)):
+                if date_iso in rows:
+                    rows[date_iso].append((start_time, duration, master_id))
+            for date_iso, day_rows in rows.items():
+                day = _Day(day_schedules(day_rows))
+                result[date_iso] = day
+                # Если записи изменились во время загрузки, в кэш не кладем
+                if version == self.version:
+                    self._days[date_iso] = (time.monotonic(), day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return result
+
+    async def filter(self, candidates: Dict[str, List[str]], service: str,
+                     duration: Optional[int]) -> Dict[str, List[str]]:
+        """Оставляет из {YYYY-MM-DD: [HH:MM]} только время, куда помещается запись услуги.
+
+        Дни без подходящего времени в результат не попадают.
+        """
+        duration = duration or DEFAULT_DURATION
+        hours = await self.hours()
+        masters = await self.masters(service)
+        if masters == []:
+            return {}
+        days = await self._load_days(candidates)
+        result = {}
+        for date_iso, times in candidates.items():
+            day, weekday = days[date_iso], date.fromisoformat(date_iso)
+            free = []
+            for value in times:
+                start = to_minutes(value)
+                key = (service, duration, start)
+                bookable = day.free.get(key)
+                if bookable is None:
+                    bookable = day.free[key] = is_bookable(day.schedules, masters, hours, weekday, start, duration)
+                if bookable:
+                    free.append(value)
+            if free:
+                result[date_iso] = free
+        return result
+
+    def invalidate(self, *date_isos: Optional[str]):
+        """Сбрасывает кэш дней, в которых изменились записи (без аргументов - весь кэш)"""
+        self.version += 1
+        if not date_isos:
+            self._days.clear()
+            self._hours = None
+            self._masters = None
+            return
+        for date_iso in date_isos:
+            self._days.pop(date_iso, None)
+
+    def size(self) -> int:
+        return len(self._days)
+
+    def stats(self) -> Dict[str, int]:
+        return {"version": self.version, **super().stats()}
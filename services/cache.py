@@ -0,0 +1,150 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class CacheBase:
+    """Общее для кэшей процесса: срок жизни записей и счетчики.
+
+    Изменения, сделанные этим процессом, сбрасывают кэш сразу, а сделанные
+    другим процессом бота становятся видны, когда запись старше ttl секунд.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def is_fresh(self, created: float) -> bool:
+        """Не истек ли ttl записи, созданной в created (time.monotonic())"""
+        return time.monotonic() - created < self.ttl
+
+    def size(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        """Попадания, промахи и текущий размер кэша"""
+        return {"hits": self.hits, "misses": self.misses, "size": self.size()}
+
+
+class _CatalogSnapshot:
+    """Снимок каталога услуг с готовыми индексами"""
+
+    __slots__ = ("rows", "active", "by_id", "by_name")
+
+    def __init__(self, rows: List[Any]):
+        self.rows = rows  # все услуги, включая неактивные
+        self.active = [row for row in rows if row[6]]  # is_active
+        self.by_id = {row[0]: row for row in rows}
+        self.by_name = {row[1].lower(): row for row in self.active}
+
+
+class CatalogCache(CacheBase):
+    """Кэш каталога услуг в памяти процесса.
+
+    Хранит все строки таблицы services и индексы id -> строка и
+    название (в нижнем регистре) -> активная строка. Любое изменение
+    каталога вызывает invalidate(), которое увеличивает версию; снимок
+    старше ttl перечитывается с новой версией, чтобы изменения из других
+    процессов дошли и до клавиатур, построенных по версии каталога.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[List[Any]]], ttl: float = 30.0):
+        super().__init__(ttl)
+        self.loader = loader
+        self.version = 0
+
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self._created = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _cached(self) -> Optional[_CatalogSnapshot]:
+        if self._snapshot is not None and not self.is_fresh(self._created):
+            self.invalidate()
+        return self._snapshot
+
+    async def _get(self) -> _CatalogSnapshot:
+        snapshot = self._cached()
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Пока ждали блокировку, каталог мог загрузить другой запрос
+            snapshot = self._cached()
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            version = self.version
+            snapshot = _CatalogSnapshot(await self.loader())
+            # Если каталог изменили во время загрузки, снимок в кэш не кладем
+            if version == self.version:
+                self._snapshot = snapshot
+                self._created = time.monotonic()
+            return snapshot
+
+    async def all(self) -> List[Any]:
+        """Все услуги, отсортированные по названию (для админ-панели)"""
+        return (await self._get()).rows
+
+    async def active(self) -> List[Any]:
+        """Активные услуги, отсортированные по названию"""
+        return (await self._get()).active
+
+    async def by_id(self, service_id: int) -> Optional[Any]:
+        return (await self._get()).by_id.get(service_id)
+
+    async def by_name(self, name: str) -> Optional[Any]:
+        """Активная услуга по названию без учета регистра"""
+        return (await self._get()).by_name.get(name.lower().strip())
+
+    def invalidate(self):
+        """Сбрасывает кэш после изменения каталога"""
+        self.version += 1
+        self._snapshot = None
+
+    def size(self) -> int:
+        return len(self._snapshot.rows) if self._snapshot is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"version": self.version, **super().stats()}
+
+
+class KeyboardCache(CacheBase):
+    """Кэш готовых клавиатур.
+
+    Запись действительна, пока совпадает версия данных, из которых она
+    построена, и не истек ttl. Размер ограничен, вытесняются давние записи.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 30.0):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, created, markup = entry
+            if entry_version == version and self.is_fresh(created):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return markup
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, version: int, markup: Any):
+        self._entries[key] = (version, time.monotonic(), markup)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
@@ -1,14 +1,318 @@
 import aiosqlite
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+import time
+from config import DATABASE_PATH, DATABASE_PROFILE, DB_POOL_SIZE
+from services.db_pool import ConnectionPool, WriteQueue, get_profile_pragmas
+from services.cache import CatalogCache
+from services.availability import AvailabilityEngine, DEFAULT_DURATION, day_schedules, free_masters, to_minutes, \
+    within_hours, working_hours
+
+
+# Формат времени начала (start_at): сортируется как строка
+START_AT_FORMAT = "%Y-%m-%d %H:%M"
+
+# Миграции схемы: после применения N-й миграции PRAGMA user_version = N
+MIGRATIONS = [
+    # 1: сортируемая ISO-дата и время начала рядом с отображаемым форматом DD.MM.YYYY
+    [
+        "ALTER TABLE appointments ADD COLUMN date_iso TEXT",
+        "ALTER TABLE appointments ADD COLUMN start_at TEXT",
+        "ALTER TABLE available_slots ADD COLUMN date_iso TEXT",
+        "ALTER TABLE available_slots ADD COLUMN start_at TEXT",
+        """UPDATE appointments
+           SET date_iso = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2),
+               start_at = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+                          || ' ' || substr('0' || time, -5, 5)
+           WHERE date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'""",
+        """UPDATE available_slots
+           SET date_iso = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2),
+               start_at = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+                          || ' ' || substr('0' || time, -5, 5)
+           WHERE date GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'""",
+        "CREATE INDEX IF NOT EXISTS idx_slots_service_free_date ON available_slots(service, is_booked, date_iso)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date_iso ON appointments(date_iso)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_start_at ON appointments(start_at)",
+    ],
+    # 2: выборка записей пользователя без полного просмотра таблицы
+    [
+        "CREATE INDEX IF NOT EXISTS idx_appointments_user_start ON appointments(user_id, start_at)",
+    ],
+    # 3: file_id фотографии услуги, уже загруженной в Telegram
+    [
+        "ALTER TABLE services ADD COLUMN photo_file_id TEXT",
+    ],
+    # 4: общее состояние процессов бота (FSM, счетчики лимитов, блокировки)
+    [
+        """CREATE TABLE IF NOT EXISTS kv_store (
+               key TEXT PRIMARY KEY,
+               value TEXT,
+               expires_at REAL
+           ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_kv_store_expires ON kv_store(expires_at)",
+    ],
+    # 5: напоминания с заранее вычисленным временем отправки
+    [
+        """CREATE TABLE IF NOT EXISTS reminders (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               appointment_id INTEGER NOT NULL,
+               kind TEXT NOT NULL,
+               due_at TEXT NOT NULL,
+               claimed_at TEXT,
+               attempts INTEGER DEFAULT 0,
+               sent_at TEXT,
+               UNIQUE(appointment_id, kind)
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders(due_at) WHERE sent_at IS NULL",
+        """INSERT OR IGNORE INTO reminders (appointment_id, kind, due_at)
+           SELECT id, 'day', strftime('%Y-%m-%d %H:%M', start_at, '-1 day') FROM appointments
+           WHERE strftime('%Y-%m-%d %H:%M', start_at, '-1 day') > strftime('%Y-%m-%d %H:%M', 'now', 'localtime')""",
+        """INSERT OR IGNORE INTO reminders (appointment_id, kind, due_at)
+           SELECT id, 'hour', strftime('%Y-%m-%d %H:%M', start_at, '-1 hour') FROM appointments
+           WHERE strftime('%Y-%m-%d %H:%M', start_at, '-1 hour') > strftime('%Y-%m-%d %H:%M', 'now', 'localtime')""",
+    ],
+    # 6: исходящие уведомления, записываемые в одной транзакции с изменением
+    [
+        """CREATE TABLE IF NOT EXISTS outbox (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               chat_id INTEGER NOT NULL,
+               kind TEXT NOT NULL,
+               text TEXT NOT NULL,
+               created_at TEXT NOT NULL,
+               available_at TEXT NOT NULL,
+               claimed_at TEXT,
+               attempts INTEGER DEFAULT 0,
+               sent_at TEXT,
+               last_error TEXT
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(available_at) WHERE sent_at IS NULL",
+    ],
+    # 7: постраничный просмотр записей с фильтром по услуге
+    [
+        "CREATE INDEX IF NOT EXISTS idx_appointments_service_start ON appointments(service, start_at)",
+    ],
+    # 8: шаблон рабочих часов по дням недели для генерации слотов
+    [
+        """CREATE TABLE IF NOT EXISTS schedule_template (
+               weekday INTEGER NOT NULL,
+               start_time TEXT NOT NULL,
+               end_time TEXT NOT NULL,
+               PRIMARY KEY (weekday, start_time)
+           )""",
+    ],
+    # 9: длительность записи фиксируется при бронировании для проверки пересечений
+    [
+        "ALTER TABLE appointments ADD COLUMN duration INTEGER",
+        """UPDATE appointments
+           SET duration = (SELECT services.duration FROM services WHERE services.name = appointments.service)""",
+    ],
+    # 10: мастера и услуги, которые они выполняют; запись закрепляется за мастером
+    [
+        """CREATE TABLE IF NOT EXISTS masters (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               name TEXT UNIQUE NOT NULL,
+               is_active BOOLEAN DEFAULT 1,
+               created_at TEXT
+           )""",
+        """CREATE TABLE IF NOT EXISTS master_services (
+               master_id INTEGER NOT NULL,
+               service_id INTEGER NOT NULL,
+               PRIMARY KEY (master_id, service_id)
+           ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_master_services_service ON master_services(service_id, master_id)",
+        "ALTER TABLE appointments ADD COLUMN master_id INTEGER",
+        # Покрывающий индекс: занятость дня по мастерам читается без обращения к таблице
+        "CREATE INDEX IF NOT EXISTS idx_appointments_day_master ON appointments(date_iso, master_id, time, duration)",
+    ],
+    # 11: постраничный выбор слота для удаления
+    [
+        "CREATE INDEX IF NOT EXISTS idx_slots_start_at ON available_slots(start_at)",
+    ],
+]
+
+# За сколько до начала записи отправляется напоминание каждого вида
+REMINDER_OFFSETS = {
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+}
+# Захваченное, но не отправленное за это время напоминание снова становится доступным
+REMINDER_CLAIM_TIMEOUT = timedelta(minutes=5)
+REMINDER_MAX_ATTEMPTS = 3
+
+# Уведомления outbox: таймаут захвата, число попыток и начальная задержка повтора
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=5)
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = timedelta(minutes=1)
+
+# Формат отметок времени служебных таблиц (reminders, outbox)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def to_iso_date(date):
+    """DD.MM.YYYY -> YYYY-MM-DD (None, если дата некорректна)"""
+    try:
+        return datetime.strptime(date.strip(), "%d.%m.%Y").strftime("%Y-%m-%d")
+    except (ValueError, AttributeError):
+        return None
+
+
+def to_start_at(date, time):
+    """Дата DD.MM.YYYY и время HH:MM -> 'YYYY-MM-DD HH:MM' (None, если некорректны)"""
+    try:
+        return datetime.strptime(f"{date.strip()} {time.strip()}", "%d.%m.%Y %H:%M").strftime(START_AT_FORMAT)
+    except (ValueError, AttributeError):
+        return None
+
+
+async def _schedule_reminders(db, appointment_id, start_at):
+    """Создает напоминания о записи (внутри задания очереди записи).
+
+    Напоминания, время которых уже прошло, не создаются: например, при записи
+    за полчаса до начала напоминание за час не отправляется.
+    """
+    await db.execute("DELETE FROM reminders WHERE appointment_id = ? AND sent_at IS NULL", (appointment_id,))
+    if start_at is None:
+        return
+    start = datetime.strptime(start_at, START_AT_FORMAT)
+    now = datetime.now()
+    await db.executemany("""
+        INSERT OR REPLACE INTO reminders (appointment_id, kind, due_at) VALUES (?, ?, ?)
+    """, [
+        (appointment_id, kind, (start - offset).strftime(START_AT_FORMAT))
+        for kind, offset in REMINDER_OFFSETS.items()
+        if start - offset > now
+    ])
+
+
+async def _service_duration(db, service):
+    """Длительность услуги по названию (внутри задания очереди записи)"""
+    async with db.execute("SELECT duration FROM services WHERE name = ?", (service,)) as cursor:
+        row = await cursor.fetchone()
+    return (row[0] if row else None) or DEFAULT_DURATION
+
+
+async def _slot_status(db, date, time, service):
+    """Можно ли бронировать слот: OK, SLOT_NOT_FOUND или SLOT_TAKEN (слот заполнен)"""
+    async with db.execute("""
+        SELECT is_booked FROM available_slots
+        WHERE date = ? AND time = ? AND service = ?
+    """, (date, time, service)) as cursor:
+        slot = await cursor.fetchone()
+    if slot is None:
+        return BookingStatus.SLOT_NOT_FOUND
+    return BookingStatus.SLOT_TAKEN if slot[0] else BookingStatus.OK
+
+
+async def _free_masters(db, service, date_iso, time, duration, exclude_id=None):
+    """Мастера, которые могут принять запись, от наименее загруженного в этот день.
+
+    Выполняется внутри задания очереди записи по актуальным данным, без кэша.
+    [None] - мастера не заведены и единственное рабочее место свободно;
+    пустой список - время занято у всех мастеров услуги или вне рабочих часов.
+    """
+    if date_iso is None:
+        return [None]
+    start = to_minutes(time)
+    async with db.execute("SELECT weekday, start_time, end_time FROM schedule_template") as cursor:
+        hours = working_hours(await cursor.fetchall())
+    weekday = datetime.strptime(date_iso, "%Y-%m-%d").weekday()
+    if not within_hours(hours.get(weekday), start, start + duration):
+        return []
+
+    masters = None
+    async with db.execute("""
+        SELECT EXISTS(SELECT 1 FROM master_services ms JOIN masters m ON m.id = ms.master_id WHERE m.is_active = 1)
+    """) as cursor:
+        if (await cursor.fetchone())[0]:
+            async with db.execute("""
+                SELECT ms.master_id FROM master_services ms
+                JOIN services s ON s.id = ms.service_id
+                JOIN masters m ON m.id = ms.master_id
+                WHERE s.name = ? AND m.is_active = 1
+                ORDER BY ms.master_id
+            """, (service,)) as masters_cursor:
+                masters = [row[0] for row in await masters_cursor.fetchall()]
+
+    async with db.execute("""
+        SELECT time, duration, master_id FROM appointments WHERE date_iso = ? AND id != ?
+    """, (date_iso, exclude_id or 0)) as cursor:
+        schedules = day_schedules(await cursor.fetchall())
+    free = list(free_masters(schedules, masters, start, start + duration))
+    return sorted(free, key=lambda master_id: len(schedules.get(master_id, ())))
+
+
+async def _close_slot_if_full(db, date, time, service, free):
+    """Помечает слот занятым, если запись заняла последнего свободного мастера"""
+    if len(free) <= 1:
+        await db.execute("""
+            UPDATE available_slots
+            SET is_booked = 1
+            WHERE date = ? AND time = ? AND service = ?
+        """, (date, time, service))
+
+
+async def _enqueue_notification(db, notification):
+    """Добавляет уведомление (chat_id, вид, текст) в outbox внутри задания очереди записи"""
+    if notification is None:
+        return
+    chat_id, kind, text = notification
+    now = datetime.now().strftime(TIMESTAMP_FORMAT)
+    await db.execute("""
+        INSERT INTO outbox (chat_id, kind, text, created_at, available_at) VALUES (?, ?, ?, ?, ?)
+    """, (chat_id, kind, text, now, now))
+
+
+class BookingStatus:
+    """Результат попытки бронирования слота"""
+    OK = "ok"
+    SLOT_TAKEN = "slot_taken"  # слот уже занят другим клиентом
+    SLOT_NOT_FOUND = "slot_not_found"  # такого слота нет
+    DUPLICATE = "duplicate"  # у пользователя уже есть запись на это время
+    LIMIT_REACHED = "limit_reached"  # превышен лимит записей пользователя
+    APPOINTMENT_NOT_FOUND = "appointment_not_found"  # переносимая запись не найдена
+
+
+# Текст ValueError из add_appointment по статусу бронирования
+BOOKING_ERRORS = {
+    BookingStatus.DUPLICATE: "У вас уже есть запись на это время",
+    BookingStatus.SLOT_NOT_FOUND: "Выбранный слот недоступен",
+    BookingStatus.SLOT_TAKEN: "Этот слот уже занят",
+}
 
 
 class Database:
-    def __init__(self, db_path='database.sqlite'):
+    def __init__(self, db_path='database.sqlite', pool_size=5, profile='default'):
         self.db_path = db_path
+        self.profile = profile
+        pragmas = get_profile_pragmas(profile)
+        # Чтение идет через пул соединений, запись - через единственного писателя
+        self.pool = ConnectionPool(db_path, size=pool_size, pragmas=pragmas)
+        self.writer = WriteQueue(db_path, pragmas=pragmas)
+        # Каталог услуг меняется редко, поэтому читается из кэша
+        self.catalog = CatalogCache(self._load_services)
+        # Версия доступности слотов: меняется при каждом изменении available_slots
+        self.availability_version = 0
+        # Занятые интервалы по дням для расчета свободного времени с учетом длительности
+        self.availability = AvailabilityEngine(self._load_busy, self.get_schedule_template, self._load_master_services)
+
+    async def close(self):
+        """Закрывает соединения с базой данных"""
+        await self.writer.close()
+        await self.pool.close()
+
+    async def _write(self, job):
+        """Выполняет job(db) в очереди записи и возвращает его результат"""
+        return await self.writer.submit(job)
+
+    async def _write_slots(self, job):
+        """Как _write, но для изменений слотов: увеличивает версию доступности"""
+        try:
+            return await self._write(job)
+        finally:
+            self.availability_version += 1
 
     async def _create_tables(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async def job(db):
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS appointments (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,113 +348,679 @@ class Database:
                     created_at TEXT
                 )
             """)
-            
+
             # Создаем индексы для ускорения запросов
             await db.execute("CREATE INDEX IF NOT EXISTS idx_slots_service_date ON available_slots(service, date)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_slots_date_service ON available_slots(date, service)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_appointments_time ON appointments(time)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_services_active ON services(is_active)")
-            
-            # Добавляем базовые услуги, если их нет
-            await self._add_default_services()
-            
-            await db.commit()
+
+            await self._migrate(db)
+
+        await self._write(job)
+
+        # Добавляем базовые услуги, если их нет
+        await self._add_default_services()
+
+    async def _migrate(self, db):
+        """Применяет недостающие миграции схемы"""
+        async with db.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {number}")
+            logging.info(f"Применена миграция схемы БД №{number}")
+
+    async def kv_get(self, key):
+        """Значение ключа общего состояния (None, если ключа нет или он истек)"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT value FROM kv_store
+                WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)
+            """, (key, time.time())) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    async def kv_set(self, key, value, ttl=None):
+        """Записывает значение; ttl - время жизни в секундах"""
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        async def job(db):
+            await db.execute("""
+                INSERT INTO kv_store (key, value, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            """, (key, value, expires_at))
+
+        await self._write(job)
+
+    async def kv_delete(self, key):
+        async def job(db):
+            await db.execute("DELETE FROM kv_store WHERE key = ?", (key,))
+
+        await self._write(job)
+
+    async def kv_incr(self, key, window):
+        """Счетчик фиксированного окна: увеличивает и возвращает значение.
+
+        Новое окно длиной window секунд начинается при первом увеличении
+        после истечения предыдущего.
+        """
+        async def job(db):
+            now = time.time()
+            async with db.execute("""
+                INSERT INTO kv_store (key, value, expires_at) VALUES (?, 1, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = CASE WHEN expires_at <= ? THEN 1 ELSE CAST(value AS INTEGER) + 1 END,
+                    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING value
+            """, (key, now + window, now, now)) as cursor:
+                return int((await cursor.fetchone())[0])
+
+        return await self._write(job)
+
+    async def kv_purge_expired(self):
+        """Удаляет истекшие ключи, возвращает их количество"""
+        async def job(db):
+            cursor = await db.execute("DELETE FROM kv_store WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+        return await self._write(job)
+
+    async def _load_busy(self, first_iso, last_iso):
+        """Записи дней с first_iso по last_iso: [(YYYY-MM-DD, HH:MM, длительность, мастер)]"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT date_iso, time, duration, master_id FROM appointments
+                WHERE date_iso BETWEEN ? AND ?
+            """, (first_iso, last_iso)) as cursor:
+                return await cursor.fetchall()
+
+    async def _load_master_services(self):
+        """Услуги активных мастеров: [(название услуги, id мастера)]"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT s.name, ms.master_id FROM master_services ms
+                JOIN services s ON s.id = ms.service_id
+                JOIN masters m ON m.id = ms.master_id
+                WHERE m.is_active = 1
+                ORDER BY ms.master_id
+            """) as cursor:
+                return await cursor.fetchall()
+
+    async def _bookable_times(self, service, first_iso, last_iso):
+        """Свободное будущее время услуги по датам: {YYYY-MM-DD: [HH:MM]}"""
+        now = datetime.now().strftime(START_AT_FORMAT)
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT date_iso, time FROM available_slots
+                WHERE service = ? AND is_booked = 0 AND date_iso BETWEEN ? AND ? AND start_at > ?
+                ORDER BY start_at
+            """, (service, first_iso, last_iso, now)) as cursor:
+                candidates = {}
+                async for date_iso, time in cursor:
+                    candidates.setdefault(date_iso, []).append(time)
+        if not candidates:
+            return {}
+        # Остается время, где запись не пересекается с другими и помещается в рабочие часы
+        row = await self.catalog.by_name(service)
+        return await self.availability.filter(candidates, service, row[3] if row else None)
 
     async def get_available_dates(self, service):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT DISTINCT date FROM available_slots WHERE service=? AND is_booked=0 ORDER BY date", (service,)) as cursor:
-                return [row[0] async for row in cursor]
+        """Свободные даты услуги (DD.MM.YYYY) начиная с сегодняшней, по возрастанию"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        times = await self._bookable_times(service, today, "9999-12-31")
+        return [datetime.strptime(date_iso, "%Y-%m-%d").strftime("%d.%m.%Y") for date_iso in sorted(times)]
+
+    async def get_month_availability(self, service, year, month):
+        """Число свободных мест для начала записи по дням месяца: {день: количество}"""
+        first = f"{year:04d}-{month:02d}-01"
+        last = f"{year:04d}-{month:02d}-31"
+        times = await self._bookable_times(service, first, last)
+        return {int(date_iso[8:10]): len(values) for date_iso, values in times.items()}
+
+    async def get_first_available_date(self, service):
+        """Ближайшая дата со свободным временем услуги (YYYY-MM-DD) или None"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT DISTINCT date_iso FROM available_slots
+                WHERE service = ? AND is_booked = 0 AND date_iso >= ?
+                ORDER BY date_iso
+            """, (service, today)) as cursor:
+                dates = [row[0] async for row in cursor]
+        # Проверяем по месяцу за раз: обычно подходит уже первая дата
+        for index in range(0, len(dates), 31):
+            chunk = dates[index:index + 31]
+            times = await self._bookable_times(service, chunk[0], chunk[-1])
+            if times:
+                return min(times)
+        return None
 
     async def get_available_times(self, date, service):
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT time FROM available_slots WHERE date=? AND service=? AND is_booked=0 ORDER BY time", (date, service)) as cursor:
-                return [row[0] async for row in cursor]
+        """Свободное время услуги на дату (прошедшее и занятое другими записями не возвращается)"""
+        date_iso = to_iso_date(date)
+        if date_iso is None:
+            return []
+        return (await self._bookable_times(service, date_iso, date_iso)).get(date_iso, [])
 
     async def mark_slot_as_booked(self, date, time, service):
-        async with aiosqlite.connect(self.db_path) as db:
+        async def job(db):
             await db.execute("""
                 UPDATE available_slots
                 SET is_booked = 1
                 WHERE date = ? AND time = ? AND service = ?
             """, (date, time, service))
-            await db.commit()
+
+        await self._write_slots(job)
 
     async def mark_slot_as_available(self, date, time, service):
-        async with aiosqlite.connect(self.db_path) as db:
+        async def job(db):
             await db.execute("""
                 UPDATE available_slots
                 SET is_booked = 0
                 WHERE date = ? AND time = ? AND service = ?
             """, (date, time, service))
-            await db.commit()
 
-    async def add_slot(self, date, time, service):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR IGNORE INTO available_slots (date, time, service) 
-                VALUES (?, ?, ?)
-            """, (date, time, service))
-            await db.commit()
+        await self._write_slots(job)
+
+    async def add_slot(self, date, time, service, notification=None):
+        """Добавляет слот; notification (chat_id, вид, текст) попадает в outbox той же транзакцией"""
+        async def job(db):
+            cursor = await db.execute("""
+                INSERT OR IGNORE INTO available_slots (date, time, service, date_iso, start_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (date, time, service, to_iso_date(date), to_start_at(date, time)))
+            if cursor.rowcount:
+                await _enqueue_notification(db, notification)
+
+        await self._write_slots(job)
+
+    async def delete_slot(self, slot_id, notification=None):
+        async def job(db):
+            cursor = await db.execute("DELETE FROM available_slots WHERE id=?", (slot_id,))
+            if cursor.rowcount:
+                await _enqueue_notification(db, notification)
+
+        await self._write_slots(job)
+
+    async def get_schedule_template(self):
+        """Рабочие интервалы: [(день недели 0-6, начало HH:MM, конец HH:MM)]"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT weekday, start_time, end_time FROM schedule_template
+                ORDER BY weekday, start_time
+            """) as cursor:
+                return await cursor.fetchall()
+
+    async def set_schedule_template(self, intervals):
+        """Заменяет шаблон рабочих часов целиком"""
+        async def job(db):
+            await db.execute("DELETE FROM schedule_template")
+            await db.executemany("""
+                INSERT OR REPLACE INTO schedule_template (weekday, start_time, end_time) VALUES (?, ?, ?)
+            """, intervals)
+
+        await self._write_slots(job)
+        self.availability.invalidate()
+
+    async def get_masters(self):
+        """Активные мастера и их услуги: [(id, имя, [названия услуг])] по имени"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT m.id, m.name, s.name FROM masters m
+                LEFT JOIN master_services ms ON ms.master_id = m.id
+                LEFT JOIN services s ON s.id = ms.service_id
+                WHERE m.is_active = 1
+                ORDER BY m.name, s.name
+            """) as cursor:
+                masters = {}
+                async for master_id, name, service in cursor:
+                    services = masters.setdefault(master_id, (master_id, name, []))[2]
+                    if service:
+                        services.append(service)
+                return list(masters.values())
+
+    async def set_masters(self, roster):
+        """Заменяет состав мастеров: roster - [(имя, [id услуг])].
+
+        Мастера сопоставляются по имени. Те, кого нет в составе, становятся
+        неактивными и больше не получают записей, но остаются в своих прошлых.
+        """
+        async def job(db):
+            await db.execute("UPDATE masters SET is_active = 0")
+            for name, service_ids in roster:
+                async with db.execute("""
+                    INSERT INTO masters (name, is_active, created_at) VALUES (?, 1, ?)
+                    ON CONFLICT(name) DO UPDATE SET is_active = 1
+                    RETURNING id
+                """, (name, datetime.now().isoformat())) as cursor:
+                    master_id = (await cursor.fetchone())[0]
+                await db.execute("DELETE FROM master_services WHERE master_id = ?", (master_id,))
+                await db.executemany("""
+                    INSERT OR IGNORE INTO master_services (master_id, service_id) VALUES (?, ?)
+                """, [(master_id, service_id) for service_id in service_ids])
+
+        await self._write_slots(job)
+        self.availability.invalidate()
+
+    async def get_appointment_master(self, appointment_id):
+        """Имя мастера записи (None, если мастер не назначен)"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT m.name FROM appointments a JOIN masters m ON m.id = a.master_id
+                WHERE a.id = ?
+            """, (appointment_id,)) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    async def generate_slots(self, start, end, services=None):
+        """Создает слоты услуг (по умолчанию всех активных) с start по end и возвращает их число"""
+        template = await self.get_schedule_template()
+        if services is None:
+            services = await self.get_all_services()
+        now = datetime.now()
+
+        rows = []
+        day = start
+        while day.date() <= end.date():
+            date = day.strftime("%d.%m.%Y")
+            date_iso = day.strftime("%Y-%m-%d")
+            for weekday, start_time, end_time in template:
+                if weekday != day.weekday():
+                    continue
+                interval_start = datetime.strptime(f"{date_iso} {start_time}", START_AT_FORMAT)
+                interval_end = datetime.strptime(f"{date_iso} {end_time}", START_AT_FORMAT)
+                for service in services:
+                    # Шаг - длительность услуги, округленная вверх до сетки в 15 минут;
+                    # услуга должна закончиться до конца интервала
+                    step = timedelta(minutes=-(-(service[3] or 60) // 15) * 15)
+                    slot = interval_start
+                    while slot + step <= interval_end:
+                        if slot > now:
+                            time = slot.strftime("%H:%M")
+                            rows.append((date, time, service[1], date_iso, slot.strftime(START_AT_FORMAT)))
+                        slot += step
+            day += timedelta(days=1)
+
+        if not rows:
+            return 0
+
+        # Одна транзакция; уже существующие слоты пропускает UNIQUE(date, time, service)
+        async def job(db):
+            cursor = await db.executemany("""
+                INSERT OR IGNORE INTO available_slots (date, time, service, date_iso, start_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            return cursor.rowcount
+
+        return await self._write_slots(job)
 
-    async def delete_slot(self, slot_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM available_slots WHERE id=?", (slot_id,))
-            await db.commit()
+    async def get_slot_by_id(self, slot_id):
+        """Получает слот по ID"""
+        async with self.pool.acquire() as db:
+            async with db.execute("SELECT * FROM available_slots WHERE id = ?", (slot_id,)) as cursor:
+                return await cursor.fetchone()
+
+    async def find_free_slot(self, date, time, service):
+        """Находит свободный слот по (date, time, service) через уникальный индекс"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT * FROM available_slots
+                WHERE date = ? AND time = ? AND service = ? AND is_booked = 0
+            """, (date, time, service)) as cursor:
+                return await cursor.fetchone()
 
     async def get_all_slots(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.acquire() as db:
             async with db.execute("SELECT * FROM available_slots") as cursor:
                 return [row async for row in cursor]
 
+    async def get_slots_page(self, offset, limit):
+        """Страница предстоящих слотов по возрастанию времени и общее число таких слотов"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        async with self.pool.acquire() as db:
+            async with db.execute("SELECT COUNT(*) FROM available_slots WHERE start_at >= ?", (today,)) as cursor:
+                total = (await cursor.fetchone())[0]
+            async with db.execute("""
+                SELECT * FROM available_slots
+                WHERE start_at >= ?
+                ORDER BY start_at, id
+                LIMIT ? OFFSET ?
+            """, (today, limit, offset)) as cursor:
+                return [row async for row in cursor], total
+
     async def add_appointment(self, user_id, service, date, time, fio, allergies, phone):
-        async with aiosqlite.connect(self.db_path) as db:
-            # Проверяем, нет ли уже записи у этого пользователя на это время
+        """Как book_slot, но неудачный статус выбрасывает ValueError; возвращает id записи"""
+        status, appointment_id = await self.book_slot(user_id, service, date, time, fio, allergies, phone)
+        if status != BookingStatus.OK:
+            raise ValueError(BOOKING_ERRORS.get(status, "Не удалось создать запись"))
+        return appointment_id
+
+    async def book_slot(self, user_id, service, date, time, fio, allergies, phone, max_appointments=None,
+                        notification=None):
+        """Атомарно бронирует слот и возвращает (BookingStatus, id записи или None)"""
+        # Проверки и вставка идут в одной транзакции BEGIN IMMEDIATE: одновременные
+        # попытки не получат одного мастера на пересекающееся время
+        async def job(db):
             async with db.execute("""
-                SELECT id FROM appointments 
+                SELECT id FROM appointments
                 WHERE user_id = ? AND date = ? AND time = ?
             """, (user_id, date, time)) as cursor:
-                existing = await cursor.fetchone()
-                if existing:
-                    raise ValueError("У вас уже есть запись на это время")
-            
-            # Проверяем, свободен ли слот
+                if await cursor.fetchone():
+                    return BookingStatus.DUPLICATE, None
+
+            if max_appointments is not None:
+                async with db.execute("""
+                    SELECT COUNT(*) FROM appointments
+                    WHERE user_id = ? AND start_at >= ?
+                """, (user_id, datetime.now().strftime(START_AT_FORMAT))) as cursor:
+                    if (await cursor.fetchone())[0] >= max_appointments:
+                        return BookingStatus.LIMIT_REACHED, None
+
+            status = await _slot_status(db, date, time, service)
+            if status != BookingStatus.OK:
+                return status, None
+
+            # free - свободные мастера, первый наименее загружен за день
+            duration = await _service_duration(db, service)
+            free = await _free_masters(db, service, to_iso_date(date), time, duration)
+            if not free:
+                return BookingStatus.SLOT_TAKEN, None
+
+            cursor = await db.execute("""
+                INSERT INTO appointments
+                (user_id, service, date, time, fio, allergies, phone, created_at, date_iso, start_at, duration,
+                 master_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, service, date, time, fio, allergies, phone, datetime.now().isoformat(),
+                  to_iso_date(date), to_start_at(date, time), duration, free[0]))
+            appointment_id = cursor.lastrowid
+            # Слот закрывается, когда свободных мастеров на это время не осталось
+            await _close_slot_if_full(db, date, time, service, free)
+            await _schedule_reminders(db, appointment_id, to_start_at(date, time))
+            # Уведомление попадает в outbox только вместе с записью
+            await _enqueue_notification(db, notification)
+            return BookingStatus.OK, appointment_id
+
+        status, appointment_id = await self._write_slots(job)
+        if status == BookingStatus.OK:
+            self.availability.invalidate(to_iso_date(date))
+        return status, appointment_id
+
+    async def move_appointment(self, appointment_id, date, time):
+        """Переносит запись на новые дату и время одной транзакцией и возвращает BookingStatus"""
+        old_dates = []
+
+        async def job(db):
             async with db.execute("""
-                SELECT is_booked FROM available_slots 
+                SELECT service, date, time, duration FROM appointments WHERE id = ?
+            """, (appointment_id,)) as cursor:
+                appointment = await cursor.fetchone()
+            if not appointment:
+                return BookingStatus.APPOINTMENT_NOT_FOUND
+            service, old_date, old_time, duration = appointment
+            old_dates.append(to_iso_date(old_date))
+
+            status = await _slot_status(db, date, time, service)
+            if status != BookingStatus.OK:
+                return status
+
+            duration = duration or await _service_duration(db, service)
+            free = await _free_masters(db, service, to_iso_date(date), time, duration, exclude_id=appointment_id)
+            if not free:
+                return BookingStatus.SLOT_TAKEN
+
+            # Старый слот освобождается, запись переходит к свободному мастеру на месте
+            await db.execute("""
+                UPDATE available_slots
+                SET is_booked = 0
                 WHERE date = ? AND time = ? AND service = ?
-            """, (date, time, service)) as cursor:
-                slot = await cursor.fetchone()
-                if not slot:
-                    raise ValueError("Выбранный слот недоступен")
-                if slot[0]:
-                    raise ValueError("Этот слот уже занят")
-            
+            """, (old_date, old_time, service))
             await db.execute("""
-                INSERT INTO appointments 
-                (user_id, service, date, time, fio, allergies, phone, created_at) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, service, date, time, fio, allergies, phone, datetime.now().isoformat()))
-            await db.commit()
+                UPDATE appointments
+                SET date = ?, time = ?, date_iso = ?, start_at = ?, duration = ?, master_id = ?
+                WHERE id = ?
+            """, (date, time, to_iso_date(date), to_start_at(date, time), duration, free[0], appointment_id))
+            await _close_slot_if_full(db, date, time, service, free)
+            await _schedule_reminders(db, appointment_id, to_start_at(date, time))
+            return BookingStatus.OK
+
+        status = await self._write_slots(job)
+        if status == BookingStatus.OK:
+            self.availability.invalidate(to_iso_date(date), *old_dates)
+        return status
 
     async def get_all_appointments(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.acquire() as db:
             async with db.execute("SELECT * FROM appointments") as cursor:
                 return [row async for row in cursor]
 
+    async def get_appointments_page(self, offset, limit, date_iso=None, service=None):
+        """Страница записей по возрастанию времени и общее число записей под фильтром.
+
+        Без date_iso (YYYY-MM-DD) возвращаются предстоящие записи начиная с сегодняшнего дня.
+        """
+        if date_iso:
+            conditions, params = ["date_iso = ?"], [date_iso]
+        else:
+            conditions, params = ["start_at >= ?"], [datetime.now().strftime("%Y-%m-%d")]
+        if service:
+            conditions.append("service = ?")
+            params.append(service)
+        where = " AND ".join(conditions)
+
+        async with self.pool.acquire() as db:
+            async with db.execute(f"SELECT COUNT(*) FROM appointments WHERE {where}", params) as cursor:
+                total = (await cursor.fetchone())[0]
+            # Последний столбец - имя мастера (None, если мастер не назначен)
+            async with db.execute(f"""
+                SELECT a.*, m.name FROM appointments a
+                LEFT JOIN masters m ON m.id = a.master_id
+                WHERE {where}
+                ORDER BY a.start_at, a.id
+                LIMIT ? OFFSET ?
+            """, params + [limit, offset]) as cursor:
+                return [row async for row in cursor], total
+
+    async def get_appointment_dates(self, service=None, limit=10):
+        """Ближайшие даты с записями: [(YYYY-MM-DD, число записей)]"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        async with self.pool.acquire() as db:
+            if service:
+                query, params = """
+                    SELECT date_iso, COUNT(*) FROM appointments
+                    WHERE service = ? AND date_iso >= ?
+                    GROUP BY date_iso ORDER BY date_iso LIMIT ?
+                """, (service, today, limit)
+            else:
+                query, params = """
+                    SELECT date_iso, COUNT(*) FROM appointments
+                    WHERE date_iso >= ?
+                    GROUP BY date_iso ORDER BY date_iso LIMIT ?
+                """, (today, limit)
+            async with db.execute(query, params) as cursor:
+                return await cursor.fetchall()
+
+    async def get_appointments_for_user(self, user_id):
+        """Все записи пользователя по возрастанию времени"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT * FROM appointments
+                WHERE user_id = ?
+                ORDER BY start_at
+            """, (user_id,)) as cursor:
+                return [row async for row in cursor]
+
+    async def count_active_for_user(self, user_id):
+        """Количество предстоящих записей пользователя"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT COUNT(*) FROM appointments
+                WHERE user_id = ? AND start_at >= ?
+            """, (user_id, datetime.now().strftime(START_AT_FORMAT))) as cursor:
+                return (await cursor.fetchone())[0]
+
+    async def get_appointment_by_id(self, appointment_id):
+        """Получает запись по ID"""
+        async with self.pool.acquire() as db:
+            async with db.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,)) as cursor:
+                return await cursor.fetchone()
+
     async def delete_appointment(self, appointment_id):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM appointments WHERE id=?", (appointment_id,))
-            await db.commit()
+        """Удаляет запись администратором: как cancel_appointment, но без уведомления.
+
+        Слот освобождается, версия доступности увеличивается.
+        """
+        return await self.cancel_appointment(appointment_id)
+
+    async def cancel_appointment(self, appointment_id, notification=None):
+        """Отменяет запись: удаляет ее и напоминания и освобождает слот одной транзакцией.
+
+        Возвращает False, если записи уже нет.
+        """
+        dates = []
+
+        async def job(db):
+            async with db.execute("SELECT service, date, time FROM appointments WHERE id = ?", (appointment_id,)) as cursor:
+                appointment = await cursor.fetchone()
+            if not appointment:
+                return False
+            service, date, time = appointment
+            dates.append(to_iso_date(date))
+            await db.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+            await db.execute("DELETE FROM reminders WHERE appointment_id = ?", (appointment_id,))
+            await db.execute("""
+                UPDATE available_slots
+                SET is_booked = 0
+                WHERE date = ? AND time = ? AND service = ?
+            """, (date, time, service))
+            await _enqueue_notification(db, notification)
+            return True
+
+        cancelled = await self._write_slots(job)
+        if cancelled:
+            self.availability.invalidate(*dates)
+        return cancelled
+
+    async def claim_due_reminders(self, limit=100):
+        """Атомарно захватывает наступившие напоминания: [(id напоминания, вид, строка записи)]"""
+        # Захват истекает через REMINDER_CLAIM_TIMEOUT, если отправку не отметили mark_reminder_sent
+        async def job(db):
+            now = datetime.now()
+            async with db.execute("""
+                UPDATE reminders
+                SET claimed_at = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT r.id FROM reminders r
+                    JOIN appointments a ON a.id = r.appointment_id
+                    WHERE r.sent_at IS NULL AND r.due_at <= ? AND a.start_at > ?
+                      AND (r.claimed_at IS NULL OR r.claimed_at < ?) AND r.attempts < ?
+                    ORDER BY r.due_at
+                    LIMIT ?
+                )
+                RETURNING id, kind, appointment_id
+            """, (now.strftime(TIMESTAMP_FORMAT), now.strftime(START_AT_FORMAT), now.strftime(START_AT_FORMAT),
+                  (now - REMINDER_CLAIM_TIMEOUT).strftime(TIMESTAMP_FORMAT), REMINDER_MAX_ATTEMPTS,
+                  limit)) as cursor:
+                claimed = await cursor.fetchall()
+            if not claimed:
+                return []
+
+            ids = [appointment_id for _, _, appointment_id in claimed]
+            placeholders = ", ".join("?" * len(ids))
+            async with db.execute(f"SELECT * FROM appointments WHERE id IN ({placeholders})", ids) as cursor:
+                appointments = {row[0]: row for row in await cursor.fetchall()}
+            return [(reminder_id, kind, appointments[appointment_id])
+                    for reminder_id, kind, appointment_id in claimed]
+
+        return await self._write(job)
+
+    async def mark_reminder_sent(self, reminder_id):
+        async def job(db):
+            await db.execute("UPDATE reminders SET sent_at = ? WHERE id = ?",
+                             (datetime.now().strftime(TIMESTAMP_FORMAT), reminder_id))
+
+        await self._write(job)
+
+    async def release_reminder(self, reminder_id):
+        """Возвращает напоминание после неудачной отправки (до REMINDER_MAX_ATTEMPTS попыток)"""
+        async def job(db):
+            await db.execute("UPDATE reminders SET claimed_at = NULL WHERE id = ?", (reminder_id,))
+
+        await self._write(job)
+
+    async def has_pending_outbox(self):
+        """Есть ли уведомления, готовые к отправке (дешевая проверка перед захватом)"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT 1 FROM outbox
+                WHERE sent_at IS NULL AND available_at <= ? AND attempts < ?
+                LIMIT 1
+            """, (datetime.now().strftime(TIMESTAMP_FORMAT), OUTBOX_MAX_ATTEMPTS)) as cursor:
+                return await cursor.fetchone() is not None
+
+    async def outbox_pending_summary(self):
+        """Число готовых к отправке уведомлений и время создания самого раннего из них"""
+        async with self.pool.acquire() as db:
+            async with db.execute("""
+                SELECT COUNT(*), MIN(created_at) FROM outbox
+                WHERE sent_at IS NULL AND available_at <= ? AND attempts < ?
+            """, (datetime.now().strftime(TIMESTAMP_FORMAT), OUTBOX_MAX_ATTEMPTS)) as cursor:
+                return await cursor.fetchone()
+
+    async def claim_outbox(self, limit=50):
+        """Атомарно захватывает пачку готовых уведомлений: [(id, chat_id, вид, текст)] по порядку"""
+        async def job(db):
+            now = datetime.now()
+            async with db.execute("""
+                UPDATE outbox
+                SET claimed_at = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE sent_at IS NULL AND available_at <= ? AND attempts < ?
+                      AND (claimed_at IS NULL OR claimed_at < ?)
+                    ORDER BY id
+                    LIMIT ?
+                )
+                RETURNING id, chat_id, kind, text
+            """, (now.strftime(TIMESTAMP_FORMAT), now.strftime(TIMESTAMP_FORMAT), OUTBOX_MAX_ATTEMPTS,
+                  (now - OUTBOX_CLAIM_TIMEOUT).strftime(TIMESTAMP_FORMAT), limit)) as cursor:
+                return sorted(await cursor.fetchall())
+
+        return await self._write(job)
+
+    async def complete_outbox(self, sent_ids, failures=()):
+        """Отмечает отправленные уведомления и откладывает неудачные.
+
+        failures - пары (id, текст ошибки); повтор назначается с
+        экспоненциальной задержкой от OUTBOX_RETRY_DELAY.
+        """
+        async def job(db):
+            now = datetime.now()
+            await db.executemany("UPDATE outbox SET sent_at = ?, claimed_at = NULL WHERE id = ?",
+                                 [(now.strftime(TIMESTAMP_FORMAT), outbox_id) for outbox_id in sent_ids])
+            for outbox_id, error in failures:
+                async with db.execute("SELECT attempts FROM outbox WHERE id = ?", (outbox_id,)) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    continue
+                retry_at = now + OUTBOX_RETRY_DELAY * 2 ** (row[0] - 1)
+                await db.execute("""
+                    UPDATE outbox SET claimed_at = NULL, available_at = ?, last_error = ?
+                    WHERE id = ?
+                """, (retry_at.strftime(TIMESTAMP_FORMAT), error, outbox_id))
+
+        await self._write(job)
 
     async def get_appointments_by_date(self, date):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM appointments WHERE date=?", (date,)) as cursor:
+        async with self.pool.acquire() as db:
+            async with db.execute("SELECT * FROM appointments WHERE date_iso=? ORDER BY start_at", (to_iso_date(date),)) as cursor:
                 return [row async for row in cursor]
 
     async def get_appointments_by_time(self, time):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.acquire() as db:
             async with db.execute("SELECT * FROM appointments WHERE time=?", (time,)) as cursor:
                 return [row async for row in cursor]
 
@@ -163,8 +1033,8 @@ class Database:
             ("Чистка лица", "Глубокая чистка лица", 60, 3000.0),
             ("Макияж", "Вечерний макияж", 90, 3500.0)
         ]
-        
-        async with aiosqlite.connect(self.db_path) as db:
+
+        async def job(db):
             for name, description, duration, price in default_services:
                 try:
                     await db.execute("""
@@ -173,26 +1043,32 @@ class Database:
                     """, (name, description, duration, price))
                 except Exception as e:
                     print(f"Ошибка добавления услуги {name}: {e}")
-            await db.commit()
 
-    async def get_all_services(self):
-        """Получает все активные услуги"""
-        async with aiosqlite.connect(self.db_path) as db:
+        try:
+            await self._write(job)
+        finally:
+            self.catalog.invalidate()
+
+    async def _load_services(self):
+        """Читает весь каталог услуг из БД (используется кэшем каталога)"""
+        async with self.pool.acquire() as db:
             async with db.execute("""
-                SELECT * FROM services 
-                WHERE is_active = 1 
+                SELECT * FROM services
                 ORDER BY name
             """) as cursor:
                 return [row async for row in cursor]
 
+    async def get_all_services(self):
+        """Получает все активные услуги"""
+        return await self.catalog.active()
+
     async def get_all_services_admin(self):
         """Получает все услуги для админ-панели (включая неактивные)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT * FROM services 
-                ORDER BY name
-            """) as cursor:
-                return [row async for row in cursor]
+        return await self.catalog.all()
+
+    async def get_service_by_name(self, name):
+        """Получает активную услугу по названию без учета регистра"""
+        return await self.catalog.by_name(name)
 
     async def add_service(self, name, description="", duration=60, price=0.0, photo_path=None):
         """Добавляет новую услугу"""
@@ -202,79 +1078,101 @@ class Database:
         if not name or len(name) < 2:
             logging.warning(f"Попытка добавить услугу с некорректным именем: '{name}'")
             return False
+
+        async def job(db):
+            cursor = await db.execute("SELECT id FROM services WHERE name = ?", (name,))
+            if await cursor.fetchone():
+                logging.warning(f"Попытка добавить дублирующую услугу: '{name}'")
+                return False
+            await db.execute("""
+                INSERT INTO services (name, description, duration, price, photo_path, created_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now'))
+            """, (name, description, duration, price, photo_path))
+            return True
+
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("SELECT id FROM services WHERE name = ?", (name,))
-                if await cursor.fetchone():
-                    logging.warning(f"Попытка добавить дублирующую услугу: '{name}'")
-                    return False
-                await db.execute("""
-                    INSERT INTO services (name, description, duration, price, photo_path, created_at)
-                    VALUES (?, ?, ?, ?, ?, datetime('now'))
-                """, (name, description, duration, price, photo_path))
-                await db.commit()
-                return True
+            return await self._write(job)
         except Exception as e:
             logging.error(f"Ошибка добавления услуги: {e}")
             return False
+        finally:
+            self.catalog.invalidate()
 
     async def update_service(self, service_id, name=None, description=None, duration=None, price=None, photo_path=None, is_active=None):
         """Обновляет услугу"""
         from services.validation import sanitize_input
+        updates = []
+        params = []
+        if name is not None:
+            name = sanitize_input(name, 50)
+            if not name or len(name) < 2:
+                logging.warning(f"Попытка обновить услугу с некорректным именем: '{name}'")
+                return False
+            updates.append("name = ?")
+            params.append(name)
+        if description is not None:
+            description = sanitize_input(description, 200)
+            updates.append("description = ?")
+            params.append(description)
+        if duration is not None:
+            updates.append("duration = ?")
+            params.append(duration)
+        if price is not None:
+            updates.append("price = ?")
+            params.append(price)
+        if photo_path is not None:
+            updates.append("photo_path = ?")
+            params.append(photo_path)
+            # Новый файл нужно будет загрузить в Telegram заново
+            updates.append("photo_file_id = NULL")
+        if is_active is not None:
+            updates.append("is_active = ?")
+            params.append(is_active)
+        if not updates:
+            return False
+        params.append(service_id)
+        query = f"UPDATE services SET {', '.join(updates)} WHERE id = ?"
+
+        async def job(db):
+            await db.execute(query, params)
+            return True
+
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                updates = []
-                params = []
-                if name is not None:
-                    name = sanitize_input(name, 50)
-                    if not name or len(name) < 2:
-                        logging.warning(f"Попытка обновить услугу с некорректным именем: '{name}'")
-                        return False
-                    updates.append("name = ?")
-                    params.append(name)
-                if description is not None:
-                    description = sanitize_input(description, 200)
-                    updates.append("description = ?")
-                    params.append(description)
-                if duration is not None:
-                    updates.append("duration = ?")
-                    params.append(duration)
-                if price is not None:
-                    updates.append("price = ?")
-                    params.append(price)
-                if photo_path is not None:
-                    updates.append("photo_path = ?")
-                    params.append(photo_path)
-                if is_active is not None:
-                    updates.append("is_active = ?")
-                    params.append(is_active)
-                if not updates:
-                    return False
-                params.append(service_id)
-                query = f"UPDATE services SET {', '.join(updates)} WHERE id = ?"
-                await db.execute(query, params)
-                await db.commit()
-                return True
+            return await self._write(job)
         except Exception as e:
             logging.error(f"Ошибка обновления услуги: {e}")
             return False
+        finally:
+            self.catalog.invalidate()
 
     async def delete_service(self, service_id):
         """Удаляет услугу (помечает как неактивную)"""
+        async def job(db):
+            await db.execute("UPDATE services SET is_active = 0 WHERE id = ?", (service_id,))
+            return True
+
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("UPDATE services SET is_active = 0 WHERE id = ?", (service_id,))
-                await db.commit()
-                return True
+            return await self._write(job)
         except Exception as e:
             print(f"Ошибка удаления услуги: {e}")
             return False
+        finally:
+            self.catalog.invalidate()
+
+    async def set_service_photo_file_id(self, service_id, file_id):
+        """Сохраняет file_id загруженной в Telegram фотографии услуги (None - сбросить)"""
+        async def job(db):
+            await db.execute("UPDATE services SET photo_file_id = ? WHERE id = ?", (file_id, service_id))
+
+        try:
+            await self._write(job)
+        except Exception as e:
+            logging.error(f"Ошибка сохранения file_id фото услуги {service_id}: {e}")
+        finally:
+            self.catalog.invalidate()
 
     async def get_service_by_id(self, service_id):
         """Получает услугу по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT * FROM services WHERE id = ?", (service_id,)) as cursor:
-                row = await cursor.fetchone()
-                return row if row else None
+        return await self.catalog.by_id(service_id)
 
-db = Database()
+db = Database(DATABASE_PATH, pool_size=DB_POOL_SIZE, profile=DATABASE_PROFILE)
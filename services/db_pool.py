@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA, которые применяются к каждому соединению один раз при открытии
+DEFAULT_PRAGMAS: List[Tuple[str, object]] = [
+    ("busy_timeout", 5000),
+    ("foreign_keys", "ON"),
+]
+
+# Профили хранилища: набор PRAGMA для каждого режима работы SQLite
+STORAGE_PROFILES: Dict[str, List[Tuple[str, object]]] = {
+    # Журнал отката SQLite по умолчанию
+    "default": DEFAULT_PRAGMAS,
+    # WAL: читатели не блокируются на время записи
+    "wal": DEFAULT_PRAGMAS + [
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -16000),  # ~16 МБ страничного кэша на соединение
+        ("mmap_size", 268435456),  # 256 МБ
+        ("temp_store", "MEMORY"),
+        ("wal_autocheckpoint", 1000),
+    ],
+}
+
+
+def get_profile_pragmas(profile: str) -> List[Tuple[str, object]]:
+    """Возвращает PRAGMA для профиля хранилища"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Неизвестный профиль хранилища: {profile}")
+    return list(STORAGE_PROFILES[profile])
+
+
+async def open_connection(db_path: str, pragmas: List[Tuple[str, object]]) -> aiosqlite.Connection:
+    """Открывает соединение в режиме autocommit и применяет PRAGMA"""
+    # Транзакциями управляем явно (BEGIN/COMMIT), поэтому isolation_level=None
+    conn = aiosqlite.connect(db_path, isolation_level=None)
+    # Поток соединения не должен мешать завершению процесса
+    conn.daemon = True
+    await conn
+    for name, value in pragmas:
+        await conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+class ConnectionPool:
+    """Пул постоянных соединений с SQLite"""
+
+    def __init__(self, db_path: str, size: int = 5, pragmas: Optional[List[Tuple[str, object]]] = None,
+                 health_check_interval: float = 30.0):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.pragmas = list(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.health_check_interval = health_check_interval
+
+        self._idle: Optional[asyncio.LifoQueue] = None
+        self._last_used: Dict[int, float] = {}  # id(conn) -> время последнего использования
+        self._created = 0
+        self._closed = False
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        conn = await open_connection(self.db_path, self.pragmas)
+        self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    async def _close_connection(self, conn: aiosqlite.Connection):
+        self._last_used.pop(id(conn), None)
+        self._created -= 1
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.error(f"Ошибка закрытия соединения с БД: {e}")
+
+    async def _check_connection(self, conn: aiosqlite.Connection) -> aiosqlite.Connection:
+        """Проверяет соединение, простоявшее дольше health_check_interval, и при сбое заменяет его"""
+        last_used = self._last_used.get(id(conn), 0.0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return conn
+        try:
+            await conn.execute("SELECT 1")
+            return conn
+        except Exception as e:
+            logger.warning(f"Соединение с БД не прошло проверку, переоткрываем: {e}")
+            await self._close_connection(conn)
+            self._created += 1
+            try:
+                return await self._open_connection()
+            except Exception:
+                self._created -= 1
+                raise
+
+    async def _get(self) -> aiosqlite.Connection:
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+
+        while True:
+            if not self._idle.empty():
+                conn = self._idle.get_nowait()
+            elif self._created < self.size:
+                conn = None
+            else:
+                conn = await self._idle.get()
+            if conn is not None:
+                return await self._check_connection(conn)
+            # None - свободное место после закрытого соединения; если место уже
+            # занято новым соединением, ждем дальше
+            if self._created >= self.size:
+                continue
+            self._created += 1
+            try:
+                return await self._open_connection()
+            except Exception:
+                self._created -= 1
+                # Место остается свободным: будим следующего ожидающего
+                self._idle.put_nowait(None)
+                raise
+
+    async def _release(self, conn: aiosqlite.Connection):
+        try:
+            # Не оставляем незавершенных транзакций и чужих настроек
+            if conn.in_transaction:
+                await conn.execute("ROLLBACK")
+            conn.row_factory = None
+        except Exception as e:
+            logger.error(f"Ошибка при возврате соединения в пул: {e}")
+            await self._close_connection(conn)
+            # Ожидающий в _get откроет новое соединение вместо закрытого
+            if not self._closed:
+                self._idle.put_nowait(None)
+            return
+
+        if self._closed:
+            await self._close_connection(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Выдает соединение из пула на время блока async with"""
+        conn = await self._get()
+        try:
+            yield conn
+        finally:
+            await self._release(conn)
+
+    async def health_check(self) -> bool:
+        """Проверяет, что база данных отвечает"""
+        try:
+            async with self.acquire() as conn:
+                async with conn.execute("SELECT 1") as cursor:
+                    return (await cursor.fetchone())[0] == 1
+        except Exception as e:
+            logger.error(f"Проверка БД не пройдена: {e}")
+            return False
+
+    async def close(self):
+        """Закрывает все свободные соединения; занятые закроются при возврате"""
+        self._closed = True
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                await self._close_connection(conn)
+        logger.info("Пул соединений с БД закрыт")
+
+
+class WriteQueue:
+    """Единственный писатель: сериализует записи и фиксирует их пакетами.
+
+    Каждая задача записи - это корутина job(conn), выполняемая внутри общей
+    транзакции BEGIN IMMEDIATE под собственным SAVEPOINT. Ошибка одной задачи
+    откатывает только ее изменения, остальные фиксируются одним COMMIT.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[List[Tuple[str, object]]] = None, max_batch: int = 64):
+        self.db_path = db_path
+        self.pragmas = list(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.max_batch = max(1, max_batch)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._closed = False
+
+    async def submit(self, job: Callable[[aiosqlite.Connection], Awaitable[Any]]) -> Any:
+        """Ставит задачу в очередь и ждет ее фиксации"""
+        if self._closed:
+            raise RuntimeError("Очередь записи закрыта")
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            # Забираем все, что уже накопилось, и фиксируем одним коммитом
+            while len(batch) < self.max_batch and not self._queue.empty():
+                next_item = self._queue.get_nowait()
+                if next_item is None:
+                    stop = True
+                    break
+                batch.append(next_item)
+            await self._commit_batch(batch)
+            if stop:
+                break
+
+    async def _commit_batch(self, batch):
+        results = []
+        try:
+            if self._conn is None:
+                self._conn = await open_connection(self.db_path, self.pragmas)
+            conn = self._conn
+            await conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                await conn.execute("SAVEPOINT write_job")
+                try:
+                    result = await job(conn)
+                    await conn.execute("RELEASE write_job")
+                    results.append((True, result))
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_job")
+                    await conn.execute("RELEASE write_job")
+                    results.append((False, e))
+            await conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Ошибка фиксации пакета записи: {e}")
+            if self._conn is not None:
+                try:
+                    if self._conn.in_transaction:
+                        await self._conn.execute("ROLLBACK")
+                except Exception as rollback_error:
+                    logger.error(f"Ошибка отката пакета записи: {rollback_error}")
+                    await self._conn.close()
+                    self._conn = None
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def close(self):
+        """Дожидается выполнения поставленных задач и закрывает соединение"""
+        self._closed = True
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+
+from services.database import Database, TIMESTAMP_FORMAT
+from services.sender import MessageSender
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# Заголовки разделов сводки по виду уведомления
+DIGEST_TITLES = {
+    "booking": "🆕 Новые записи",
+    "cancel": "❌ Отмены",
+    "slot_added": "➕ Добавлены слоты",
+    "slot_deleted": "➖ Удалены слоты",
+}
+DIGEST_SEPARATOR = "\n\n" + "─" * 12 + "\n\n"
+
+
+def build_digest(rows) -> List[Tuple[str, List[int]]]:
+    """Собирает уведомления одного чата (id, chat_id, вид, текст) в сводку.
+
+    Возвращает список сообщений (текст, id вошедших уведомлений): сводка
+    делится по границам уведомлений, чтобы не превышать MESSAGE_LIMIT.
+    """
+    counts = Counter(kind for _, _, kind, _ in rows)
+    header = f"📋 <b>Сводка событий: {len(rows)}</b>\n" + "\n".join(
+        f"{DIGEST_TITLES.get(kind, kind)}: {count}" for kind, count in counts.items()
+    )
+
+    messages = []
+    text, ids = header, []
+    for outbox_id, _, _, event_text in rows:
+        if ids and len(text) + len(DIGEST_SEPARATOR) + len(event_text) > MESSAGE_LIMIT:
+            messages.append((text, ids))
+            text, ids = "📋 <b>Сводка (продолжение)</b>", []
+        text += DIGEST_SEPARATOR + event_text
+        ids.append(outbox_id)
+    messages.append((text, ids))
+    return messages
+
+
+class OutboxWorker:
+    """Фоновая отправка уведомлений из таблицы outbox.
+
+    Уведомления записываются в outbox в одной транзакции с изменением
+    (запись, отмена, слоты), поэтому не теряются при сбое отправки или
+    перезапуске. Воркер захватывает их пачками, отправляет через очередь
+    MessageSender и отмечает результат одной записью в БД на пачку.
+
+    В режиме сводки (digest_interval задан) уведомления копятся и уходят
+    одним сообщением на чат, когда самому раннему из них исполнится
+    digest_interval секунд или их наберется digest_max_events.
+    """
+
+    def __init__(self, database: Database, sender: MessageSender, bot: Bot,
+                 interval: float = 1.0, batch_size: int = 50,
+                 digest_interval: Optional[float] = None, digest_max_events: int = 20):
+        self.database = database
+        self.sender = sender
+        self.bot = bot
+        self.interval = interval
+        self.batch_size = batch_size
+        self.digest_interval = digest_interval
+        self.digest_max_events = digest_max_events
+
+    async def _send(self, chat_id: int, text: str):
+        await self.sender.send_message(chat_id, text, bot=self.bot, parse_mode="HTML")
+
+    async def _digest_due(self) -> bool:
+        count, oldest = await self.database.outbox_pending_summary()
+        if not count:
+            return False
+        if count >= self.digest_max_events:
+            return True
+        age = datetime.now() - datetime.strptime(oldest, TIMESTAMP_FORMAT)
+        return age >= timedelta(seconds=self.digest_interval)
+
+    def _messages(self, batch) -> List[Tuple[int, str, List[int]]]:
+        """Сообщения для отправки: (chat_id, текст, id уведомлений)"""
+        if self.digest_interval is None:
+            return [(chat_id, text, [outbox_id]) for outbox_id, chat_id, _, text in batch]
+        by_chat = {}
+        for row in batch:
+            by_chat.setdefault(row[1], []).append(row)
+        return [(chat_id, text, ids)
+                for chat_id, rows in by_chat.items()
+                for text, ids in build_digest(rows)]
+
+    async def drain_once(self) -> int:
+        """Отправляет одну пачку готовых уведомлений, возвращает ее размер"""
+        if self.digest_interval is None:
+            if not await self.database.has_pending_outbox():
+                return 0
+            limit = self.batch_size
+        else:
+            if not await self._digest_due():
+                return 0
+            limit = max(self.batch_size, self.digest_max_events)
+        batch = await self.database.claim_outbox(limit)
+        if not batch:
+            return 0
+
+        messages = self._messages(batch)
+        results = await asyncio.gather(
+            *(self._send(chat_id, text) for chat_id, text, _ in messages),
+            return_exceptions=True
+        )
+        sent_ids = []
+        failures = []
+        for (chat_id, _, ids), result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка отправки уведомлений {ids} в чат {chat_id}: {result}")
+                failures.extend((outbox_id, str(result)) for outbox_id in ids)
+            else:
+                sent_ids.extend(ids)
+        await self.database.complete_outbox(sent_ids, failures)
+        return len(batch)
+
+    async def run(self):
+        """Опрашивает outbox, пока задачу не отменят"""
+        while True:
+            try:
+                # Полная пачка - вероятно, есть еще: забираем следующую без паузы
+                if await self.drain_once() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка в OutboxWorker: {e}")
+            await asyncio.sleep(self.interval)
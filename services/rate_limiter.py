@@ -1,59 +1,178 @@
 import asyncio
+import heapq
+import time
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Set, Tuple
+from typing import Dict, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class RequestLog:
+    """Счетчики запросов пользователя по корзинам.
+
+    Окно минуты - 60 корзин по секунде, окно часа - 60 корзин по минуте
+    (120 счетчиков array('H'), 240 байт независимо от лимитов). Суммы окон
+    ведутся накопительно: при сдвиге времени обнуляются устаревшие корзины
+    (не больше 60 в каждом кольце), проверка лимита - сравнение суммы.
+    Час считается с точностью до минуты.
+    """
+
+    __slots__ = ("counts", "second", "minute_total", "hour_total")
+
+    def __init__(self):
+        self.counts = array('H', bytes(2 * 120))  # [0:60] секунды, [60:120] минуты
+        self.second = None  # последняя учтенная секунда time.monotonic()
+        self.minute_total = 0
+        self.hour_total = 0
+
+    def _advance(self, second: int):
+        """Обнуляет корзины, вышедшие из окон к секунде second"""
+        last = self.second
+        if last is not None and second <= last:
+            return
+        self.second = second
+        if last is None:
+            return
+        counts = self.counts
+        for tick in range(last + 1, min(second, last + 60) + 1):
+            index = tick % 60
+            self.minute_total -= counts[index]
+            counts[index] = 0
+        last_minute, minute = last // 60, second // 60
+        for tick in range(last_minute + 1, min(minute, last_minute + 60) + 1):
+            index = 60 + tick % 60
+            self.hour_total -= counts[index]
+            counts[index] = 0
+
+    def totals(self, now: float) -> Tuple[int, int]:
+        """Число запросов за последнюю минуту и за последний час"""
+        self._advance(int(now))
+        return self.minute_total, self.hour_total
+
+    def add(self, now: float):
+        second = int(now)
+        self._advance(second)
+        self.counts[second % 60] += 1
+        self.counts[60 + second // 60 % 60] += 1
+        self.minute_total += 1
+        self.hour_total += 1
+
+
 class RateLimiter:
     """Система защиты от спама"""
     
-    def __init__(self):
-        self.user_requests: Dict[int, list] = {}  # user_id -> list of timestamps
-        self.user_states: Dict[int, str] = {}  # user_id -> current state
-        self.blocked_users: Set[int] = set()  # заблокированные пользователи
+    def __init__(self, max_tracked_users: int = 50_000, max_blocked_users: int = 100_000, backend=None):
+        # (user_id, профиль) -> счетчики запросов, от давно активных к недавним
+        self.user_requests: "OrderedDict[Tuple[int, str], RequestLog]" = OrderedDict()
+        self.user_states: "OrderedDict[int, str]" = OrderedDict()  # user_id -> current state
+        self.blocked_users: Dict[int, float] = {}  # user_id -> время разблокировки (time.monotonic())
+        # Очередь разблокировок: (время разблокировки, user_id). Записи снятых
+        # вручную или продленных блокировок пропускаются при извлечении
+        self._unblock_heap: List[Tuple[float, int]] = []
+        
+        # Жесткий предел числа отслеживаемых записей: при превышении
+        # вытесняются давно неактивные пользователи
+        self.max_tracked_users = max_tracked_users
+        # Отдельный предел блокировок: действующие блокировки не вытесняются,
+        # чтобы поток одноразовых аккаунтов не снимал их с настоящих нарушителей
+        self.max_blocked_users = max_blocked_users
         
-        # Настройки лимитов
+        # Общее хранилище состояния (StateBackend): если задано, лимиты и
+        # блокировки разделяются всеми процессами бота
+        self.backend = backend
+        
+        # Настройки лимитов (профиль "default")
         self.max_requests_per_minute = 30
         self.max_requests_per_hour = 200
         self.block_duration = timedelta(hours=1)
         self.state_timeout = timedelta(minutes=10)
+        
+        # Профили лимитов для отдельных маршрутов: название -> (в минуту, в час)
+        self.limit_profiles: Dict[str, Tuple[int, int]] = {
+            "callback": (60, 600),  # дешевые нажатия кнопок
+            "booking": (5, 30),  # подтверждение записи
+        }
     
-    def is_rate_limited(self, user_id: int) -> bool:
+    def get_limits(self, profile: str) -> Tuple[int, int]:
+        """Лимиты профиля: (запросов в минуту, запросов в час)"""
+        if profile in self.limit_profiles:
+            return self.limit_profiles[profile]
+        return self.max_requests_per_minute, self.max_requests_per_hour
+    
+    def is_rate_limited(self, user_id: int, profile: str = "default") -> bool:
         """Проверяет, не превышен ли лимит запросов"""
-        now = datetime.now()
+        now = time.monotonic()
         
         # Проверяем, не заблокирован ли пользователь
+        self.expire_blocks(now)
         if user_id in self.blocked_users:
             return True
         
-        # Получаем историю запросов пользователя
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
+        per_minute, per_hour = self.get_limits(profile)
         
-        requests = self.user_requests[user_id]
+        # Получаем историю запросов пользователя
+        key = (user_id, profile)
+        log = self.user_requests.get(key)
+        if log is None:
+            log = RequestLog()
+            self.user_requests[key] = log
+            if len(self.user_requests) > self.max_tracked_users:
+                self.user_requests.popitem(last=False)
+        else:
+            self.user_requests.move_to_end(key)
         
-        # Удаляем старые запросы (старше часа)
-        requests = [req for req in requests if now - req < timedelta(hours=1)]
-        self.user_requests[user_id] = requests
+        minute_count, hour_count = log.totals(now)
         
         # Проверяем лимит за минуту
-        recent_requests = [req for req in requests if now - req < timedelta(minutes=1)]
-        if len(recent_requests) >= self.max_requests_per_minute:
-            self.blocked_users.add(user_id)
-            logger.warning(f"Пользователь {user_id} заблокирован за превышение лимита запросов")
+        if minute_count >= per_minute:
+            self.block_user(user_id, now)
+            logger.warning(f"Пользователь {user_id} заблокирован за превышение лимита запросов ({profile})")
             return True
         
         # Проверяем лимит за час
-        if len(requests) >= self.max_requests_per_hour:
-            self.blocked_users.add(user_id)
-            logger.warning(f"Пользователь {user_id} заблокирован за превышение лимита запросов за час")
+        if hour_count >= per_hour:
+            self.block_user(user_id, now)
+            logger.warning(f"Пользователь {user_id} заблокирован за превышение лимита запросов за час ({profile})")
             return True
         
         # Добавляем текущий запрос
-        requests.append(now)
+        log.add(now)
         return False
     
+    async def check_blocked(self, user_id: int) -> bool:
+        """Заблокирован ли пользователь (с учетом общего хранилища)"""
+        if self.is_user_blocked(user_id):
+            return True
+        if self.backend is None:
+            return False
+        return await self.backend.get(f"rl:block:{user_id}") is not None
+    
+    async def check_rate_limit(self, user_id: int, profile: str = "default") -> bool:
+        """Как is_rate_limited, но счетчики хранятся в общем хранилище.
+        
+        В общем хранилище лимиты считаются фиксированными окнами (минута, час),
+        блокировка на block_duration видна всем процессам и сохраняется при
+        перезапуске. Без хранилища используется is_rate_limited.
+        Действующую блокировку вызывающий проверяет заранее через check_blocked.
+        """
+        if self.backend is None:
+            return self.is_rate_limited(user_id, profile)
+        
+        per_minute, per_hour = self.get_limits(profile)
+        minute_count = await self.backend.incr_window(f"rl:{profile}:{user_id}:m", 60)
+        hour_count = await self.backend.incr_window(f"rl:{profile}:{user_id}:h", 3600)
+        if minute_count <= per_minute and hour_count <= per_hour:
+            return False
+        
+        await self.backend.set(f"rl:block:{user_id}", "1", self.block_duration.total_seconds())
+        # Локальная копия блокировки избавляет от обращений к хранилищу
+        self.block_user(user_id)
+        logger.warning(f"Пользователь {user_id} заблокирован за превышение лимита запросов ({profile})")
+        return True
+    
     def check_state_validity(self, user_id: int, expected_state: str) -> bool:
         """Проверяет валидность состояния пользователя"""
         now = datetime.now()
@@ -79,34 +198,75 @@ class RateLimiter:
     def set_user_state(self, user_id: int, state: str):
         """Устанавливает состояние пользователя"""
         self.user_states[user_id] = datetime.now().isoformat()
+        self.user_states.move_to_end(user_id)
+        if len(self.user_states) > self.max_tracked_users:
+            self.user_states.popitem(last=False)
     
     def clear_user_state(self, user_id: int):
         """Очищает состояние пользователя"""
         if user_id in self.user_states:
             del self.user_states[user_id]
     
+    def block_user(self, user_id: int, now: float = None) -> bool:
+        """Блокирует пользователя на block_duration.
+        
+        Если достигнут предел блокировок, новая не добавляется (False):
+        такой пользователь остается ограничен своими счетчиками запросов.
+        """
+        if now is None:
+            now = time.monotonic()
+        if user_id not in self.blocked_users and len(self.blocked_users) >= self.max_blocked_users:
+            self.expire_blocks(now)
+            if len(self.blocked_users) >= self.max_blocked_users:
+                logger.warning(f"Достигнут предел блокировок ({self.max_blocked_users}), "
+                               f"пользователь {user_id} не заблокирован")
+                return False
+        until = now + self.block_duration.total_seconds()
+        self.blocked_users[user_id] = until
+        heapq.heappush(self._unblock_heap, (until, user_id))
+        return True
+    
+    def expire_blocks(self, now: float = None):
+        """Снимает истекшие блокировки"""
+        if now is None:
+            now = time.monotonic()
+        heap = self._unblock_heap
+        while heap and heap[0][0] <= now:
+            until, user_id = heapq.heappop(heap)
+            if self.blocked_users.get(user_id) == until:
+                del self.blocked_users[user_id]
+                logger.info(f"Блокировка пользователя {user_id} истекла")
+    
     def is_user_blocked(self, user_id: int) -> bool:
         """Проверяет, заблокирован ли пользователь"""
+        self.expire_blocks()
         return user_id in self.blocked_users
     
     def unblock_user(self, user_id: int):
-        """Разблокирует пользователя"""
+        """Разблокирует пользователя (в общем хранилище - см. unblock_user_shared)"""
         if user_id in self.blocked_users:
-            self.blocked_users.remove(user_id)
+            del self.blocked_users[user_id]
             logger.info(f"Пользователь {user_id} разблокирован")
     
+    async def unblock_user_shared(self, user_id: int):
+        """Разблокирует пользователя во всех процессах"""
+        self.unblock_user(user_id)
+        if self.backend is not None:
+            await self.backend.delete(f"rl:block:{user_id}")
+    
     def cleanup_old_data(self):
         """Очищает старые данные"""
         now = datetime.now()
+        monotonic_now = time.monotonic()
         
-        # Очищаем старые запросы
-        for user_id in list(self.user_requests.keys()):
-            requests = self.user_requests[user_id]
-            requests = [req for req in requests if now - req < timedelta(hours=1)]
-            if not requests:
-                del self.user_requests[user_id]
-            else:
-                self.user_requests[user_id] = requests
+        # Снимаем истекшие блокировки
+        self.expire_blocks(monotonic_now)
+        
+        # Удаляем пользователей без запросов за последний час
+        for key in list(self.user_requests.keys()):
+            log = self.user_requests[key]
+            if log.second is None or monotonic_now - log.second >= 3600:
+                del self.user_requests[key]
         
         # Очищаем старые состояния
         for user_id in list(self.user_states.keys()):
@@ -123,11 +283,17 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 # Запускаем периодическую очистку
-async def cleanup_task():
-    """Периодическая очистка старых данных"""
+async def cleanup_task(state_backend=None):
+    """Периодическая очистка старых данных.
+
+    state_backend - хранилище FSM: его истекшие записи удаляются, даже
+    если лимиты считаются в памяти без хранилища.
+    """
     while True:
         try:
             rate_limiter.cleanup_old_data()
+            for backend in {state_backend, rate_limiter.backend} - {None}:
+                await backend.purge_expired()
             await asyncio.sleep(300)  # Каждые 5 минут
         except Exception as e:
             logger.error(f"Ошибка в cleanup_task: {e}")
@@ -1,75 +1,89 @@
+import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram import Bot
 from services.database import db
-from datetime import datetime, timedelta
+from services.sender import sender
 import logging
 
 
+def day_reminder_text(appt):
+    return (
+        f"🔔 <b>Напоминание о записи!</b>\n\n"
+        f"📅 Завтра у вас запись:\n"
+        f"💆‍♀️ <b>{appt[2]}</b>\n"
+        f"📅 Дата: {appt[3]}\n"
+        f"⏰ Время: {appt[4]}\n"
+        f"👤 {appt[5]}\n\n"
+        f"⚠️ <b>Важно:</b>\n"
+        f"• Приходите за 10 минут до назначенного времени\n"
+        f"• Возьмите с собой документы\n"
+        f"• При аллергиях предупредите мастера\n\n"
+        f"📞 Если нужно отменить запись, обратитесь к администратору"
+    )
+
+
+def hour_reminder_text(appt):
+    return (
+        f"⏰ <b>Скоро ваша запись!</b>\n\n"
+        f"💆‍♀️ <b>{appt[2]}</b>\n"
+        f"📅 {appt[3]} в {appt[4]}\n"
+        f"👤 {appt[5]}\n\n"
+        f"🚀 <b>Готовьтесь к приему!</b>\n"
+        f"• У вас есть 1 час до записи\n"
+        f"• Не забудьте документы\n"
+        f"• Приходите за 10 минут до времени\n\n"
+        f"🎯 Ждем вас!"
+    )
+
+
+# Текст напоминания по виду (см. REMINDER_OFFSETS в services/database.py)
+REMINDER_TEXTS = {
+    "day": day_reminder_text,
+    "hour": hour_reminder_text,
+}
+
+
+# Сколько раз пытаться отметить отправленное напоминание
+MARK_SENT_ATTEMPTS = 3
+
+
 def start_scheduler(bot: Bot):
     scheduler = AsyncIOScheduler()
 
+    async def deliver(reminder_id, kind, appt):
+        try:
+            await sender.send_message(
+                appt[1],
+                REMINDER_TEXTS[kind](appt),
+                bot=bot,
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            await db.release_reminder(reminder_id)
+            logging.error(f"Ошибка отправки напоминания ({kind}) пользователю {appt[1]}: {e}")
+            return
+        # Напоминание уже отправлено: отметку повторяем, иначе после истечения
+        # захвата оно уйдет второй раз. Ошибка не прерывает остальную пачку
+        for attempt in range(MARK_SENT_ATTEMPTS):
+            try:
+                await db.mark_reminder_sent(reminder_id)
+                break
+            except Exception as e:
+                logging.error(f"Не удалось отметить отправку напоминания {reminder_id} (попытка {attempt + 1}): {e}")
+                await asyncio.sleep(1)
+        logging.info(f"Отправлено напоминание ({kind}) пользователю {appt[1]}")
+
     async def send_reminders():
         try:
-            now = datetime.now()
-            tomorrow = now + timedelta(days=1)
-            
-            # Напоминания за день
-            tomorrow_appointments = await db.get_appointments_by_date(tomorrow.strftime("%d.%m.%Y"))
-            for appt in tomorrow_appointments:
-                try:
-                    reminder_text = (
-                        f"🔔 <b>Напоминание о записи!</b>\n\n"
-                        f"📅 Завтра у вас запись:\n"
-                        f"💆‍♀️ <b>{appt[2]}</b>\n"
-                        f"📅 Дата: {appt[3]}\n"
-                        f"⏰ Время: {appt[4]}\n"
-                        f"👤 {appt[5]}\n\n"
-                        f"⚠️ <b>Важно:</b>\n"
-                        f"• Приходите за 10 минут до назначенного времени\n"
-                        f"• Возьмите с собой документы\n"
-                        f"• При аллергиях предупредите мастера\n\n"
-                        f"📞 Если нужно отменить запись, обратитесь к администратору"
-                    )
-                    
-                    await bot.send_message(
-                        appt[1],
-                        reminder_text,
-                        parse_mode="HTML"
-                    )
-                    logging.info(f"Отправлено напоминание за день пользователю {appt[1]}")
-                except Exception as e:
-                    logging.error(f"Ошибка отправки напоминания за день пользователю {appt[1]}: {e}")
-            
-            # Напоминания за час
-            one_hour_later = now + timedelta(hours=1)
-            hour_appointments = await db.get_appointments_by_time(one_hour_later.strftime("%H:%M"))
-            for appt in hour_appointments:
-                try:
-                    reminder_text = (
-                        f"⏰ <b>Скоро ваша запись!</b>\n\n"
-                        f"💆‍♀️ <b>{appt[2]}</b>\n"
-                        f"📅 {appt[3]} в {appt[4]}\n"
-                        f"👤 {appt[5]}\n\n"
-                        f"🚀 <b>Готовьтесь к приему!</b>\n"
-                        f"• У вас есть 1 час до записи\n"
-                        f"• Не забудьте документы\n"
-                        f"• Приходите за 10 минут до времени\n\n"
-                        f"🎯 Ждем вас!"
-                    )
-                    
-                    await bot.send_message(
-                        appt[1],
-                        reminder_text,
-                        parse_mode="HTML"
-                    )
-                    logging.info(f"Отправлено напоминание за час пользователю {appt[1]}")
-                except Exception as e:
-                    logging.error(f"Ошибка отправки напоминания за час пользователю {appt[1]}: {e}")
-                    
+            # Захват атомарный, поэтому напоминание отправит только один процесс,
+            # а не отправленные до перезапуска напоминания будут отправлены после него.
+            # Пачка отправляется параллельно через очередь с учетом лимитов Telegram
+            reminders = await db.claim_due_reminders()
+            await asyncio.gather(*(deliver(*reminder) for reminder in reminders))
         except Exception as e:
             logging.error(f"Ошибка в send_reminders: {e}")
 
-    # Запускаем проверку каждые 30 минут
-    scheduler.add_job(send_reminders, "interval", minutes=30)
+    # Проверяем наступившие напоминания каждую минуту
+    scheduler.add_job(send_reminders, "interval", minutes=1)
     scheduler.start()
     logging.info("Планировщик уведомлений запущен")
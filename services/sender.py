@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram для рассылок: около 30 сообщений в секунду всего
+# и не больше одного сообщения в секунду в один чат
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity в запасе.
+
+    reserve() сразу забирает токен и возвращает, сколько секунд нужно
+    подождать до его появления (0, если токен уже есть). take() забирает
+    токен, только если он уже есть, иначе возвращает время ожидания.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def take(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self, now: float) -> bool:
+        """Ведро заполнено: его можно удалить без изменения поведения"""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _SendJob:
+    __slots__ = ("seq", "bot", "chat_id", "text", "kwargs", "future", "attempt")
+
+    def __init__(self, seq: int, bot: Bot, chat_id: int, text: str, kwargs: Dict[str, Any],
+                 future: asyncio.Future):
+        self.seq = seq  # порядок постановки: очередь выдает более ранние сообщения первыми
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.attempt = 0
+
+    def __lt__(self, other: "_SendJob") -> bool:
+        return self.seq < other.seq
+
+
+class MessageSender:
+    """Очередь исходящих сообщений с ограничением скорости.
+
+    Сообщения отправляют concurrency фоновых задач. Перед отправкой берется
+    токен из общего ведра, затем из ведра чата; сообщение, которому надо ждать
+    свой чат, откладывается и не занимает задачу. Сообщения в один чат
+    отправляются по одному в порядке постановки. На TelegramRetryAfter
+    отправка приостанавливается для всех на указанное время, сетевые
+    ошибки и ошибки сервера повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot: Optional[Bot] = None, concurrency: int = 8,
+                 global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 max_retries: int = 3, backoff: float = 1.0, max_tracked_chats: int = 10_000):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_tracked_chats = max_tracked_chats
+
+        # Запас в один токен: сообщения идут равномерно, без пачек в начале рассылки
+        self._global = TokenBucket(global_rate, 1)
+        self._chats: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        # Сообщения, ожидающие отправки предыдущего сообщения в тот же чат
+        self._chat_jobs: Dict[int, Deque[_SendJob]] = {}
+        self._paused_until = 0.0
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._pending = 0  # сообщения в очереди, в отправке и отложенные
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def submit(self, chat_id: int, text: str, bot: Optional[Bot] = None, **kwargs) -> asyncio.Future:
+        """Ставит сообщение в очередь; future завершится отправленным Message или ошибкой"""
+        bot = bot or self.bot
+        if bot is None:
+            raise RuntimeError("MessageSender: не задан бот")
+        loop = asyncio.get_running_loop()
+        if not self._workers or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._pending = 0
+            self._chat_jobs = {}
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        future = loop.create_future()
+        # Ошибку, которую никто не ждет, логирует сам отправитель
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending += 1
+        self._seq += 1
+        job = _SendJob(self._seq, bot, chat_id, text, kwargs, future)
+        waiting = self._chat_jobs.get(chat_id)
+        if waiting is None:
+            self._chat_jobs[chat_id] = deque()
+            self._queue.put_nowait(job)
+        else:
+            waiting.append(job)
+        return future
+
+    async def send_message(self, chat_id: int, text: str, bot: Optional[Bot] = None, **kwargs):
+        """Отправляет сообщение через очередь и ждет результата"""
+        return await self.submit(chat_id, text, bot=bot, **kwargs)
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self._chats[chat_id] = bucket
+            # Вытесняем давно не использованные ведра, только если они уже заполнились
+            while len(self._chats) > self.max_tracked_chats:
+                oldest_id, oldest = next(iter(self._chats.items()))
+                if not oldest.idle(now):
+                    break
+                del self._chats[oldest_id]
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _requeue_later(self, job: _SendJob, delay: float):
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Ошибка очереди отправки: {e}")
+                self._finish(job, error=e)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: _SendJob):
+        # Общий лимит и пауза после RetryAfter касаются всех сообщений
+        now = time.monotonic()
+        wait = max(self._global.reserve(now), self._paused_until - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        # Лимит чата проверяется непосредственно перед отправкой
+        now = time.monotonic()
+        wait = self._chat_bucket(job.chat_id, now).take(now)
+        if wait > 0:
+            self._requeue_later(job, wait)
+            return
+
+        try:
+            result = await job.bot.send_message(job.chat_id, job.text, **job.kwargs)
+        except TelegramRetryAfter as e:
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Telegram просит подождать {e.retry_after} с (чат {job.chat_id})")
+            self._retry(job, e, e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            self._retry(job, e, self.backoff * 2 ** job.attempt)
+        except Exception as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+
+    def _retry(self, job: _SendJob, error: Exception, delay: float):
+        job.attempt += 1
+        if job.attempt > self.max_retries:
+            self._finish(job, error=error)
+            return
+        self.retries += 1
+        self._requeue_later(job, delay)
+
+    def _finish(self, job: _SendJob, result: Any = None, error: Optional[Exception] = None):
+        self._pending -= 1
+        waiting = self._chat_jobs.get(job.chat_id)
+        if waiting:
+            self._queue.put_nowait(waiting.popleft())
+        else:
+            self._chat_jobs.pop(job.chat_id, None)
+        if job.future.done():
+            return
+        if error is not None:
+            self.failed += 1
+            logger.error(f"Не удалось отправить сообщение в чат {job.chat_id}: {error}")
+            job.future.set_exception(error)
+        else:
+            self.sent += 1
+            job.future.set_result(result)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "failed": self.failed, "retries": self.retries, "pending": self._pending}
+
+    async def close(self, timeout: float = 10.0):
+        """Дожидается отправки очереди (не дольше timeout) и останавливает задачи"""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+# Глобальный экземпляр: бот задается при запуске (bot.py)
+sender = MessageSender()
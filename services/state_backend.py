@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+# Время жизни незавершенного сценария FSM (секунды): брошенные записи
+# не копятся в хранилище бесконечно
+DEFAULT_STATE_TTL = 24 * 3600
+
+
+class StateBackend(ABC):
+    """Хранилище общего состояния процессов бота: строки по ключу с временем жизни.
+
+    Используется FSM-хранилищем (BackendStorage) и RateLimiter, чтобы
+    несколько процессов бота видели одни и те же состояния и блокировки.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def incr_window(self, key: str, window: float) -> int:
+        """Счетчик фиксированного окна длиной window секунд: увеличивает и возвращает значение"""
+        raise NotImplementedError
+
+    async def purge_expired(self) -> int:
+        """Удаляет истекшие ключи (если хранилище не делает этого само)"""
+        return 0
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Состояние в памяти процесса: для одного процесса и тестов"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}  # ключ -> (значение, истекает в)
+
+    def _alive(self, key: str, now: float) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._alive(key, time.time())
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._data[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def incr_window(self, key: str, window: float) -> int:
+        now = time.time()
+        entry = self._alive(key, now)
+        if entry is None:
+            self._data[key] = ("1", now + window)
+            return 1
+        value = int(entry[0]) + 1
+        self._data[key] = (str(value), entry[1])
+        return value
+
+    async def purge_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._data.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+
+class SQLiteBackend(StateBackend):
+    """Состояние в таблице kv_store основной базы.
+
+    Работает без внешних сервисов; процессы на одной машине делят файл базы,
+    запись идет через очередь записи Database.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.database.kv_get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await self.database.kv_set(key, value, ttl)
+
+    async def delete(self, key: str):
+        await self.database.kv_delete(key)
+
+    async def incr_window(self, key: str, window: float) -> int:
+        return await self.database.kv_incr(key, window)
+
+    async def purge_expired(self) -> int:
+        return await self.database.kv_purge_expired()
+
+
+class RedisError(Exception):
+    """Ошибка, возвращенная сервером Redis"""
+
+
+class RedisBackend(StateBackend):
+    """Минимальный клиент протокола Redis (RESP2) поверх asyncio.
+
+    Одно соединение, команды отправляются по очереди; при обрыве
+    соединение открывается заново при следующей команде.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "beauty_bot:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db_index = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readuntil(b"\r\n")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            return RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RedisError(f"Неизвестный ответ сервера: {line!r}")
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        handshake = []
+        if self.password:
+            handshake.append(("AUTH", self.password))
+        if self.db_index:
+            handshake.append(("SELECT", self.db_index))
+        if handshake:
+            await self._send(handshake)
+
+    async def _send(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        self._writer.write(b"".join(self._encode(*command) for command in commands))
+        await self._writer.drain()
+        replies = [await self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def pipeline(self, *commands: Tuple[Any, ...]) -> List[Any]:
+        """Отправляет команды одним пакетом и возвращает ответы"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+                return await self._send(list(commands))
+            except BaseException:
+                # После любой ошибки (в том числе отмены посреди ответа) поток
+                # ответов мог рассинхронизироваться - соединение не переиспользуем
+                await self._drop()
+                raise
+
+    async def _drop(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.pipeline(("GET", self.prefix + key)))[0]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        if ttl is not None:
+            await self.pipeline(("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000))))
+        else:
+            await self.pipeline(("SET", self.prefix + key, value))
+
+    async def delete(self, key: str):
+        await self.pipeline(("DEL", self.prefix + key))
+
+    async def incr_window(self, key: str, window: float) -> int:
+        # SET NX создает счетчик с временем жизни окна, INCR сохраняет это время
+        _, value = await self.pipeline(
+            ("SET", self.prefix + key, 0, "PX", max(1, int(window * 1000)), "NX"),
+            ("INCR", self.prefix + key),
+        )
+        return value
+
+    async def close(self):
+        await self._drop()
+
+
+def create_state_backend(kind: str, database=None, redis_url: Optional[str] = None) -> StateBackend:
+    """Создает хранилище состояния по названию: memory, sqlite или redis"""
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        if database is None:
+            raise ValueError("Для STATE_BACKEND=sqlite нужна база данных")
+        return SQLiteBackend(database)
+    if kind == "redis":
+        return RedisBackend(redis_url) if redis_url else RedisBackend()
+    raise ValueError(f"Неизвестное хранилище состояния: {kind}")
+
+
+class BackendStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх StateBackend"""
+
+    def __init__(self, backend: StateBackend, state_ttl: Optional[float] = DEFAULT_STATE_TTL):
+        self.backend = backend
+        self.state_ttl = state_ttl  # незавершенные сценарии сбрасываются через state_ttl секунд
+
+    @staticmethod
+    def _key(key: StorageKey, part: str) -> str:
+        thread = f":{key.thread_id}" if key.thread_id else ""
+        return f"fsm:{key.bot_id}:{key.chat_id}{thread}:{key.user_id}:{key.destiny}:{part}"
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if state is None:
+            await self.backend.delete(self._key(key, "state"))
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.backend.set(self._key(key, "state"), value, self.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.backend.get(self._key(key, "state"))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not data:
+            await self.backend.delete(self._key(key, "data"))
+            return
+        await self.backend.set(self._key(key, "data"), json.dumps(data, ensure_ascii=False), self.state_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.backend.get(self._key(key, "data"))
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        await self.backend.close()
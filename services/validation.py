@@ -1,6 +1,6 @@
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 class ValidationError(Exception):
     """Исключение для ошибок валидации"""
@@ -77,26 +77,110 @@ async def validate_service(service: str) -> str:
     """Валидация услуги"""
     from services.database import db
     
-    # Получаем все активные услуги из базы данных
-    services = await db.get_all_services()
-    allowed_services = {s[1].lower() for s in services}  # s[1] - это название услуги
-    
-    service_lower = service.lower().strip()
-    
-    if service_lower not in allowed_services:
+    # Ищем активную услугу в кэше каталога
+    row = await db.get_service_by_name(service)
+    if row is None:
         raise ValidationError("Неверная услуга")
     
     # Возвращаем оригинальное название (с правильным регистром)
-    for s in services:
-        if s[1].lower() == service_lower:
-            return s[1]
-    
-    return service_lower
+    return row[1]
+
+WEEKDAY_ALIASES = {"пн": 0, "вт": 1, "ср": 2, "чт": 3, "пт": 4, "сб": 5, "вс": 6}
+# Самый длинный диапазон дат для генерации слотов за один раз
+MAX_GENERATION_DAYS = 92
+
+def _parse_weekdays(text: str) -> List[int]:
+    """'пн' -> [0], 'пн-пт' -> [0, 1, 2, 3, 4]"""
+    parts = text.lower().split('-')
+    if len(parts) > 2 or any(part not in WEEKDAY_ALIASES for part in parts):
+        raise ValidationError(f"Неизвестный день недели: {text}. Используйте пн, вт, ср, чт, пт, сб, вс")
+    first, last = WEEKDAY_ALIASES[parts[0]], WEEKDAY_ALIASES[parts[-1]]
+    if last < first:
+        raise ValidationError(f"Неверный диапазон дней: {text}")
+    return list(range(first, last + 1))
+
+def _parse_hours(text: str) -> Tuple[str, str]:
+    """'10:00-19:00' -> ('10:00', '19:00')"""
+    match = re.match(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$', text.strip())
+    if not match:
+        raise ValidationError(f"Неверный интервал: {text}. Используйте ЧЧ:ММ-ЧЧ:ММ")
+    start_hour, start_minute, end_hour, end_minute = map(int, match.groups())
+    if start_minute not in (0, 15, 30, 45) or end_minute not in (0, 15, 30, 45):
+        raise ValidationError(f"Интервал должен начинаться и заканчиваться на 00, 15, 30 или 45 минут: {text}")
+    start, end = f"{start_hour:02d}:{start_minute:02d}", f"{end_hour:02d}:{end_minute:02d}"
+    # Запись возможна с 8:00 до 20:45 (validate_time), прием заканчивается не позже 21:00
+    if start < "08:00" or end > "21:00":
+        raise ValidationError(f"Рабочие часы - с 8:00 до 21:00: {text}")
+    if start >= end:
+        raise ValidationError(f"Начало интервала должно быть раньше конца: {text}")
+    return start, end
+
+def parse_schedule_template(text: str) -> List[Tuple[int, str, str]]:
+    """Разбирает шаблон рабочих часов: по строке на день или диапазон дней.
+
+    Пример: "пн-пт 10:00-14:00, 15:00-19:00" и "сб 10:00-16:00".
+    Возвращает [(день недели 0-6, начало, конец)] по возрастанию.
+    """
+    intervals = set()
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        days, _, hours = line.partition(' ')
+        if not hours:
+            raise ValidationError(f"Не указаны часы: {line}")
+        for weekday in _parse_weekdays(days):
+            for interval in hours.split(','):
+                intervals.add((weekday, *_parse_hours(interval)))
+    if not intervals:
+        raise ValidationError("Шаблон пуст")
+    intervals = sorted(intervals)
+    for previous, current in zip(intervals, intervals[1:]):
+        if previous[0] == current[0] and current[1] < previous[2]:
+            raise ValidationError(
+                f"Интервалы пересекаются: {previous[1]}-{previous[2]} и {current[1]}-{current[2]}")
+    return intervals
+
+def parse_date_range(text: str) -> Tuple[datetime, datetime]:
+    """'01.07.2025-14.07.2025' -> (начало, конец); прошедшие даты не допускаются"""
+    match = re.match(r'^(\d{2}\.\d{2}\.\d{4})\s*-\s*(\d{2}\.\d{2}\.\d{4})$', sanitize_input(text, 30))
+    if not match:
+        raise ValidationError("Неверный формат. Используйте: ДД.ММ.ГГГГ-ДД.ММ.ГГГГ")
+    try:
+        start, end = (datetime.strptime(value, '%d.%m.%Y') for value in match.groups())
+    except ValueError:
+        raise ValidationError("Неверная дата")
+    if start.date() < datetime.now().date():
+        raise ValidationError("Диапазон не может начинаться в прошлом")
+    if end < start:
+        raise ValidationError("Конец диапазона раньше начала")
+    if (end - start).days >= MAX_GENERATION_DAYS:
+        raise ValidationError(f"Диапазон не длиннее {MAX_GENERATION_DAYS} дней")
+    return start, end
+
+def parse_masters(text: str) -> List[Tuple[str, List[str]]]:
+    """Разбирает состав мастеров: по строке на мастера, услуги через запятую.
 
-def validate_callback_data(data: str, expected_prefix: str) -> Tuple[str, ...]:
-    if not data or not data.startswith(expected_prefix):
-        raise ValidationError("Неверные данные")
-    parts = data.split('_')
-    if len(parts) < 2:
-        raise ValidationError("Неверный формат данных")
-    return tuple(parts[1:]) 
\ No newline at end of file
+    Пример: "Анна: Маникюр, Педикюр". Возвращает [(имя, [названия услуг])];
+    "нет" - мастеров нет, у салона одно рабочее место.
+    """
+    if text.strip().lower() == "нет":
+        return []
+    masters = {}
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        name, _, services = line.partition(':')
+        name = sanitize_input(name, 50)
+        services = [sanitize_input(service, 50) for service in services.split(',') if service.strip()]
+        if len(name) < 2:
+            raise ValidationError(f"Не указано имя мастера: {line}")
+        if not services:
+            raise ValidationError(f"Не указаны услуги мастера: {line}. Используйте: Имя: услуга, услуга")
+        if name.lower() in masters:
+            raise ValidationError(f"Мастер указан дважды: {name}")
+        masters[name.lower()] = (name, services)
+    if not masters:
+        raise ValidationError("Список мастеров пуст")
+    return list(masters.values())
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Прием обновлений по webhook с ограничением одновременной обработки.
+
+    Запрос с неверным X-Telegram-Bot-Api-Secret-Token отклоняется с 401.
+    Обновление обрабатывается в фоне, а Telegram сразу получает ответ 200;
+    одновременно обрабатывается не больше max_concurrent обновлений. Когда
+    все места заняты, ответ задерживается до освобождения места - Telegram
+    замедляет доставку, вместо того чтобы копить задачи в памяти.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: Optional[str] = None,
+                 max_concurrent: int = 50, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_concurrent = max_concurrent
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            self._semaphore.release()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        try:
+            update = await request.json(loads=bot.session.json_loads)
+        except ValueError:
+            return web.Response(body="Bad Request", status=400)
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def close(self) -> None:
+        """Дожидается обрабатываемых обновлений и закрывает сессию бота"""
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+async def health(request: web.Request) -> web.Response:
+    """Проверка живости для балансировщика"""
+    return web.Response(text="ok")
+
+
+def create_webhook_app(dispatcher: Dispatcher, bot: Bot, path: str,
+                       secret_token: Optional[str] = None, max_concurrent: int = 50) -> web.Application:
+    """aiohttp-приложение: POST path принимает обновления, GET /health - проверка живости"""
+    app = web.Application()
+    handler = BoundedRequestHandler(dispatcher, bot, secret_token=secret_token, max_concurrent=max_concurrent)
+    handler.register(app, path=path)
+    app["webhook_handler"] = handler
+    app.router.add_get("/health", health)
+    # Запуск и остановка диспетчера (startup/shutdown) вместе с приложением
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, base_url: str, path: str, host: str, port: int,
+                      secret_token: Optional[str] = None, max_concurrent: int = 50):
+    """Регистрирует webhook в Telegram и обслуживает его, пока задачу не отменят.
+
+    Накопившиеся обновления не сбрасываются: их получит первый запущенный
+    экземпляр. При остановке webhook не удаляется, чтобы остальные
+    экземпляры за балансировщиком продолжали принимать обновления.
+    """
+    app = create_webhook_app(dispatcher, bot, path, secret_token=secret_token, max_concurrent=max_concurrent)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    try:
+        await bot.set_webhook(
+            f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            max_connections=min(max_concurrent, 100),
+        )
+        logger.info(f"Webhook принимает обновления на {host}:{port}{path}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -19,3 +19,6 @@ class AdminStates(StatesGroup):
     ADD_SERVICE = State()  # Состояние для добавления услуги
     EDIT_SERVICE = State()  # Состояние для редактирования услуги
     EDIT_PHOTO = State()  # Состояние для редактирования фотографии услуги
+    EDIT_TEMPLATE = State()  # Ввод шаблона рабочих часов
+    GENERATE_SLOTS = State()  # Ввод диапазона дат для генерации слотов
+    EDIT_MASTERS = State()  # Ввод состава мастеров и их услуг
@@ -48,6 +48,10 @@ async def test_all_features():
         for user_id, user_apts in user_appointments.items():
             print(f"   🆔 {user_id}: {len(user_apts)} записей")
         
+        # Статистика кэша каталога услуг
+        cache_stats = db.catalog.stats()
+        print(f"\n🗂 Кэш услуг: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}, версия {cache_stats['version']}")
+        
         print(f"\n👑 Администратор: {ADMIN_ID}")
         
         print("\n✅ === ФУНКЦИИ ГОТОВЫ ===")
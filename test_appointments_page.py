@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Тест постраничного просмотра записей: смещения, фильтры и переход на
+последнюю страницу после удаления
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from handlers.admin_handlers import APPOINTMENTS_PAGE_SIZE, render_appointments_page, _clamp_page
+from keyboards.callbacks import AppointmentsPageCallback, day_from_date
+from services.database import BookingStatus
+from testing_helpers import temp_database, use_database
+
+
+def page_label(keyboard):
+    """Подпись кнопки номера страницы, например '2/3'"""
+    return next(button.text for row in keyboard.inline_keyboard for button in row
+                if button.callback_data == "appts_noop")
+
+
+async def test_appointments_page():
+    print("📋 Тестирование постраничного просмотра записей...")
+
+    assert _clamp_page(0, 0, 5) == (0, 0) and _clamp_page(2, 11, 5) == (2, 3)
+    assert _clamp_page(3, 11, 5) == (2, 3) and _clamp_page(-1, 11, 5) == (0, 3)
+
+    first = datetime.now() + timedelta(days=3)
+    first_date = first.strftime("%d.%m.%Y")
+    second_date = (first + timedelta(days=1)).strftime("%d.%m.%Y")
+
+    async with temp_database() as db:
+        with use_database(db):
+            services = {row[1]: row for row in await db.get_all_services()}
+            manicure, other = services["Маникюр"], services["Массаж лица"]
+
+            # 12 часовых записей в первый день и 2 записи другой услуги во второй
+            seeded = [(first_date, f"{hour:02d}:00", manicure[1]) for hour in range(8, 20)]
+            seeded += [(second_date, "10:00", other[1]), (second_date, "12:00", other[1])]
+            for user_id, (date, time, service) in enumerate(seeded, start=1):
+                await db.add_slot(date, time, service)
+                status, _ = await db.book_slot(user_id, service, date, time, "Клиент", "Нет", "+79990000000")
+                assert status == BookingStatus.OK, (date, time, status)
+
+            # Смещения: страницы идут по времени без пропусков и повторов
+            size = APPOINTMENTS_PAGE_SIZE
+            pages = [await db.get_appointments_page(offset, size) for offset in range(0, 15, size)]
+            assert [total for _, total in pages] == [14, 14, 14]
+            ids = [row[0] for rows, _ in pages for row in rows]
+            assert len(ids) == len(set(ids)) == 14
+            assert [row[10] for rows, _ in pages for row in rows] == sorted(row[10] for rows, _ in pages for row in rows)
+            print(f"✅ 14 записей на {len(pages)} страницах по {size}")
+
+            # Фильтры по дате и услуге
+            day_rows, day_total = await db.get_appointments_page(0, size, date_iso=first.strftime("%Y-%m-%d"))
+            assert day_total == 12 and all(row[3] == first_date for row in day_rows)
+            service_rows, service_total = await db.get_appointments_page(0, size, service=other[1])
+            assert service_total == 2 and all(row[2] == other[1] for row in service_rows)
+            print("✅ Фильтры по дате и услуге сужают выборку")
+
+            # Экран админа: номер страницы и фильтр в кнопках листания
+            day = day_from_date(first_date)
+            text, keyboard = await render_appointments_page(1, day, 0)
+            assert page_label(keyboard) == "2/3" and "Записи: 12" in text, text
+            callbacks = [AppointmentsPageCallback.unpack(button.callback_data)
+                         for row in keyboard.inline_keyboard for button in row
+                         if button.callback_data.startswith(AppointmentsPageCallback.__prefix__)]
+            assert {(cb.page, cb.day) for cb in callbacks[:2]} == {(0, day), (2, day)}, callbacks
+
+            # Страница за пределами списка показывает последнюю
+            _, keyboard = await render_appointments_page(10, day, 0)
+            assert page_label(keyboard) == "3/3"
+
+            # После удаления записей последняя страница опустела: показываем новую последнюю
+            rows, _ = await db.get_appointments_page(2 * size, size, date_iso=first.strftime("%Y-%m-%d"))
+            for row in rows:
+                await db.delete_appointment(row[0])
+            text, keyboard = await render_appointments_page(2, day, 0)
+            assert page_label(keyboard) == "2/2" and "Записи: 10" in text, text
+            print("✅ После удаления записей открывается последняя непустая страница")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_appointments_page())
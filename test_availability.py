@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Тест расчета свободного времени с учетом длительности услуг
+"""
+
+import asyncio
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.availability import DaySchedule, within_hours
+from services.database import BookingStatus
+from testing_helpers import temp_database
+
+DATE = "16.06.2031"  # понедельник
+DATE_ISO = "2031-06-16"
+
+
+async def book(worker, user_id, service, slot_time):
+    status, _ = await worker.book_slot(user_id, service, DATE, slot_time, "Тестовый Клиент", "Нет", "+79991234567")
+    return status
+
+
+async def test_availability():
+    print("⏳ Тестирование свободного времени с учетом длительности...")
+
+    # Интервалы [начало, конец) в минутах; касание концами - не пересечение
+    schedule = DaySchedule([(600, 690), (540, 570), (720, 780)])
+    assert schedule.is_free(570, 600) and schedule.is_free(690, 720)
+    assert not schedule.is_free(630, 690) and not schedule.is_free(500, 550) and not schedule.is_free(770, 800)
+    assert within_hours(None, 0, 1440), "Без рабочих часов ограничения нет"
+    assert within_hours([(540, 660), (720, 900)], 720, 780) and not within_hours([(540, 660)], 600, 690)
+    print("✅ Пересечения и рабочие часы проверяются по отсортированным интервалам")
+
+    async with temp_database() as worker:
+        # Маникюр - 60 минут, Педикюр - 90 минут
+        for slot_time in ("09:00", "10:30", "11:30", "12:00"):
+            await worker.add_slot(DATE, slot_time, "Маникюр")
+        await worker.add_slot(DATE, "10:00", "Педикюр")
+
+        assert await book(worker, 1, "Педикюр", "10:00") == BookingStatus.OK
+        times = await worker.get_available_times(DATE, "Маникюр")
+        assert times == ["09:00", "11:30", "12:00"], f"10:30 пересекается с педикюром до 11:30: {times}"
+        assert await book(worker, 2, "Маникюр", "10:30") == BookingStatus.SLOT_TAKEN
+        print(f"✅ Маникюр после педикюра 10:00-11:30: {times}")
+
+        # Повторный запрос берет занятые интервалы дня из кэша
+        misses = worker.availability.misses
+        await worker.get_available_times(DATE, "Маникюр")
+        assert worker.availability.misses == misses
+
+        # Запись меняет только свой день: пересекающееся время пропадает сразу
+        assert await book(worker, 3, "Маникюр", "11:30") == BookingStatus.OK
+        assert await worker.get_available_times(DATE, "Маникюр") == ["09:00"]
+        month = await worker.get_month_availability("Маникюр", 2031, 6)
+        assert month == {16: 1}, month
+
+        appointments = {row[1]: row[0] for row in await worker.get_all_appointments()}
+        assert await worker.cancel_appointment(appointments[1])
+        assert await worker.get_available_times(DATE, "Маникюр") == ["09:00", "10:30"]
+        print("✅ Отмена записи сразу возвращает пересекавшееся время")
+
+        # Рабочие часы понедельника: запись должна закончиться до 10:00
+        await worker.set_schedule_template([(0, "09:00", "10:00"), (0, "12:30", "18:00")])
+        assert await worker.get_available_times(DATE, "Маникюр") == ["09:00"]
+        assert await worker.get_first_available_date("Маникюр") == DATE_ISO
+
+        # Перенос тоже проверяет пересечения, не считая саму переносимую запись
+        assert await worker.move_appointment(appointments[3], DATE, "10:30") == BookingStatus.SLOT_TAKEN
+        await worker.set_schedule_template([])
+        assert await worker.move_appointment(appointments[3], DATE, "12:00") == BookingStatus.OK
+        print("✅ Рабочие часы и перенос учитывают длительность")
+
+        # Удаление записи администратором освобождает слот и сбрасывает кэш клавиатур
+        version = worker.availability_version
+        assert await worker.delete_appointment(appointments[3])
+        assert worker.availability_version > version
+        times = await worker.get_available_times(DATE, "Маникюр")
+        assert times == ["09:00", "10:30", "11:30", "12:00"], times
+        print("✅ Удаление записи освобождает слот")
+
+        # Производительность: свободное время дня из кэша
+        started = time.perf_counter()
+        for _ in range(200):
+            await worker.get_available_times(DATE, "Маникюр")
+        elapsed = (time.perf_counter() - started) / 200 * 1000
+        print(f"📊 Свободное время дня: {elapsed:.2f} мс на запрос, кэш: {worker.availability.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_availability())
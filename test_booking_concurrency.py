@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест: сотни одновременных подтверждений записи на один слот
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import BookingStatus
+from testing_helpers import temp_databases
+
+SLOT_DATE = "15.06.2031"
+SLOT_TIME = "10:00"
+SLOT_SERVICE = "Маникюр"
+ATTEMPTS_PER_WORKER = 200
+
+
+async def test_booking_concurrency():
+    """Проверяет, что из всех параллельных попыток слот получает ровно одна"""
+    print("🏁 Тестирование одновременного бронирования одного слота...")
+
+    async with temp_databases(2, pool_size=4) as workers:
+        await workers[0].add_slot(SLOT_DATE, SLOT_TIME, SLOT_SERVICE)
+
+        attempts = [
+            worker.book_slot(
+                user_id=100000 + n * ATTEMPTS_PER_WORKER + i,
+                service=SLOT_SERVICE,
+                date=SLOT_DATE,
+                time=SLOT_TIME,
+                fio="Тестовый Клиент",
+                allergies="Нет",
+                phone="+7 (999) 123-45-67",
+                max_appointments=3
+            )
+            for n, worker in enumerate(workers)
+            for i in range(ATTEMPTS_PER_WORKER)
+        ]
+        results = await asyncio.gather(*attempts)
+
+        statuses = [status for status, _ in results]
+        winners = statuses.count(BookingStatus.OK)
+        conflicts = statuses.count(BookingStatus.SLOT_TAKEN)
+        print(f"📊 Попыток: {len(results)}, успешных: {winners}, конфликтов: {conflicts}")
+
+        assert winners == 1, f"Ожидалась ровно одна успешная запись, получено {winners}"
+        assert conflicts == len(results) - 1, "Все остальные попытки должны получить SLOT_TAKEN"
+
+        appointments = await workers[1].get_all_appointments()
+        assert len(appointments) == 1, f"В базе {len(appointments)} записей вместо одной"
+        slots = await workers[1].get_all_slots()
+        assert slots[0][4] == 1, "Слот должен быть помечен как занятый"
+
+        print("✅ Слот получил ровно один клиент, остальные получили конфликт")
+
+        # Изменение каталога в одном процессе доходит до другого после ttl
+        service = await workers[1].get_service_by_name(SLOT_SERVICE)
+        version = workers[1].catalog.version
+        await workers[0].update_service(service[0], is_active=False)
+        assert await workers[1].get_service_by_name(SLOT_SERVICE), "До истечения ttl снимок не перечитывается"
+        workers[1].catalog.ttl = 0
+        assert await workers[1].get_service_by_name(SLOT_SERVICE) is None
+        assert workers[1].catalog.version > version, "Клавиатуры по версии каталога тоже должны обновиться"
+        print("✅ Каталог услуг перечитывается после ttl")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_booking_concurrency())
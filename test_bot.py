@@ -59,7 +59,7 @@ async def main():
         print(f"❌ Ошибка: {e}")
     finally:
         # Закрываем соединения с БД
-        pass
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
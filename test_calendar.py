@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Тест календаря свободных дат: один запрос на месяц и листание без новых сообщений
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import EditMessageReplyMarkup, SendMessage
+from aiogram.utils.callback_answer import CallbackAnswerMiddleware
+
+from handlers import user_handlers, fallback_handlers
+from keyboards.callbacks import CalendarCallback, DateCallback, month_index
+from keyboards.inline_keyboards import CALENDAR_MONTHS_AHEAD, get_calendar_keyboard, get_available_calendar_keyboard
+from states import AppointmentStates
+from testing_helpers import RecordingSession, callback_update, temp_database, use_database
+
+USER_ID = 777
+
+
+def date_buttons(keyboard):
+    return [button for row in keyboard.inline_keyboard for button in row
+            if button.callback_data.startswith(DateCallback.__prefix__)]
+
+
+async def test_calendar():
+    print("🗓 Тестирование календаря свободных дат...")
+
+    # Временная база: слоты теста не попадают в database.sqlite, а посторонние
+    # слоты не влияют на подсчет
+    async with temp_database() as db:
+        with use_database(db):
+            service = (await db.get_all_services())[0]
+
+            # Слоты на три дня следующего месяца, один из них занят полностью
+            today = datetime.now()
+            next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+            for day, times in ((3, ["10:00", "11:00"]), (10, ["12:00"]), (20, ["13:00"])):
+                date = next_month.replace(day=day).strftime("%d.%m.%Y")
+                for time in times:
+                    await db.add_slot(date, time, service[1])
+            await db.mark_slot_as_booked(next_month.replace(day=20).strftime("%d.%m.%Y"), "13:00", service[1])
+
+            counts = await db.get_month_availability(service[1], next_month.year, next_month.month)
+            assert counts == {3: 2, 10: 1}, f"Свободные слоты по дням: {counts}"
+
+            # Без месяца календарь открывается на месяце ближайшей свободной даты
+            keyboard = await get_available_calendar_keyboard(service)
+            assert [button.text for button in date_buttons(keyboard)] == ["3", "10"]
+            header = keyboard.inline_keyboard[0][1].text
+            print(f"✅ Календарь: {header}, кнопок дат: {len(date_buttons(keyboard))}")
+
+            # Листание ограничено текущим месяцем и CALENDAR_MONTHS_AHEAD вперед
+            current = get_calendar_keyboard(service[0], today.year, today.month, {})
+            assert current.inline_keyboard[0][0].callback_data == "none", "Назад от текущего месяца нельзя"
+            last = month_index(today.year, today.month) + CALENDAR_MONTHS_AHEAD
+            last_keyboard = get_calendar_keyboard(service[0], last // 12, last % 12 + 1, {})
+            assert last_keyboard.inline_keyboard[0][2].callback_data == "none", "Вперед дальше лимита нельзя"
+
+            # Листание редактирует клавиатуру того же сообщения
+            session = RecordingSession()
+            bot = Bot("123456:TEST", session=session)
+            storage = MemoryStorage()
+            dp = Dispatcher(storage=storage)
+            dp.callback_query.middleware(CallbackAnswerMiddleware())
+            dp.include_router(user_handlers.router)
+            dp.include_router(fallback_handlers.router)
+            key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+            await storage.set_state(key, AppointmentStates.ENTER_DATE)
+
+            data = CalendarCallback(service_id=service[0], month=month_index(next_month.year, next_month.month)).pack()
+            await dp.feed_update(bot, callback_update(1, data, USER_ID, "Выберите дату"))
+            edits = [call for call in session.calls if isinstance(call, EditMessageReplyMarkup)]
+            assert len(edits) == 1 and not any(isinstance(call, SendMessage) for call in session.calls), session.calls
+            assert len(date_buttons(edits[0].reply_markup)) == 2
+            print("✅ Листание месяцев редактирует сообщение на месте")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_calendar())
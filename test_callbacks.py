@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Тест callback_data: компактные кнопки с id и обработка устаревших кнопок
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+from aiogram.utils.callback_answer import CallbackAnswerMiddleware
+
+from handlers import user_handlers, admin_handlers, fallback_handlers
+from keyboards.callbacks import TimeCallback, ServiceCallback, day_from_date, date_from_day, time_from_minute
+from keyboards.inline_keyboards import get_date_keyboard, get_time_keyboard
+from testing_helpers import RecordingSession, callback_update, temp_database, use_database
+
+USER_ID = 555
+
+
+async def test_callbacks():
+    print("🔘 Тестирование callback_data...")
+
+    # Длина не зависит от названий: только id, номер дня и минуты
+    date, time = "15.07.2031", "18:45"
+    keyboards = [get_date_keyboard(2_000_000_000, [date]), get_time_keyboard(date, 2_000_000_000, [time])]
+    for keyboard in keyboards:
+        for row in keyboard.inline_keyboard:
+            for button in row:
+                assert len(button.callback_data.encode()) <= 64, button.callback_data
+
+    packed = TimeCallback(service_id=7, day=day_from_date(date), minute=18 * 60 + 45).pack()
+    unpacked = TimeCallback.unpack(packed)
+    assert (unpacked.service_id, date_from_day(unpacked.day), time_from_minute(unpacked.minute)) == (7, date, time)
+    print(f"✅ Кнопка времени: {packed} ({len(packed)} байт)")
+
+    async with temp_database() as db:
+        with use_database(db):
+            service = (await db.get_all_services())[0]
+
+            session = RecordingSession()
+            bot = Bot("123456:TEST", session=session)
+            storage = MemoryStorage()
+            dp = Dispatcher(storage=storage)
+            dp.callback_query.middleware(CallbackAnswerMiddleware())
+            dp.include_router(user_handlers.router)
+            dp.include_router(admin_handlers.router)
+            dp.include_router(fallback_handlers.router)
+
+            # Выбор услуги по id
+            await dp.feed_update(bot, callback_update(1, ServiceCallback(service_id=service[0]).pack(), USER_ID))
+            key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+            assert (await storage.get_data(key))["service"] == service[1], "Услуга должна определяться по id"
+            assert any(isinstance(call, EditMessageText) for call in session.calls), "Следующий шаг - в том же сообщении"
+
+            # Кнопки прежнего формата, неизвестной версии и несуществующей услуги
+            stale = [f"time_10:00_{date}_{service[1]}", "sv0:1", ServiceCallback(service_id=999_999).pack()]
+            for update_id, data in enumerate(stale, start=2):
+                session.calls.clear()
+                await dp.feed_update(bot, callback_update(update_id, data, USER_ID))
+                alerts = [call for call in session.calls if isinstance(call, AnswerCallbackQuery) and call.show_alert]
+                texts = [call.text for call in session.calls if isinstance(call, EditMessageText)]
+                assert alerts or "Услуга не найдена. Начните сначала." in texts, f"Кнопка {data} не обработана: {session.calls}"
+            print("✅ Устаревшие и неизвестные кнопки получают ответ, а не зависают")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_callbacks())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Тест пула соединений: предел размера, ожидание свободного соединения и
+замена сломанного соединения
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.db_pool import ConnectionPool
+
+
+async def select_one(pool):
+    async with pool.acquire() as conn:
+        async with conn.execute("SELECT 1") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+async def check_size_limit(db_path):
+    """Одновременных соединений не больше size, свободные переиспользуются"""
+    pool = ConnectionPool(db_path, size=2)
+    try:
+        in_use, peak = 0, 0
+
+        async def hold():
+            nonlocal in_use, peak
+            async with pool.acquire():
+                in_use += 1
+                peak = max(peak, in_use)
+                await asyncio.sleep(0.01)
+                in_use -= 1
+
+        await asyncio.gather(*(hold() for _ in range(10)))
+        assert peak == 2 and pool._created == 2, f"Пик {peak}, открыто {pool._created}"
+    finally:
+        await pool.close()
+    print("✅ Пул не открывает больше size соединений")
+
+
+async def check_waiter_blocks(db_path):
+    """Когда все соединения заняты, acquire ждет возврата соединения"""
+    pool = ConnectionPool(db_path, size=1)
+    try:
+        async with pool.acquire() as held:
+            waiter = asyncio.create_task(select_one(pool))
+            await asyncio.sleep(0.05)
+            assert not waiter.done(), "Ожидающий не должен получить занятое соединение"
+        assert await asyncio.wait_for(waiter, 2) == 1
+        async with pool.acquire() as conn:
+            assert conn is held, "Возвращенное соединение переиспользуется"
+    finally:
+        await pool.close()
+    print("✅ При исчерпании пула acquire ждет свободное соединение")
+
+
+async def check_broken_release(db_path):
+    """Сломанное при возврате соединение закрывается, а ожидающий получает новое"""
+    pool = ConnectionPool(db_path, size=1)
+    try:
+        async with pool.acquire() as broken:
+            await broken.execute("BEGIN")
+            waiter = asyncio.create_task(select_one(pool))
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+
+            async def fail(*args, **kwargs):
+                raise RuntimeError("соединение потеряно")
+
+            # ROLLBACK при возврате в пул завершится ошибкой
+            broken.execute = fail
+        assert await asyncio.wait_for(waiter, 2) == 1, "Ожидающий не должен зависнуть"
+        assert pool._created == 1, f"Вместо сломанного открыто одно новое: {pool._created}"
+        async with pool.acquire() as conn:
+            assert conn is not broken
+    finally:
+        await pool.close()
+    print("✅ Сломанное соединение заменяется, ожидающий просыпается")
+
+
+async def test_db_pool():
+    print("🔌 Тестирование пула соединений...")
+    logging.disable(logging.ERROR)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "pool.sqlite")
+            await check_size_limit(db_path)
+            await check_waiter_blocks(db_path)
+            await check_broken_release(db_path)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_db_pool())
@@ -28,7 +28,7 @@ async def test_keyboards():
         print("\n📅 === КЛАВИАТУРА ДАТ ===")
         # Тестовые даты
         test_dates = ["15.07.2025", "16.07.2025", "17.07.2025"]
-        date_keyboard = get_date_keyboard("Массаж лица", test_dates)
+        date_keyboard = get_date_keyboard(1, test_dates)
         for row in date_keyboard.inline_keyboard:
             for button in row:
                 print(f"   {button.text}")
@@ -36,7 +36,7 @@ async def test_keyboards():
         print("\n⏰ === КЛАВИАТУРА ВРЕМЕНИ ===")
         # Тестовое время
         test_times = ["10:00", "14:00", "18:00"]
-        time_keyboard = get_time_keyboard("15.07.2025", "Массаж лица", test_times)
+        time_keyboard = get_time_keyboard("15.07.2025", 1, test_times)
         for row in time_keyboard.inline_keyboard:
             for button in row:
                 print(f"   {button.text}")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Тест мастеров: свободное время - объединение по мастерам, выбор мастера при записи
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import BookingStatus
+from services.validation import ValidationError, parse_masters
+from testing_helpers import temp_databases
+
+DATE = "17.06.2031"
+TIME = "10:00"
+ATTEMPTS = 100
+
+
+async def book(worker, user_id, service, slot_time=TIME):
+    return await worker.book_slot(user_id, service, DATE, slot_time, "Тестовый Клиент", "Нет", "+79991234567")
+
+
+async def test_masters():
+    print("👩‍🎨 Тестирование мастеров...")
+
+    assert parse_masters("Анна: Маникюр, Педикюр\nОльга: Маникюр") == [
+        ("Анна", ["Маникюр", "Педикюр"]), ("Ольга", ["Маникюр"])]
+    assert parse_masters("нет") == []
+    for bad in ("Анна", "Анна:", ": Маникюр", "Анна: Маникюр\nанна: Педикюр", ""):
+        try:
+            parse_masters(bad)
+            assert False, f"Состав '{bad}' должен быть отклонен"
+        except ValidationError:
+            pass
+    print("✅ Состав мастеров разбирается и проверяется")
+
+    async with temp_databases(2) as workers:
+        worker = workers[0]
+        services = {row[1]: row[0] for row in await worker.get_all_services()}
+        await worker.set_masters([("Анна", [services["Маникюр"], services["Педикюр"]]),
+                                  ("Ольга", [services["Маникюр"]])])
+        masters = await worker.get_masters()
+        assert [(name, names) for _, name, names in masters] == [
+            ("Анна", ["Маникюр", "Педикюр"]), ("Ольга", ["Маникюр"])], masters
+
+        for service in ("Маникюр", "Педикюр", "Массаж лица"):
+            await worker.add_slot(DATE, TIME, service)
+        assert await worker.get_available_times(DATE, "Массаж лица") == [], "Услугу никто не выполняет"
+
+        # Первая запись на маникюр оставляет время свободным у второго мастера
+        status, first_id = await book(worker, 1, "Маникюр")
+        assert status == BookingStatus.OK
+        assert await worker.get_available_times(DATE, "Маникюр") == [TIME]
+        status, second_id = await book(worker, 2, "Маникюр")
+        assert status == BookingStatus.OK
+        assigned = {await worker.get_appointment_master(first_id), await worker.get_appointment_master(second_id)}
+        assert assigned == {"Анна", "Ольга"}, assigned
+        assert await worker.get_available_times(DATE, "Маникюр") == []
+        assert await worker.get_available_times(DATE, "Педикюр") == [], "Анна уже занята"
+        status, _ = await book(worker, 3, "Маникюр")
+        assert status == BookingStatus.SLOT_TAKEN
+        print("✅ Время свободно, пока свободен хотя бы один мастер услуги")
+
+        # Отмена освобождает мастера и слот
+        first_master = await worker.get_appointment_master(first_id)
+        assert await worker.cancel_appointment(first_id)
+        assert await worker.get_available_times(DATE, "Маникюр") == [TIME]
+        status, third_id = await book(worker, 3, "Маникюр")
+        assert status == BookingStatus.OK and await worker.get_appointment_master(third_id) == first_master
+
+        # Одновременные попытки из двух процессов: записей столько, сколько мастеров
+        await worker.set_masters([(name, [services["Массаж лица"]]) for name in ("Вера", "Галина", "Дина")])
+        attempts = [
+            workers[n % 2].book_slot(1000 + n, "Массаж лица", DATE, TIME, "Тестовый Клиент", "Нет",
+                                     "+79991234567")
+            for n in range(ATTEMPTS)
+        ]
+        results = await asyncio.gather(*attempts)
+        winners = [appointment_id for status, appointment_id in results if status == BookingStatus.OK]
+        masters = {await worker.get_appointment_master(appointment_id) for appointment_id in winners}
+        print(f"📊 Попыток: {ATTEMPTS}, успешных: {len(winners)}, мастера: {sorted(masters)}")
+        assert len(winners) == 3 and masters == {"Вера", "Галина", "Дина"}
+
+        # Анна и Ольга больше не в составе и не получают новых записей
+        assert [name for _, name, _ in await worker.get_masters()] == ["Вера", "Галина", "Дина"]
+        assert await worker.get_available_times(DATE, "Маникюр") == []
+        print("✅ Мастер выбирается атомарно, двойных записей к одному мастеру нет")
+
+        async with worker.pool.acquire() as db:
+            async with db.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT date_iso, time, duration, master_id FROM appointments WHERE date_iso BETWEEN ? AND ?
+            """, ("2031-06-17", "2031-06-17")) as cursor:
+                plan = " ".join(row[3] for row in await cursor.fetchall())
+        assert "COVERING INDEX idx_appointments_day_master" in plan, plan
+        print(f"✅ Занятость дня читается по индексу: {plan}")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_masters())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Тест outbox: уведомления сохраняются вместе с изменением и доставляются фоновым воркером
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import BookingStatus
+from services.outbox import OutboxWorker
+from services.sender import MessageSender
+from testing_helpers import temp_database
+
+ADMIN_CHAT = 999
+
+
+class RecordingBot:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+        return text
+
+
+class FlakyBot:
+    """Бот, у которого первая отправка в каждый чат заканчивается ошибкой"""
+
+    def __init__(self):
+        self.delivered = []
+        self.failed_once = set()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if text not in self.failed_once:
+            self.failed_once.add(text)
+            raise RuntimeError("Telegram недоступен")
+        self.delivered.append(text)
+        return text
+
+
+async def outbox_rows(worker):
+    async with worker.pool.acquire() as db:
+        async with db.execute("SELECT kind, attempts, sent_at FROM outbox ORDER BY id") as cursor:
+            return await cursor.fetchall()
+
+
+async def test_outbox():
+    print("📮 Тестирование outbox уведомлений...")
+
+    date = (datetime.now() + timedelta(days=3)).strftime("%d.%m.%Y")
+    async with temp_database() as worker:
+        await worker.add_slot(date, "10:00", "Маникюр", notification=(ADMIN_CHAT, "slot_added", "слот"))
+        # Повторное добавление того же слота ничего не меняет и не уведомляет
+        await worker.add_slot(date, "10:00", "Маникюр", notification=(ADMIN_CHAT, "slot_added", "дубль"))
+
+        status, appointment_id = await worker.book_slot(
+            1, "Маникюр", date, "10:00", "Клиент", "Нет", "+7 (999) 123-45-67",
+            notification=(ADMIN_CHAT, "booking", "запись"))
+        assert status == BookingStatus.OK
+        status, _ = await worker.book_slot(
+            2, "Маникюр", date, "10:00", "Другой", "Нет", "+7 (999) 123-45-68",
+            notification=(ADMIN_CHAT, "booking", "конфликт"))
+        assert status == BookingStatus.SLOT_TAKEN
+        assert await worker.cancel_appointment(appointment_id, notification=(ADMIN_CHAT, "cancel", "отмена"))
+        assert (await worker.find_free_slot(date, "10:00", "Маникюр")) is not None, "Слот должен освободиться"
+
+        rows = await outbox_rows(worker)
+        assert [row[0] for row in rows] == ["slot_added", "booking", "cancel"], \
+            f"В outbox только уведомления о выполненных изменениях: {rows}"
+
+        # Первая попытка падает, уведомления откладываются и затем доставляются
+        bot = FlakyBot()
+        sender = MessageSender(bot)
+        outbox = OutboxWorker(worker, sender, bot)
+        assert await outbox.drain_once() == 3
+        assert bot.delivered == [] and not await worker.has_pending_outbox(), "Повтор должен быть отложен"
+
+        # Переносим назначенное время повтора в прошлое
+        async def job(db):
+            await db.execute("UPDATE outbox SET available_at = '2000-01-01 00:00:00'")
+
+        await worker._write(job)
+        assert await outbox.drain_once() == 3
+        assert await outbox.drain_once() == 0, "Отправленные уведомления не повторяются"
+        await sender.close()
+
+        assert bot.delivered == ["слот", "запись", "отмена"], f"Порядок доставки: {bot.delivered}"
+        assert all(row[1] == 2 and row[2] for row in await outbox_rows(worker))
+        print("✅ Уведомления сохраняются атомарно, доставляются по порядку и ровно один раз")
+
+
+
+async def test_outbox_digest():
+    """Режим сводки: события копятся и уходят одним сообщением"""
+    print("📋 Тестирование сводки для администратора...")
+
+    date = (datetime.now() + timedelta(days=3)).strftime("%d.%m.%Y")
+    async with temp_database() as worker:
+        bot = RecordingBot()
+        sender = MessageSender(bot)
+        outbox = OutboxWorker(worker, sender, bot, digest_interval=3600, digest_max_events=30)
+
+        # Неделя слотов: 7 дней по 4 слота
+        for day in range(7):
+            slot_date = (datetime.now() + timedelta(days=day + 1)).strftime("%d.%m.%Y")
+            for hour in (10, 12, 14, 16):
+                await worker.add_slot(slot_date, f"{hour}:00", "Маникюр",
+                                      notification=(ADMIN_CHAT, "slot_added", f"➕ Слот {slot_date} {hour}:00"))
+        assert await outbox.drain_once() == 0, "До порога событий и интервала сводка не отправляется"
+
+        await worker.add_slot(date, "18:00", "Маникюр", notification=(ADMIN_CHAT, "slot_added", "➕ Слот 29"))
+        await worker.add_slot(date, "19:00", "Маникюр", notification=(ADMIN_CHAT, "slot_added", "➕ Слот 30"))
+        assert await outbox.drain_once() == 30
+        await sender.close()
+
+        print(f"📊 30 событий -> {len(bot.messages)} сообщений")
+        assert len(bot.messages) == 1, "Все события должны уйти одной сводкой"
+        assert "Сводка событий: 30" in bot.messages[0][1] and "Добавлены слоты: 30" in bot.messages[0][1]
+        assert not await worker.has_pending_outbox()
+        print("✅ События объединяются в сводку по порогу")
+
+
+async def main():
+    await test_outbox()
+    await test_outbox_digest()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тест отправки фото услуги по file_id: устаревший file_id заменяется новым
+"""
+
+import asyncio
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from aiogram.types import FSInputFile, Message
+
+from keyboards.inline_keyboards import send_service_photo
+from testing_helpers import RecordingSession, temp_database, use_database
+
+CHAT_ID = 999
+STALE_FILE_ID = "stale-file-id"
+NEW_FILE_ID = "new-file-id"
+
+
+class PhotoSession(RecordingSession):
+    """Отклоняет сохраненный file_id и принимает загрузку файла"""
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, SendPhoto) and method.photo == STALE_FILE_ID:
+            raise TelegramBadRequest(method=method, message="Bad Request: wrong file identifier/HTTP URL specified")
+        return Message.model_validate({
+            "message_id": len(self.calls), "date": 1700000000,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "photo": [{"file_id": NEW_FILE_ID, "file_unique_id": "u1", "width": 90, "height": 90}],
+        })
+
+
+async def test_photo_file_id():
+    print("📸 Тестирование отправки фото услуги по file_id...")
+
+    async with temp_database() as db:
+        # Файл фото рядом с временной базой удалится вместе с ней
+        photo_path = os.path.join(os.path.dirname(db.db_path), "service.jpg")
+        with open(photo_path, "wb") as photo:
+            photo.write(b"\xff\xd8\xff\xd9")
+
+        with use_database(db):
+            service = (await db.get_all_services())[0]
+            await db.update_service(service[0], photo_path=photo_path)
+            await db.set_service_photo_file_id(service[0], STALE_FILE_ID)
+            service = await db.get_service_by_id(service[0])
+            assert service[8] == STALE_FILE_ID
+
+            session = PhotoSession()
+            bot = Bot("123456:TEST", session=session)
+            logging.disable(logging.WARNING)
+            try:
+                assert await send_service_photo(bot, CHAT_ID, service, "Услуга", None)
+            finally:
+                logging.disable(logging.NOTSET)
+
+            # Сначала попытка по file_id, затем загрузка файла
+            photos = [call.photo for call in session.calls if isinstance(call, SendPhoto)]
+            assert photos[0] == STALE_FILE_ID and isinstance(photos[1], FSInputFile), photos
+            assert len(photos) == 2
+            service = await db.get_service_by_id(service[0])
+            assert service[8] == NEW_FILE_ID, f"Должен сохраниться file_id новой загрузки: {service[8]}"
+            print("✅ Устаревший file_id сброшен, фото загружено заново, новый file_id сохранен")
+
+            # Следующая отправка идет по новому file_id без загрузки
+            session.calls.clear()
+            assert await send_service_photo(bot, CHAT_ID, service, "Услуга", None)
+            assert [call.photo for call in session.calls] == [NEW_FILE_ID]
+            print("✅ Повторная отправка использует сохраненный file_id")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_photo_file_id())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Тест напоминаний: каждое напоминание выдается ровно одному процессу и один раз
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import services.database as database
+from services.database import Database, BookingStatus
+from testing_helpers import temp_databases
+
+
+async def make_due(worker):
+    """Переносит время всех напоминаний в прошлое"""
+    async def job(db):
+        await db.execute("UPDATE reminders SET due_at = '2000-01-01 00:00'")
+
+    await worker._write(job)
+
+
+async def test_reminders():
+    print("🔔 Тестирование очереди напоминаний...")
+
+    start = datetime.now() + timedelta(days=2)
+    date, time = start.strftime("%d.%m.%Y"), "10:00"
+    moved_date = (start + timedelta(days=1)).strftime("%d.%m.%Y")
+
+    async with temp_databases(2) as workers:
+        try:
+            await workers[0].add_slot(date, time, "Маникюр")
+            await workers[0].add_slot(moved_date, time, "Маникюр")
+            status, appointment_id = await workers[0].book_slot(
+                123, "Маникюр", date, time, "Тестовый Клиент", "Нет", "+7 (999) 123-45-67")
+            assert status == BookingStatus.OK
+
+            assert await workers[0].claim_due_reminders() == [], "Время напоминаний еще не наступило"
+
+            # Перенос записи пересчитывает время напоминаний
+            assert await workers[1].move_appointment(appointment_id, moved_date, time) == BookingStatus.OK
+            await make_due(workers[0])
+
+            # Два процесса одновременно опрашивают очередь
+            claims = await asyncio.gather(*(worker.claim_due_reminders() for worker in workers for _ in range(5)))
+            claimed = [item for claim in claims for item in claim]
+            kinds = sorted(kind for _, kind, _ in claimed)
+            print(f"📊 Захвачено напоминаний: {len(claimed)} ({', '.join(kinds)})")
+            assert kinds == ["day", "hour"], f"Каждое напоминание должно быть выдано один раз: {kinds}"
+            assert all(appt[3] == moved_date for _, _, appt in claimed), "Напоминания должны идти о новой дате"
+
+            # Неудачная отправка возвращает напоминание в очередь
+            day_id = next(reminder_id for reminder_id, kind, _ in claimed if kind == "day")
+            hour_id = next(reminder_id for reminder_id, kind, _ in claimed if kind == "hour")
+            await workers[0].release_reminder(day_id)
+            await workers[0].mark_reminder_sent(hour_id)
+            retry = await workers[1].claim_due_reminders()
+            assert [kind for _, kind, _ in retry] == ["day"], "Возвращенное напоминание должно выдаваться снова"
+
+            # Процесс упал, не отметив отправку: после таймаута напоминание подхватит другой
+            database.REMINDER_CLAIM_TIMEOUT = timedelta(0)
+            await asyncio.sleep(1.1)
+            restarted = Database(workers[0].db_path, pool_size=1, profile="wal")
+            try:
+                recovered = await restarted.claim_due_reminders()
+                assert [kind for _, kind, _ in recovered] == ["day"], "Брошенный захват должен истекать"
+                await restarted.mark_reminder_sent(day_id)
+                assert await restarted.claim_due_reminders() == [], "Отправленные напоминания не повторяются"
+            finally:
+                await restarted.close()
+
+            print("✅ Напоминания выдаются ровно один раз, в том числе после перезапуска")
+
+            # Запись через add_appointment тоже получает напоминания
+            other_date = (start + timedelta(days=3)).strftime("%d.%m.%Y")
+            await workers[0].add_slot(other_date, time, "Маникюр")
+            other_id = await workers[0].add_appointment(
+                456, "Маникюр", other_date, time, "Другой Клиент", "Нет", "+7 (999) 765-43-21")
+            try:
+                await workers[1].add_appointment(456, "Маникюр", other_date, time, "Другой Клиент", "Нет", "")
+                assert False, "Повторная запись на то же время должна быть отклонена"
+            except ValueError:
+                pass
+            await make_due(workers[0])
+            added = await workers[1].claim_due_reminders()
+            assert sorted((appt[0], kind) for _, kind, appt in added) == [(other_id, "day"), (other_id, "hour")], added
+            print("✅ add_appointment планирует напоминания так же, как book_slot")
+        finally:
+            database.REMINDER_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_reminders())
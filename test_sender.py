@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тест очереди отправки: пауза по RetryAfter, повтор сетевых ошибок и
+порядок сообщений в одном чате
+"""
+
+import asyncio
+import sys
+import os
+import time
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from services.sender import MessageSender, TokenBucket
+
+
+class FlakyBot:
+    """Бот без сети: failures[text] - ошибки, которые вернут первые попытки отправить text"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = []  # (время, чат, текст) каждой попытки
+        self.delivered = []  # (время, чат, текст) успешных отправок
+
+    async def send_message(self, chat_id, text, **kwargs):
+        now = time.monotonic()
+        self.attempts.append((now, chat_id, text))
+        pending = self.failures.get(text)
+        if pending:
+            error = pending.pop(0)
+            raise error(SendMessage(chat_id=chat_id, text=text))
+        self.delivered.append((now, chat_id, text))
+        return text
+
+
+def retry_after(seconds):
+    return lambda method: TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=seconds)
+
+
+def network_error(method):
+    return TelegramNetworkError(method=method, message="соединение разорвано")
+
+
+async def test_sender():
+    print("📨 Тестирование очереди отправки...")
+    logging.disable(logging.ERROR)
+
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert bucket.take(100.0) == 0 and bucket.take(100.0) == 0.5, "Второй токен появится через 1 / rate"
+    assert bucket.reserve(100.0) == 0.5 and bucket.reserve(100.0) == 1.0, "reserve ставит в очередь за токеном"
+
+    bot = FlakyBot({
+        "a1": [retry_after(1)],
+        "b1": [network_error, network_error],
+        "c1": [network_error] * 4,
+    })
+    # Одна задача отправки: порядок попыток детерминирован
+    sender = MessageSender(bot=bot, concurrency=1, global_rate=1000, per_chat_rate=1000,
+                           max_retries=3, backoff=0.01)
+    try:
+        started = time.monotonic()
+        futures = {text: sender.submit(chat_id, text) for chat_id, text in
+                   ((1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1"))}
+        results = await asyncio.gather(*futures.values(), return_exceptions=True)
+        results = dict(zip(futures, results))
+
+        # Порядок в чате сохраняется, даже когда первое сообщение ждет повтора
+        assert [text for _, chat_id, text in bot.delivered if chat_id == 1] == ["a1", "a2", "a3"], bot.delivered
+        print("✅ Сообщения одного чата отправлены в порядке постановки")
+
+        # После RetryAfter отправка приостановлена для всех чатов
+        paused_at = next(at for at, _, text in bot.attempts if text == "a1")
+        assert all(at - paused_at >= 0.99 for at, _, _ in bot.delivered), "До конца паузы ничего не отправляется"
+        assert time.monotonic() - started >= 1
+        print("✅ RetryAfter приостанавливает всю очередь на указанное время")
+
+        # Сетевые ошибки повторяются, после max_retries повторов сообщение отклоняется
+        assert results["b1"] == "b1" and [text for _, _, text in bot.attempts].count("b1") == 3
+        assert isinstance(results["c1"], TelegramNetworkError)
+        assert [text for _, _, text in bot.attempts].count("c1") == 4
+        stats = sender.stats()
+        assert stats == {"sent": 4, "failed": 1, "retries": 1 + 2 + 3, "pending": 0}, stats
+        print(f"✅ Сетевые ошибки повторяются с задержкой: {stats}")
+    finally:
+        await sender.close()
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_sender())
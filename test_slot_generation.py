@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Тест генерации слотов по шаблону рабочих часов
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.validation import ValidationError, parse_date_range, parse_schedule_template
+from testing_helpers import temp_database
+
+
+async def slot_count(worker):
+    async with worker.pool.acquire() as db:
+        async with db.execute("SELECT COUNT(*) FROM available_slots") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+async def test_slot_generation():
+    print("🗓 Тестирование генерации слотов по шаблону...")
+
+    template = parse_schedule_template("пн-вс 10:00-13:00, 14:00-16:00\nсб 17:00-19:00")
+    assert template[:2] == [(0, "10:00", "13:00"), (0, "14:00", "16:00")]
+    assert len(template) == 15, f"7 дней по 2 интервала и еще один для субботы: {template}"
+    for bad in ("пн 10:00", "xx 10:00-12:00", "пт-пн 10:00-12:00", "пн 12:00-10:00", "пн 07:00-12:00", "пн 10:10-12:00", "пн 10:00-13:00, 12:00-14:00"):
+        try:
+            parse_schedule_template(bad)
+            assert False, f"Шаблон '{bad}' должен быть отклонен"
+        except ValidationError:
+            pass
+    print("✅ Шаблон разбирается и проверяется")
+
+    start = datetime.now() + timedelta(days=1)
+    end = start + timedelta(days=6)
+    assert parse_date_range(f"{start:%d.%m.%Y}-{end:%d.%m.%Y}")[1].date() == end.date()
+
+    async with temp_database() as worker:
+        await worker.set_schedule_template(template)
+        assert await worker.get_schedule_template() == template
+
+        services = await worker.get_all_services()
+        # Неделя: каждый день 3 ч и 2 ч работы, в субботу еще 2 ч
+        expected = sum(
+            7 * (180 // service[3] + 120 // service[3]) + 120 // service[3]
+            for service in services
+        )
+
+        version = worker.availability_version
+        created = await worker.generate_slots(start, end)
+        print(f"📊 Создано слотов за неделю: {created}")
+        assert created == expected == await slot_count(worker), f"Ожидалось {expected}, создано {created}"
+        assert worker.availability_version == version + 1, "Вся генерация - одна запись"
+
+        times = await worker.get_available_times(start.strftime("%d.%m.%Y"), services[0][1])
+        assert times[0] == "10:00" and all(time < "16:00" for time in times), times
+
+        # Повторный запуск и пересекающийся диапазон не создают дублей
+        assert await worker.generate_slots(start, end) == 0
+        longer = await worker.generate_slots(start, end + timedelta(days=1), services[:1])
+        assert 0 < longer < created and await slot_count(worker) == expected + longer
+        print("✅ Генерация идемпотентна и учитывает длительность услуг")
+
+        # Экран удаления показывает слоты по страницам, а не все сразу
+        first, total = await worker.get_slots_page(0, 10)
+        second, _ = await worker.get_slots_page(10, 10)
+        assert total == expected + longer and len(first) == len(second) == 10
+        assert first[-1][0] not in {slot[0] for slot in second}
+        print(f"✅ Слоты для удаления выводятся страницами: {total} слотов")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_slot_generation())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Тест общего хранилища состояния: FSM и лимиты для нескольких процессов бота
+"""
+
+import asyncio
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram.fsm.storage.base import StorageKey
+
+from services.rate_limiter import RateLimiter, cleanup_task
+from services.state_backend import BackendStorage, MemoryBackend, RedisBackend, SQLiteBackend, StateBackend
+from testing_helpers import temp_databases
+
+
+class FakeRedisServer:
+    """Локальная замена Redis: GET, SET (PX, NX), DEL, INCR по протоколу RESP"""
+
+    def __init__(self):
+        self.data = {}  # ключ -> (значение, истекает в)
+        self.server = None
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def _execute(self, command, args):
+        if command == "PING":
+            return b"+PONG\r\n"
+        if command == "GET":
+            entry = self._get(args[0])
+            if entry is None:
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(entry[0].encode()), entry[0].encode())
+        if command == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if "NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            expires_at = None
+            if "PX" in options:
+                expires_at = time.time() + int(args[2 + options.index("PX") + 1]) / 1000
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if command == "DEL":
+            return b":%d\r\n" % sum(1 for key in args if self.data.pop(key, None) is not None)
+        if command == "INCR":
+            entry = self._get(args[0])
+            value = int(entry[0]) + 1 if entry else 1
+            self.data[args[0]] = (str(value), entry[1] if entry else None)
+            return b":%d\r\n" % value
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n")
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(self._execute(args[0].upper(), args[1:]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def check_backend(name, first, second):
+    """Проверяет, что два экземпляра хранилища (два процесса) видят общее состояние"""
+    print(f"🔍 Хранилище {name}...")
+
+    await first.set("key", "value")
+    assert await second.get("key") == "value", "Значение должно быть видно второму процессу"
+    await second.delete("key")
+    assert await first.get("key") is None, "Удаленный ключ не должен читаться"
+
+    await first.set("short", "1", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert await second.get("short") is None, "Ключ должен истечь по ttl"
+
+    counts = [await backend.incr_window("counter", 60) for backend in (first, second, first)]
+    assert counts == [1, 2, 3], f"Счетчик окна должен быть общим: {counts}"
+
+    # FSM: состояние, записанное одним процессом, продолжает другой
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+    await BackendStorage(first).set_state(key, "BookingStates:waiting_for_phone")
+    await BackendStorage(first).update_data(key, {"service": "Маникюр", "date": "15.06.2031"})
+    storage = BackendStorage(second)
+    assert await storage.get_state(key) == "BookingStates:waiting_for_phone"
+    assert (await storage.get_data(key))["service"] == "Маникюр"
+    await storage.set_state(key, None)
+    await storage.set_data(key, {})
+    assert await BackendStorage(first).get_state(key) is None
+
+    # Лимиты: запросы, сделанные через разные процессы, суммируются
+    limiters = [RateLimiter(backend=first), RateLimiter(backend=second)]
+    for limiter in limiters:
+        limiter.limit_profiles["booking"] = (3, 10)
+    results = [await limiters[i % 2].check_rate_limit(42, "booking") for i in range(4)]
+    assert results == [False, False, False, True], f"Лимит должен быть общим: {results}"
+    assert await limiters[0].check_blocked(42), "Блокировка должна быть видна всем процессам"
+    await limiters[1].unblock_user_shared(42)
+    limiters[0].unblock_user(42)
+    assert not await limiters[0].check_blocked(42)
+
+    print(f"✅ {name}: общее состояние, ttl, счетчики, FSM и лимиты работают")
+
+
+async def test_state_backend():
+    print("🧪 Тестирование общего хранилища состояния...")
+
+    # Хранилище без обязательных методов не создается
+    class IncompleteBackend(StateBackend):
+        async def get(self, key):
+            return None
+    try:
+        IncompleteBackend()
+        assert False, "Неполное хранилище должно отклоняться при создании"
+    except TypeError:
+        pass
+
+    memory = MemoryBackend()
+    await check_backend("memory", memory, memory)
+
+    # Фоновая очистка удаляет истекшие состояния FSM и без общего хранилища лимитов
+    await memory.set("fsm:expired", "1", 0.01)
+    await asyncio.sleep(0.02)
+    cleanup = asyncio.create_task(cleanup_task(memory))
+    await asyncio.sleep(0.01)
+    cleanup.cancel()
+    await asyncio.gather(cleanup, return_exceptions=True)
+    assert "fsm:expired" not in memory._data, "Истекшие состояния должны удаляться из памяти"
+
+    async with temp_databases(2) as workers:
+        await check_backend("sqlite", SQLiteBackend(workers[0]), SQLiteBackend(workers[1]))
+        assert await SQLiteBackend(workers[0]).purge_expired() >= 1, "Истекшие ключи должны удаляться"
+
+    server = FakeRedisServer()
+    port = await server.start()
+    clients = [RedisBackend(f"redis://127.0.0.1:{port}/0") for _ in range(2)]
+    try:
+        await check_backend("redis", *clients)
+    finally:
+        for client in clients:
+            await client.close()
+        await server.stop()
+
+    print("🎉 Все хранилища состояния работают")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_state_backend())
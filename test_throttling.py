@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тест middleware защиты от спама на уровне Dispatcher
+"""
+
+import asyncio
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery
+
+from middlewares.throttling import RateLimitMiddleware, DEFAULT_CALLBACK_PROFILES
+from services.rate_limiter import RateLimiter
+from testing_helpers import RecordingSession, callback_update
+
+USER_ID = 888
+
+
+async def test_throttling():
+    print("🛡️ Тестирование middleware защиты от спама...")
+    logging.disable(logging.WARNING)
+
+    limiter = RateLimiter()
+    limiter.limit_profiles["booking"] = (2, 10)
+    middleware = RateLimitMiddleware(limiter)
+    assert DEFAULT_CALLBACK_PROFILES["confirm_booking"] == "booking"
+
+    handled = []
+    router = Router()
+
+    @router.callback_query()
+    async def record(callback: CallbackQuery):
+        handled.append(callback.data)
+
+    session = RecordingSession()
+    bot = Bot("123456:TEST", session=session)
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(middleware)
+    dp.include_router(router)
+
+    # Подтверждение записи считается по профилю "booking" (2 в минуту), а не "callback" (60)
+    for update_id in (1, 2):
+        await dp.feed_update(bot, callback_update(update_id, "confirm_booking", USER_ID))
+    assert handled == ["confirm_booking", "confirm_booking"]
+    assert (USER_ID, "booking") in limiter.user_requests and (USER_ID, "callback") not in limiter.user_requests
+
+    # Превышение лимита: хендлер не вызывается, пользователь получает предупреждение
+    session.calls.clear()
+    await dp.feed_update(bot, callback_update(3, "confirm_booking", USER_ID))
+    assert len(handled) == 2, "Отклоненное обновление не должно доходить до хендлера"
+    alerts = [call for call in session.calls if isinstance(call, AnswerCallbackQuery) and call.show_alert]
+    assert len(alerts) == 1 and limiter.is_user_blocked(USER_ID), session.calls
+    print("✅ Превышение лимита отклоняется до хендлеров, confirm_booking - профиль booking")
+
+    # Заблокированный пользователь отбрасывается молча, даже на дешевых кнопках
+    session.calls.clear()
+    await dp.feed_update(bot, callback_update(4, "menu", USER_ID))
+    assert len(handled) == 2 and session.calls == [], session.calls
+    print("✅ Заблокированному пользователю бот не отвечает")
+
+    # Другие пользователи обрабатываются как обычно
+    await dp.feed_update(bot, callback_update(5, "menu", USER_ID + 1))
+    assert handled[-1] == "menu"
+    logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_throttling())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тест режима webhook: проверка секрета и ограничение одновременной обработки
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from services.webhook import create_webhook_app
+
+TOKEN = "123456:TEST"
+SECRET = "test_secret-123"
+MAX_CONCURRENT = 4
+UPDATES = 20
+
+
+def fake_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": f"сообщение {update_id}",
+            "chat": {"id": 1000 + update_id, "type": "private"},
+            "from": {"id": 1000 + update_id, "is_bot": False, "first_name": "Клиент"},
+        },
+    }
+
+
+async def test_webhook():
+    print("🌐 Тестирование режима webhook...")
+
+    handled = []
+    active = 0
+    peak = 0
+    router = Router()
+
+    @router.message()
+    async def slow_handler(message: Message):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.1)
+        active -= 1
+        handled.append(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(TOKEN)
+    app = create_webhook_app(dp, bot, "/webhook", secret_token=SECRET, max_concurrent=MAX_CONCURRENT)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    try:
+        async with ClientSession() as session:
+            async with session.get(f"{url}/health") as response:
+                assert response.status == 200
+
+            # Без секрета или с чужим секретом обновления не принимаются
+            for headers in ({}, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}):
+                async with session.post(f"{url}/webhook", json=fake_update(0), headers=headers) as response:
+                    assert response.status == 401, f"Ожидался 401, получен {response.status}"
+
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+            async def post(update_id):
+                async with session.post(f"{url}/webhook", json=fake_update(update_id), headers=headers) as response:
+                    return response.status
+
+            statuses = await asyncio.gather(*(post(update_id) for update_id in range(1, UPDATES + 1)))
+            assert set(statuses) == {200}, statuses
+    finally:
+        # Остановка дожидается обновлений, которые еще обрабатываются
+        await runner.cleanup()
+
+    print(f"📊 Обработано: {len(handled)}/{UPDATES}, одновременно не больше {peak}")
+    assert sorted(handled) == list(range(1, UPDATES + 1)), "Каждое обновление должно быть обработано один раз"
+    assert 1 < peak <= MAX_CONCURRENT, f"Одновременно должно обрабатываться до {MAX_CONCURRENT}, было {peak}"
+    print("✅ Webhook проверяет секрет, обрабатывает обновления параллельно и в пределах лимита")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_webhook())
@@ -0,0 +1,99 @@
+"""
+Общие заготовки тестов: сессия Bot API без сети, обновления с нажатием
+кнопки и временная база вместо глобальной
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+
+from services.database import Database
+
+# Модули, которые импортируют глобальный db по имени
+DB_MODULES = (
+    "services.database",
+    "services.scheduler",
+    "handlers.user_handlers",
+    "handlers.admin_handlers",
+    "keyboards.inline_keyboards",
+)
+
+
+class RecordingSession(BaseSession):
+    """Сессия без сети: запоминает вызванные методы Bot API"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def callback_update(update_id, data, user_id, text="меню"):
+    """Нажатие кнопки с callback_data data под сообщением с текстом text"""
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Клиент"},
+            "message": {
+                "message_id": 1, "date": 1700000000, "text": text,
+                "chat": {"id": user_id, "type": "private"},
+            },
+        },
+    })
+
+
+@contextmanager
+def use_database(worker):
+    """Подменяет глобальный db на worker во всех импортировавших его модулях.
+
+    Тесты работают с временной базой и не трогают database.sqlite.
+    """
+    patched = []
+    for name in DB_MODULES:
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, "db"):
+            patched.append((module, module.db))
+            module.db = worker
+    try:
+        yield worker
+    finally:
+        for module, original in patched:
+            module.db = original
+
+
+@asynccontextmanager
+async def temp_databases(count, pool_size=2):
+    """count экземпляров Database на одном временном файле (профиль wal) с созданными таблицами.
+
+    Несколько экземпляров на одной базе имитируют несколько процессов бота.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.sqlite")
+        workers = [Database(path, pool_size=pool_size, profile="wal") for _ in range(count)]
+        try:
+            await workers[0]._create_tables()
+            yield workers
+        finally:
+            for worker in workers:
+                await worker.close()
+
+
+@asynccontextmanager
+async def temp_database(pool_size=2):
+    """Один экземпляр Database на временной базе (см. temp_databases)"""
+    async with temp_databases(1, pool_size) as workers:
+        yield workers[0]